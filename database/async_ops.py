@@ -0,0 +1,41 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class AsyncDBOperations:
+    """
+    Асинхронная обёртка над DBOperations для интерфейса.
+    Все обращения к базе выполняются по очереди в отдельном потоке,
+    а обработчики событий Flet только ожидают результат и не блокируют интерфейс.
+
+    Любой метод DBOperations доступен как корутина:
+        groups = await async_ops.get_groups()
+    Произвольную функцию (например, метод SettingsManager) можно выполнить через run().
+    """
+
+    def __init__(self, db_ops):
+        self.db_ops = db_ops
+        # Один поток: запросы интерфейса не конкурируют между собой за запись,
+        # а пул (LIFO) отдаёт этому потоку одно и то же соединение
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-worker")
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполняет func(*args, **kwargs) в потоке базы данных"""
+        future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        return await asyncio.wrap_future(future)
+
+    def __getattr__(self, name):
+        method = getattr(self.db_ops, name)
+        if not callable(method):
+            return method
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+
+        return wrapper
+
+    def close(self):
+        self._executor.shutdown(wait=True)
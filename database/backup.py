@@ -0,0 +1,152 @@
+import gzip, os, re, shutil, sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+_LABEL_CHARS = re.compile(r"[^\w-]+")
+_SNAPSHOT_NAME = re.compile(r"^(?P<base>.+)_(?P<stamp>\d{8}_\d{6})(?:_(?P<n>\d+))?(?:_(?P<label>[\w-]+))?\.db(?:\.gz)?$")
+
+
+class BackupService:
+    """
+    Резервные копии базы через sqlite3.Connection.backup.
+    Страницы копируются небольшими порциями (pages) с паузой (sleep) между ними,
+    поэтому копию можно снимать, пока приложение читает и пишет в базу.
+    Снимки сохраняются в backup_dir с меткой времени, при compress=True — сжатыми gzip.
+    """
+
+    def __init__(self, db, backup_dir: Optional[str] = None, pages: int = 256, sleep: float = 0.005,
+                 max_snapshots: Optional[int] = 30):
+        self.db = db
+        self.backup_dir = backup_dir or os.path.join(os.path.dirname(os.path.abspath(db.db_name)), "backups")
+        self.pages = pages
+        self.sleep = sleep
+        self.max_snapshots = max_snapshots
+
+    # ========== СНИМКИ ==========
+    def _snapshot_path(self, label: Optional[str], compress: bool) -> str:
+        base = os.path.splitext(os.path.basename(self.db.db_name))[0]
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = "_" + _LABEL_CHARS.sub("_", label) if label else ""
+        extension = ".db.gz" if compress else ".db"
+
+        path = os.path.join(self.backup_dir, f"{base}_{stamp}{suffix}{extension}")
+        counter = 1
+        # Несколько снимков за одну секунду не должны перезаписывать друг друга
+        while os.path.exists(path):
+            path = os.path.join(self.backup_dir, f"{base}_{stamp}_{counter}{suffix}{extension}")
+            counter += 1
+        return path
+
+    def create_snapshot(self, label: Optional[str] = None, compress: bool = False,
+                        keep: Optional[str] = None) -> Optional[str]:
+        """
+        Снимает копию базы и возвращает путь к файлу (None при ошибке).
+        keep — снимок, который нельзя удалять при очистке старых (например, тот, из которого идёт восстановление)
+        """
+        try:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            path = self._snapshot_path(label, compress)
+            db_path = path[:-3] + ".tmp" if compress else path
+
+            # Отдельное соединение: копирование не занимает соединения пула
+            source = sqlite3.connect(self.db.db_name, timeout=self.db.pool.timeout)
+            target = sqlite3.connect(db_path)
+            try:
+                source.backup(target, pages=self.pages, sleep=self.sleep)
+                # Копия не должна тянуть за собой файлы -wal/-shm
+                target.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                target.close()
+                source.close()
+
+            if compress:
+                with open(db_path, "rb") as raw, gzip.open(path, "wb", compresslevel=6) as packed:
+                    shutil.copyfileobj(raw, packed, 1024 * 1024)
+                os.remove(db_path)
+
+            self._prune(keep)
+            return path
+        except (OSError, sqlite3.Error) as e:
+            print(f"Ошибка создания резервной копии: {e}")
+            return None
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """Снимки этой базы, новые — первыми"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+
+        base = os.path.splitext(os.path.basename(self.db.db_name))[0]
+        snapshots = []
+        for name in os.listdir(self.backup_dir):
+            match = _SNAPSHOT_NAME.match(name)
+            if not match or match.group('base') != base:
+                continue
+            path = os.path.join(self.backup_dir, name)
+            created = datetime.strptime(match.group('stamp'), "%Y%m%d_%H%M%S")
+            snapshots.append(((created, int(match.group('n') or 0), os.path.getmtime(path)), {
+                'Файл': name,
+                'Путь': path,
+                'Создан': created,
+                'Метка': match.group('label') or '',
+                'Сжат': name.endswith('.gz'),
+                'Размер': os.path.getsize(path),
+            }))
+        snapshots.sort(key=lambda item: item[0], reverse=True)
+        return [snapshot for _, snapshot in snapshots]
+
+    def _prune(self, keep: Optional[str] = None):
+        if not self.max_snapshots:
+            return
+        keep = os.path.abspath(keep) if keep else None
+        for snapshot in self.list_snapshots()[self.max_snapshots:]:
+            if os.path.abspath(snapshot['Путь']) == keep:
+                continue
+            try:
+                os.remove(snapshot['Путь'])
+            except OSError as e:
+                print(f"Не удалось удалить старую резервную копию {snapshot['Файл']}: {e}")
+
+    # ========== ВОССТАНОВЛЕНИЕ ==========
+    def restore_snapshot(self, path: str, keep_current: bool = True) -> bool:
+        """
+        Заменяет содержимое базы снимком.
+        При keep_current=True текущее состояние сначала сохраняется отдельным снимком.
+        """
+        unpacked = None
+        try:
+            if path.endswith(".gz"):
+                os.makedirs(self.backup_dir, exist_ok=True)
+                unpacked = os.path.join(self.backup_dir, os.path.basename(path)[:-3] + ".restore")
+                with gzip.open(path, "rb") as packed, open(unpacked, "wb") as raw:
+                    shutil.copyfileobj(packed, raw, 1024 * 1024)
+
+            source = sqlite3.connect(unpacked or path)
+            try:
+                check = source.execute("PRAGMA quick_check").fetchone()[0]
+                if check != "ok":
+                    print(f"Резервная копия повреждена: {check}")
+                    return False
+
+                if keep_current and self.create_snapshot("before_restore", keep=path) is None:
+                    return False
+
+                target = sqlite3.connect(self.db.db_name, timeout=self.db.pool.timeout)
+                try:
+                    # Восстановление копирует всё за один шаг: база блокируется на запись ненадолго
+                    source.backup(target)
+                finally:
+                    target.close()
+            finally:
+                source.close()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Ошибка восстановления из резервной копии: {e}")
+            return False
+        finally:
+            if unpacked and os.path.exists(unpacked):
+                os.remove(unpacked)
+
+        # Снимок может быть старой версии схемы; кэши собраны по прежним данным
+        self.db.pool.reset()
+        self.db.init_db()
+        self.db.changes.mark_all_changed()
+        return True
@@ -0,0 +1,144 @@
+import functools, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+from .changes import ALL_TABLES
+
+
+class ReferenceCache:
+    """
+    Кэш справочников (территории, модули, дисциплины, кабинеты, группы) в памяти процесса.
+    Запись сбрасывается, как только зафиксировано изменение любой из таблиц, из которых она собрана.
+    Размер ограничен max_entries, при переполнении вытесняется давно не использованная запись.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # {ключ: (таблицы, строки)}
+        self._lock = threading.Lock()
+        self._generation = 0  # растёт при сбросе всего кэша
+        self._table_generations = {}  # {таблица: число сбросов по её изменениям}
+
+    def _stamp(self, tables: Iterable[str]) -> Tuple:
+        return (self._generation,) + tuple(self._table_generations.get(table, 0) for table in tables)
+
+    def get_or_load(self, key: Tuple, tables: Iterable[str], loader: Callable[[], List[Dict[str, Any]]]):
+        tables = frozenset(tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return _copy_rows(entry[1])
+            stamp = self._stamp(tables)
+
+        rows = loader()
+
+        with self._lock:
+            # Пустой результат может означать ошибку запроса, его не запоминаем.
+            # Если за время загрузки менялись таблицы записи, результат уже устарел
+            if rows and stamp == self._stamp(tables):
+                self._entries[key] = (tables, _copy_rows(rows))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return rows
+
+    def invalidate(self, tables: Set[str], version: int = None):
+        """Обработчик изменений Database: сбрасывает записи, зависящие от изменённых таблиц"""
+        with self._lock:
+            if ALL_TABLES in tables:
+                self._generation += 1
+                self._entries.clear()
+                return
+            for table in tables:
+                self._table_generations[table] = self._table_generations.get(table, 0) + 1
+            for key in [k for k, (deps, _) in self._entries.items() if deps & tables]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+class SettingsCache:
+    """
+    Содержимое таблицы Настройки в памяти процесса: загружается целиком одним запросом при первом чтении.
+    Сохранения через SettingsManager обновляют запись в кэше сами (write-through),
+    любые другие изменения таблицы, в том числе из других процессов, сбрасывают кэш целиком.
+    """
+
+    TABLE = 'Настройки'
+
+    def __init__(self):
+        self._values = None  # {ключ: разобранное значение}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._local = threading.local()
+
+    def get_all(self, loader: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            if self._values is not None:
+                return self._values
+            generation = self._generation
+
+        values = loader()
+
+        with self._lock:
+            # Если за время загрузки настройки сохранялись, загруженное уже устарело
+            if generation == self._generation:
+                self._values = values
+        return values
+
+    def put(self, key: str, value: Any):
+        self.put_many({key: value})
+
+    def put_many(self, values: Dict[str, Any]):
+        with self._lock:
+            self._generation += 1
+            if self._values is not None:
+                self._values = {**self._values, **values}
+
+    @contextmanager
+    def own_write(self):
+        """Запись настроек, которую вызывающий код сам перенесёт в кэш через put() / put_many()"""
+        self._local.own_write = True
+        try:
+            yield
+        finally:
+            self._local.own_write = False
+
+    def invalidate(self, tables: Set[str], version: int = None):
+        """Обработчик изменений Database (вызывается в потоке, сделавшем запись)"""
+        if self.TABLE not in tables and ALL_TABLES not in tables:
+            return
+        if getattr(self._local, 'own_write', False) and tables == {self.TABLE}:
+            return
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._values = None
+
+
+def _copy_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Вызывающий код сортирует и меняет строки, поэтому наружу отдаются копии
+    return [dict(row) for row in rows]
+
+
+def cached_reference(*tables: str):
+    """Кэширует результат метода DBOperations до изменения перечисленных таблиц"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args):
+            # Внутри открытой транзакции (например, снимка для генерации) читаем из базы,
+            # чтобы не смешивать кэш с данными транзакции
+            if self.db.in_transaction():
+                return method(self, *args)
+            self.db.changes.poll_external_changes()
+            return self.reference_cache.get_or_load(
+                (method.__name__,) + args, tables, lambda: method(self, *args)
+            )
+        return wrapper
+    return decorator
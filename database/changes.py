@@ -0,0 +1,210 @@
+import re, sqlite3, threading
+from typing import Callable, Optional, Set
+
+# Признак изменения, сделанного в обход этого приложения: таблицы неизвестны, менялось всё
+ALL_TABLES = '*'
+
+_WRITE_STATEMENT = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM"
+    r"|(?:CREATE|DROP)\s+TABLE(?:\s+IF\s+(?:NOT\s+)?EXISTS)?|ALTER\s+TABLE)"
+    r"\s+[\[\"`]?([\w]+)",
+    re.IGNORECASE
+)
+
+
+class _ConnectionState:
+    """Изменения одного соединения, ещё не зафиксированные COMMIT"""
+    __slots__ = ('in_transaction', 'pending', 'committed')
+
+    def __init__(self):
+        self.in_transaction = False
+        self.pending = set()
+        self.committed = set()  # зафиксировано, но ещё не опубликовано
+
+
+class ChangeTracker:
+    """
+    Версия данных для инвалидации кэшей.
+    Каждая зафиксированная транзакция с записью увеличивает версию и запоминает, какие таблицы менялись.
+    Записи отслеживаются по тексту выполняемых команд (set_trace_callback на соединениях базы),
+    поэтому учитываются и execute_command, и транзакционные методы DBOperations.
+    Изменения из других процессов определяются по PRAGMA data_version пишущего соединения (watch).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._table_versions = {}  # {таблица: версия последнего изменения}
+        self._external_version = 0  # версия последнего внешнего изменения
+        self._listeners = []
+        self._states = {}  # {id(conn): _ConnectionState}
+        self._cascades = {}  # {таблица: таблицы, которые меняются каскадно при её изменении}
+
+        self._watcher = None
+        self._watcher_lock = None
+        self._seen_data_version = None
+
+    def watch(self, conn: Optional[sqlite3.Connection], lock: Optional[threading.RLock] = None):
+        """
+        Соединение, по PRAGMA data_version которого замечаются внешние изменения (None — не следить).
+        Это должно быть единственное соединение приложения, которое пишет: свои коммиты
+        его data_version не меняют, поэтому любое замеченное изменение сделано другим процессом.
+        lock — блокировка, под которой соединение используется
+        """
+        with self._lock:
+            self._watcher = conn
+            self._watcher_lock = lock
+            self._seen_data_version = self._read_data_version()
+
+    # ========== ОТСЛЕЖИВАНИЕ СОЕДИНЕНИЙ ==========
+    def attach(self, conn: sqlite3.Connection):
+        state = self._states[id(conn)] = _ConnectionState()
+        conn.set_trace_callback(lambda statement: self._on_statement(state, statement))
+
+    def flush(self, conn: sqlite3.Connection):
+        """
+        Публикует изменения, зафиксированные соединением.
+        Вызывается пулом при возврате соединения, то есть уже после COMMIT:
+        трассировка видит команду до её выполнения, и обработчики не должны перечитать старые данные.
+        """
+        state = self._states.get(id(conn))
+        if state is not None and state.committed:
+            tables, state.committed = state.committed, set()
+            self._publish(tables)
+
+    def detach(self, conn: sqlite3.Connection):
+        self.flush(conn)
+        self._states.pop(id(conn), None)
+
+    def load_cascades(self, conn: sqlite3.Connection):
+        """
+        Читает из схемы внешние ключи с ON DELETE/ON UPDATE CASCADE и SET NULL.
+        Каскадные изменения не видны в тексте команд, поэтому дочерние таблицы добавляются к изменённым
+        """
+        cascades = {}
+        tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for table in tables:
+            for row in conn.execute(f"PRAGMA foreign_key_list({table})"):
+                parent, on_update, on_delete = row[2], row[5], row[6]
+                if {on_update, on_delete} & {'CASCADE', 'SET NULL', 'SET DEFAULT'}:
+                    cascades.setdefault(parent, set()).add(table)
+        with self._lock:
+            self._cascades = cascades
+
+    def _with_cascades(self, tables: Set[str]) -> Set[str]:
+        result = set(tables)
+        pending = list(tables)
+        while pending:
+            for child in self._cascades.get(pending.pop(), ()):
+                if child not in result:
+                    result.add(child)
+                    pending.append(child)
+        return result
+
+    def _on_statement(self, state: _ConnectionState, statement: str):
+        head = statement.lstrip()[:8].upper()
+
+        if head.startswith('BEGIN'):
+            state.in_transaction = True
+        elif head.startswith(('COMMIT', 'END')):
+            state.in_transaction = False
+            state.committed |= state.pending
+            state.pending = set()
+        elif head.startswith('ROLLBACK') and not head.startswith('ROLLBACK T'):
+            state.in_transaction = False
+            state.pending = set()
+        else:
+            match = _WRITE_STATEMENT.match(statement)
+            if match:
+                if state.in_transaction:
+                    state.pending.add(match.group(1))
+                else:
+                    # Команда в режиме автофиксации
+                    state.committed.add(match.group(1))
+
+    def _publish(self, tables: Set[str], external: bool = False):
+        if not tables:
+            return
+
+        with self._lock:
+            if not external:
+                tables = self._with_cascades(tables)
+            self._version += 1
+            version = self._version
+            if external:
+                self._external_version = version
+            for table in tables:
+                self._table_versions[table] = version
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(set(tables), version)
+            except Exception as e:
+                print(f"Ошибка обработчика изменений данных: {e}")
+
+    # ========== ВНЕШНИЕ ИЗМЕНЕНИЯ ==========
+    def _read_data_version(self) -> Optional[int]:
+        if self._watcher is None:
+            return None
+        return self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def poll_external_changes(self) -> bool:
+        """
+        Проверяет, меняли ли базу другие процессы с прошлой проверки.
+        Какие таблицы они меняли, неизвестно, поэтому изменение публикуется как ALL_TABLES
+        """
+        lock = self._watcher_lock
+        # Пишущее соединение занято записью в другом потоке: изменения заметим при следующей проверке
+        if lock is None or not lock.acquire(blocking=False):
+            return False
+        try:
+            with self._lock:
+                data_version = self._read_data_version()
+                if data_version is None:
+                    return False
+                changed = data_version != self._seen_data_version
+                self._seen_data_version = data_version
+        finally:
+            lock.release()
+
+        if changed:
+            self._publish({ALL_TABLES}, external=True)
+        return changed
+
+    def mark_all_changed(self):
+        """Сообщает, что база заменена целиком (например, восстановлена из резервной копии)"""
+        self._publish({ALL_TABLES}, external=True)
+
+    # ========== ЗАПРОСЫ ВЕРСИИ ==========
+    @property
+    def version(self) -> int:
+        self.poll_external_changes()
+        return self._version
+
+    def changed_tables(self, since: int) -> Set[str]:
+        """Таблицы, изменённые после версии since; ALL_TABLES — если менялось что-то извне"""
+        self.poll_external_changes()
+        with self._lock:
+            if self._external_version > since:
+                return {ALL_TABLES}
+            return {table for table, version in self._table_versions.items()
+                    if version > since and table != ALL_TABLES}
+
+    def has_changed(self, since: int, *tables: str) -> bool:
+        """Менялась ли хотя бы одна из таблиц (или любая, если таблицы не указаны) после версии since"""
+        changed = self.changed_tables(since)
+        if not tables or ALL_TABLES in changed:
+            return bool(changed)
+        return any(table in changed for table in tables)
+
+    def add_listener(self, listener: Callable[[Set[str], int], None]):
+        """listener(tables, version) вызывается после зафиксированной записи (в потоке, который её сделал)"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Set[str], int], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
@@ -1,17 +1,358 @@
-import sqlite3
-from typing import List, Dict, Any
+import functools, queue, sqlite3, threading, time
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Sequence, Set, Tuple
 from contextlib import contextmanager
+from .changes import ChangeTracker
+from .migrations import migrate
+from .profiling import QueryProfiler
+
+
+# Наборы PRAGMA, применяемые к каждому соединению
+PERFORMANCE_PROFILES = {
+    # Настройки SQLite по умолчанию: журнал отката, полная синхронизация
+    'standard': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+    },
+    # WAL: чтение не блокирует запись, коммиты без fsync на каждую транзакцию
+    'performance': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+}
+
+DEFAULT_PROFILE = 'performance'
+PROFILE_SETTING_KEY = 'performance_profile'
+
+
+class Record(tuple):
+    """
+    Компактная строка результата для внутренних потребителей (генератор, экспорт).
+    Это кортеж без словаря на каждую строку; значения доступны и по индексу, и по имени колонки.
+    """
+    __slots__ = ()
+    _index: Dict[str, int] = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self) -> List[str]:
+        return list(self._index)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(zip(self._index, self))
+
+    def __repr__(self):
+        return f"Record({self.as_dict()!r})"
+
+
+@functools.lru_cache(maxsize=128)
+def record_type(columns: Tuple[str, ...]) -> type:
+    """Класс записи для набора колонок (один на каждый набор, строки его только используют)"""
+    return type('Record', (Record,), {'__slots__': (), '_index': {name: i for i, name in enumerate(columns)}})
+
+
+# Представление строк в execute_query: dict — для интерфейса, tuple и record — для больших выборок
+ROW_MODES = ('dict', 'tuple', 'record')
+
+
+class ConnectionPool:
+    """
+    Пул долгоживущих соединений с SQLite.
+    Соединения создаются лениво (не более size штук) и возвращаются в пул после использования,
+    поэтому их можно брать из любого потока, в том числе из фоновой генерации.
+    """
+
+    def __init__(self, db_name: str, size: int = 5, timeout: float = 30.0,
+                 on_connect: Optional[Callable[[sqlite3.Connection], None]] = None,
+                 on_release: Optional[Callable[[sqlite3.Connection], None]] = None,
+                 on_discard: Optional[Callable[[sqlite3.Connection], None]] = None):
+        if size < 1:
+            raise ValueError("Размер пула должен быть не меньше 1")
+
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        self.on_connect = on_connect
+        self.on_release = on_release
+        self.on_discard = on_discard
+
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._generation = 0
+        self._conn_generation = {}  # {id(conn): поколение пула при создании}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_name, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        if self.on_connect:
+            self.on_connect(conn)
+        self._conn_generation[id(conn)] = self._generation
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection):
+        self._conn_generation.pop(id(conn), None)
+        if self.on_discard:
+            self.on_discard(conn)
+        conn.close()
+        with self._lock:
+            self._created -= 1
+
+    def acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise sqlite3.ProgrammingError("Пул соединений закрыт")
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                conn = self._connect()
+                self._created += 1
+                return conn
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Нет свободных соединений в пуле")
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        if self.on_release:
+            self.on_release(conn)
+
+        if self._closed or self._conn_generation.get(id(conn)) != self._generation:
+            self._discard(conn)
+            return
+
+        self._idle.put(conn)
+
+    def _drain(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def reset(self):
+        """Пересоздаёт соединения: свободные закрываются сразу, занятые — при возврате в пул"""
+        self._generation += 1
+        self._drain()
+
+    def close(self):
+        self._closed = True
+        self._drain()
+
+
+class PooledConnection:
+    """Соединение из пула или пишущее соединение: close() возвращает его владельцу вместо закрытия"""
+
+    def __init__(self, conn: sqlite3.Connection, release: Callable[[sqlite3.Connection], None]):
+        self._release = release
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+    def close(self):
+        if self._conn is not None:
+            self._release(self._conn)
+            self._conn = None
+
+    def __del__(self):
+        # Страховка для кода, который не дошёл до close() из-за исключения
+        self.close()
 
 
 class Database:
-    def __init__(self, db_name: str = "schedule.db"):
+    def __init__(self, db_name: str = "schedule.db", pool_size: int = 5, profile: Optional[str] = None,
+                 slow_query_ms: Optional[float] = None, slow_query_log: str = "slow_queries.log"):
+        if profile is not None and profile not in PERFORMANCE_PROFILES:
+            raise ValueError(f"Неизвестный профиль производительности: {profile}")
+
         self.db_name = db_name
+        # Если профиль не задан явно, берём сохранённый в таблице Настройки до первого соединения пула,
+        # чтобы соединения сразу настраивались под него и режим журнала не переключался туда и обратно
+        self.profile = profile or self._load_profile_setting() or DEFAULT_PROFILE
+        self.changes = ChangeTracker()
+        self.pool = ConnectionPool(db_name, pool_size, on_connect=self._configure_connection,
+                                   on_release=self.changes.flush, on_discard=self.changes.detach)
+        self._local = threading.local()
+        # Все записи идут через одно соединение под блокировкой, соединения пула только читают.
+        # По PRAGMA data_version этого соединения замечаются изменения из других процессов
+        self._writer = None
+        self._write_lock = threading.RLock()
+        self.profiler = QueryProfiler(slow_query_ms, slow_query_log)
         self.init_db()
 
+    def close(self):
+        self.pool.close()
+        self._close_writer()
+
+    # ========== ПРОФИЛЬ ПРОИЗВОДИТЕЛЬНОСТИ ==========
+    def _configure_connection(self, conn: sqlite3.Connection):
+        self.changes.attach(conn)
+        # Внешние ключи SQLite проверяет только при включённой настройке, и действует она на соединение
+        conn.execute("PRAGMA foreign_keys = ON")
+        for pragma, value in PERFORMANCE_PROFILES[self.profile].items():
+            try:
+                conn.execute(f"PRAGMA {pragma} = {value}")
+            except sqlite3.OperationalError as e:
+                # journal_mode не меняется, пока базу держат другие соединения; остальные настройки применяются
+                print(f"Не удалось применить PRAGMA {pragma} = {value}: {e}")
+
+    def _load_profile_setting(self) -> Optional[str]:
+        """Сохранённый профиль, прочитанный отдельным соединением без PRAGMA профиля (None, если его нет)"""
+        try:
+            conn = sqlite3.connect(self.db_name, timeout=30.0)
+            try:
+                row = conn.execute(
+                    "SELECT Значение FROM Настройки WHERE Ключ = ?", (PROFILE_SETTING_KEY,)
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            # Новая база: таблицы Настройки ещё нет
+            return None
+        return row[0] if row and row[0] in PERFORMANCE_PROFILES else None
+
+    def get_performance_profile(self) -> str:
+        return self.profile
+
+    def set_performance_profile(self, profile: str) -> bool:
+        if profile not in PERFORMANCE_PROFILES:
+            raise ValueError(f"Неизвестный профиль производительности: {profile}")
+
+        saved = self.execute_command(
+            """INSERT INTO Настройки (Ключ, Значение, Тип) VALUES (?, ?, 'TEXT')
+               ON CONFLICT(Ключ) DO UPDATE SET Значение = excluded.Значение, Тип = excluded.Тип""",
+            (PROFILE_SETTING_KEY, profile)
+        )
+        if saved and profile != self.profile:
+            self.profile = profile
+            self._reconnect()
+        return saved
+
+    def _reconnect(self):
+        """
+        Пересоздаёт соединения под новый профиль.
+        Режим журнала меняется, только когда к базе нет других соединений,
+        поэтому пишущее соединение открывается первым, после закрытия остальных
+        """
+        with self._write_lock:
+            self._close_writer()
+            self.pool.reset()
+            self._release_writer(self._acquire_writer())
+
+    # ========== ПИШУЩЕЕ СОЕДИНЕНИЕ ==========
+    def _acquire_writer(self) -> sqlite3.Connection:
+        """Берёт блокировку записи и возвращает пишущее соединение (создаёт его при первом вызове)"""
+        self._write_lock.acquire()
+        try:
+            if self._writer is None:
+                conn = sqlite3.connect(self.db_name, timeout=self.pool.timeout, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+                self._configure_connection(conn)
+                self._writer = conn
+                self.changes.watch(conn, self._write_lock)
+            return self._writer
+        except BaseException:
+            self._write_lock.release()
+            raise
+
+    def _release_writer(self, conn: sqlite3.Connection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self.changes.flush(conn)
+        finally:
+            self._write_lock.release()
+
+    def _close_writer(self):
+        with self._write_lock:
+            if self._writer is not None:
+                self.changes.watch(None)
+                self.changes.detach(self._writer)
+                self._writer.close()
+                self._writer = None
+
+    # ========== ВЕРСИЯ ДАННЫХ ==========
+    @property
+    def data_version(self) -> int:
+        """Монотонно растущая версия данных: меняется после каждой записи, в том числе извне"""
+        return self.changes.version
+
+    def changed_tables(self, since: int) -> Set[str]:
+        return self.changes.changed_tables(since)
+
+    def has_changed(self, since: int, *tables: str) -> bool:
+        return self.changes.has_changed(since, *tables)
+
+    def add_change_listener(self, listener: Callable[[Set[str], int], None]):
+        self.changes.add_listener(listener)
+
+    def remove_change_listener(self, listener: Callable[[Set[str], int], None]):
+        self.changes.remove_listener(listener)
+
+    # ========== ПРОФИЛИРОВАНИЕ ЗАПРОСОВ ==========
+    def get_query_stats(self) -> List[Dict[str, Any]]:
+        return self.profiler.get_stats()
+
+    def dump_query_stats(self, limit: Optional[int] = None) -> str:
+        return self.profiler.dump(limit)
+
+    def reset_query_stats(self):
+        self.profiler.reset()
+
+    def set_slow_query_threshold(self, slow_query_ms: Optional[float]):
+        """Порог в миллисекундах для журнала медленных запросов (None — журнал выключен)"""
+        self.profiler.slow_query_ms = slow_query_ms
+
     @contextmanager
-    def _get_cursor(self):
-        conn = self._get_connection()
-        conn.row_factory = sqlite3.Row
+    def _get_cursor(self, write: bool = False):
+        # Вложенный вызов в том же потоке работает в уже открытой транзакции,
+        # фиксирует её только внешний вызов
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None:
+            if write and conn is not self._writer:
+                raise sqlite3.ProgrammingError("Запись внутри транзакции чтения: используйте write_transaction")
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+            return
+
+        if write:
+            conn, release = self._acquire_writer(), self._release_writer
+        else:
+            conn, release = self.pool.acquire(), self.pool.release
+        self._local.connection = conn
+        self._local.cache = {}
         cursor = conn.cursor()
         try:
             yield cursor
@@ -21,130 +362,148 @@ class Database:
             print(f"Ошибка SQLite: {e}")
             raise
         finally:
-            conn.close()
+            cursor.close()
+            self._local.connection = None
+            self._local.cache = None
+            release(conn)
 
-    def init_db(self):
+    def in_transaction(self) -> bool:
+        """Открыт ли в этом потоке блок _get_cursor / read_transaction"""
+        return getattr(self._local, 'connection', None) is not None
+
+    def transaction_cache(self) -> Optional[Dict[str, Any]]:
+        """
+        Словарь, который живёт, пока в этом потоке открыта транзакция (вне транзакции — None):
+        данные, общие для всего среза (например, настройки), читаются в нём один раз
+        """
+        return getattr(self._local, 'cache', None)
+
+    @contextmanager
+    def read_transaction(self):
+        """
+        Запросы внутри блока (в этом потоке) выполняются в одной транзакции
+        и видят один согласованный снимок базы
+        """
         with self._get_cursor() as cursor:
-            cursor.executescript("""
-            CREATE TABLE IF NOT EXISTS Модули (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                Код TEXT NOT NULL UNIQUE,
-                Название TEXT NOT NULL
-            );
-    
-            CREATE TABLE IF NOT EXISTS Группы (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                Группа TEXT NOT NULL,
-                Подгруппа TEXT NOT NULL DEFAULT 'Нет',
-                Самообразование TEXT,
-                [Разговоры о важном] BOOLEAN DEFAULT 0
-            );
-    
-            CREATE TABLE IF NOT EXISTS Территории (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                Территория TEXT NOT NULL,
-                Цвет TEXT DEFAULT '#FFFFFF'
-            );
-        
-            CREATE TABLE IF NOT EXISTS Кабинеты (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                Кабинет TEXT NOT NULL,
-                ТерриторияID INTEGER NOT NULL,
-                Вместимость INTEGER,
-                FOREIGN KEY (ТерриторияID) REFERENCES Территории(ID) ON DELETE CASCADE
-            );
-    
-            CREATE TABLE IF NOT EXISTS Дисциплины (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                Дисциплина TEXT NOT NULL,
-                Модуль TEXT NOT NULL,
-                FOREIGN KEY (Модуль) REFERENCES Модули(Код)
-            );
-        
-            CREATE TABLE IF NOT EXISTS Преподаватели (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ФИО TEXT NOT NULL,
-                Совместитель BOOLEAN DEFAULT 0,
-                [Дни занятий] TEXT
-            );
-    
-            CREATE TABLE IF NOT EXISTS Преподаватель_Территория (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ПреподавательID INTEGER NOT NULL,
-                ТерриторияID INTEGER NOT NULL,
-                FOREIGN KEY (ПреподавательID) REFERENCES Преподаватели(ID),
-                FOREIGN KEY (ТерриторияID) REFERENCES Территории(ID)
-            );
-        
-            CREATE TABLE IF NOT EXISTS Преподаватель_Дисциплина (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ПреподавательID INTEGER NOT NULL,
-                ДисциплинаID INTEGER NOT NULL,
-                FOREIGN KEY (ПреподавательID) REFERENCES Преподаватели(ID),
-                FOREIGN KEY (ДисциплинаID) REFERENCES Дисциплины(ID)
-            );
-        
-            CREATE TABLE IF NOT EXISTS Дисциплина_Кабинет (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ДисциплинаID INTEGER NOT NULL,
-                КабинетID INTEGER NOT NULL,
-                FOREIGN KEY (ДисциплинаID) REFERENCES Дисциплины(ID) ON DELETE CASCADE,
-                FOREIGN KEY (КабинетID) REFERENCES Кабинеты(ID) ON DELETE CASCADE
-            );
-        
-            CREATE TABLE IF NOT EXISTS Нагрузка (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ПреподавательID INTEGER NOT NULL,
-                ДисциплинаID INTEGER NOT NULL,
-                ГруппаID INTEGER NOT NULL,
-                Часы INTEGER NOT NULL,
-                FOREIGN KEY (ПреподавательID) REFERENCES Преподаватели(ID),
-                FOREIGN KEY (ДисциплинаID) REFERENCES Дисциплины(ID),
-                FOREIGN KEY (ГруппаID) REFERENCES Группы(ID)
-            );
-            
-            CREATE TABLE IF NOT EXISTS Настройки (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                Ключ TEXT NOT NULL UNIQUE,
-                Значение TEXT,
-                Тип TEXT DEFAULT 'TEXT'
-            );
-            
-            CREATE TABLE IF NOT EXISTS Потоки (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                Поток TEXT NOT NULL,
-                Группа1_ID INTEGER NOT NULL,
-                Группа2_ID INTEGER,
-                Группа3_ID INTEGER,
-                Группа4_ID INTEGER,
-                FOREIGN KEY (Группа1_ID) REFERENCES Группы(ID),
-                FOREIGN KEY (Группа2_ID) REFERENCES Группы(ID),
-                FOREIGN KEY (Группа3_ID) REFERENCES Группы(ID),
-                FOREIGN KEY (Группа4_ID) REFERENCES Группы(ID)
-            );
-            
-            CREATE TABLE IF NOT EXISTS Поток_Дисциплина (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ПотокID INTEGER NOT NULL,
-                ДисциплинаID INTEGER NOT NULL,
-                FOREIGN KEY (ПотокID) REFERENCES Потоки(ID) ON DELETE CASCADE,
-                FOREIGN KEY (ДисциплинаID) REFERENCES Дисциплины(ID) ON DELETE CASCADE
-            );
-            """)
-
-    def _get_connection(self):
-        return sqlite3.connect(self.db_name)
-
-    def execute_query(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+            if not cursor.connection.in_transaction:
+                cursor.execute("BEGIN")
+            yield cursor
+
+    @contextmanager
+    def write_transaction(self):
+        """
+        Блок записи в одной транзакции, которая сразу берёт блокировку на запись (BEGIN IMMEDIATE):
+        проверки внутри блока не устаревают из-за записи из других соединений до COMMIT
+        """
+        with self._get_cursor(write=True) as cursor:
+            if not cursor.connection.in_transaction:
+                cursor.execute("BEGIN IMMEDIATE")
+            yield cursor
+
+    def init_db(self):
+        conn = self._acquire_writer()
+        try:
+            migrate(conn)
+            self.changes.load_cascades(conn)
+        finally:
+            self._release_writer(conn)
+
+    def _get_connection(self) -> PooledConnection:
+        """Пишущее соединение для транзакций, которые коммитит вызывающий код (блокировка записи до close())"""
+        return PooledConnection(self._acquire_writer(), self._release_writer)
+
+    def execute_query(self, query: str, params: tuple = (), row_mode: str = 'dict') -> List[Any]:
+        if row_mode not in ROW_MODES:
+            raise ValueError(f"Неизвестный режим строк: {row_mode}")
+
         with self._get_cursor() as cursor:
+            start = time.perf_counter()
+            if row_mode != 'dict':
+                # Обычные кортежи без промежуточных sqlite3.Row
+                cursor.row_factory = None
+            cursor.execute(query, params)
+            if row_mode == 'dict':
+                result = [dict(row) for row in cursor.fetchall()]
+            elif row_mode == 'tuple':
+                result = cursor.fetchall()
+            else:
+                cls = record_type(tuple(column[0] for column in cursor.description))
+                result = list(map(cls, cursor.fetchall()))
+            self.profiler.record(query, params, time.perf_counter() - start, len(result))
+            return result
+
+    def iter_query(self, query: str, params: tuple = (), batch_size: int = 500,
+                   row_mode: str = 'dict', chunks: bool = False) -> Iterator[Any]:
+        """
+        Читает результат порциями через fetchmany и отдаёт по одной строке
+        (или списками по batch_size строк при chunks=True), не держа всю выборку в памяти.
+        Соединение занято, пока итерация не закончена или генератор не закрыт.
+        """
+        if row_mode not in ROW_MODES:
+            raise ValueError(f"Неизвестный режим строк: {row_mode}")
+        if batch_size < 1:
+            raise ValueError("Размер порции должен быть не меньше 1")
+
+        # Внутри открытой транзакции читаем её соединением, чтобы видеть тот же срез данных.
+        # Иначе итератор берёт своё соединение из пула и не регистрирует его в потоке:
+        # пока генератор приостановлен, другие запросы потока идут через свои соединения и фиксируются сразу
+        outer = getattr(self._local, 'connection', None)
+        conn = outer if outer is not None else self.pool.acquire()
+        cursor = conn.cursor()
+        start = time.perf_counter()
+        total = 0
+        try:
+            if row_mode != 'dict':
+                cursor.row_factory = None
             cursor.execute(query, params)
-            return [dict(row) for row in cursor.fetchall()]
+
+            cls = None
+            if row_mode == 'record':
+                cls = record_type(tuple(column[0] for column in cursor.description))
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                total += len(rows)
+
+                if row_mode == 'dict':
+                    rows = [dict(row) for row in rows]
+                elif cls is not None:
+                    rows = list(map(cls, rows))
+
+                if chunks:
+                    yield rows
+                else:
+                    yield from rows
+        except sqlite3.Error as e:
+            print(f"Ошибка SQLite: {e}")
+            raise
+        finally:
+            self.profiler.record(query, params, time.perf_counter() - start, total)
+            cursor.close()
+            # Генератор, закрытый до конца выборки (close / сборка мусора), тоже возвращает соединение в пул
+            if outer is None:
+                self.pool.release(conn)
 
     def execute_command(self, query: str, params: tuple = ()) -> bool:
         try:
-            with self._get_cursor() as cursor:
+            with self._get_cursor(write=True) as cursor:
+                start = time.perf_counter()
                 cursor.execute(query, params)
+                self.profiler.record(query, params, time.perf_counter() - start, cursor.rowcount)
             return True
         except sqlite3.Error as e:
             print(f"Ошибка выполнения команды: {e}")
             return False
+
+    def execute_many(self, query: str, rows: Iterable[Sequence[Any]]) -> bool:
+        try:
+            with self._get_cursor(write=True) as cursor:
+                start = time.perf_counter()
+                cursor.executemany(query, rows)
+                self.profiler.record(query, (), time.perf_counter() - start, cursor.rowcount)
+            return True
+        except sqlite3.Error as e:
+            print(f"Ошибка выполнения пакетной команды: {e}")
+            return False
@@ -0,0 +1,493 @@
+import sqlite3
+from typing import Callable, List, Tuple, Union
+
+
+# Шаг миграции: SQL-скрипт или функция, получающая соединение.
+# Каждый шаг выполняется в отдельной транзакции вместе с повышением PRAGMA user_version.
+Migration = Union[str, Callable[[sqlite3.Connection], None]]
+
+
+# ========== 1. БАЗОВАЯ СХЕМА ==========
+SCHEMA_V1 = """
+    CREATE TABLE IF NOT EXISTS Модули (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Код TEXT NOT NULL UNIQUE,
+        Название TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS Группы (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Группа TEXT NOT NULL,
+        Подгруппа TEXT NOT NULL DEFAULT 'Нет',
+        Самообразование TEXT,
+        [Разговоры о важном] BOOLEAN DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS Территории (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Территория TEXT NOT NULL,
+        Цвет TEXT DEFAULT '#FFFFFF'
+    );
+
+    CREATE TABLE IF NOT EXISTS Кабинеты (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Кабинет TEXT NOT NULL,
+        ТерриторияID INTEGER NOT NULL,
+        Вместимость INTEGER,
+        FOREIGN KEY (ТерриторияID) REFERENCES Территории(ID) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS Дисциплины (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Дисциплина TEXT NOT NULL,
+        Модуль TEXT NOT NULL,
+        FOREIGN KEY (Модуль) REFERENCES Модули(Код)
+    );
+
+    CREATE TABLE IF NOT EXISTS Преподаватели (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ФИО TEXT NOT NULL,
+        Совместитель BOOLEAN DEFAULT 0,
+        [Дни занятий] TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS Преподаватель_Территория (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ПреподавательID INTEGER NOT NULL,
+        ТерриторияID INTEGER NOT NULL,
+        FOREIGN KEY (ПреподавательID) REFERENCES Преподаватели(ID),
+        FOREIGN KEY (ТерриторияID) REFERENCES Территории(ID)
+    );
+
+    CREATE TABLE IF NOT EXISTS Преподаватель_Дисциплина (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ПреподавательID INTEGER NOT NULL,
+        ДисциплинаID INTEGER NOT NULL,
+        FOREIGN KEY (ПреподавательID) REFERENCES Преподаватели(ID),
+        FOREIGN KEY (ДисциплинаID) REFERENCES Дисциплины(ID)
+    );
+
+    CREATE TABLE IF NOT EXISTS Дисциплина_Кабинет (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ДисциплинаID INTEGER NOT NULL,
+        КабинетID INTEGER NOT NULL,
+        FOREIGN KEY (ДисциплинаID) REFERENCES Дисциплины(ID) ON DELETE CASCADE,
+        FOREIGN KEY (КабинетID) REFERENCES Кабинеты(ID) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS Нагрузка (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ПреподавательID INTEGER NOT NULL,
+        ДисциплинаID INTEGER NOT NULL,
+        ГруппаID INTEGER NOT NULL,
+        Часы INTEGER NOT NULL,
+        FOREIGN KEY (ПреподавательID) REFERENCES Преподаватели(ID),
+        FOREIGN KEY (ДисциплинаID) REFERENCES Дисциплины(ID),
+        FOREIGN KEY (ГруппаID) REFERENCES Группы(ID)
+    );
+
+    CREATE TABLE IF NOT EXISTS Настройки (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Ключ TEXT NOT NULL UNIQUE,
+        Значение TEXT,
+        Тип TEXT DEFAULT 'TEXT'
+    );
+
+    CREATE TABLE IF NOT EXISTS Потоки (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Поток TEXT NOT NULL,
+        Группа1_ID INTEGER NOT NULL,
+        Группа2_ID INTEGER,
+        Группа3_ID INTEGER,
+        Группа4_ID INTEGER,
+        FOREIGN KEY (Группа1_ID) REFERENCES Группы(ID),
+        FOREIGN KEY (Группа2_ID) REFERENCES Группы(ID),
+        FOREIGN KEY (Группа3_ID) REFERENCES Группы(ID),
+        FOREIGN KEY (Группа4_ID) REFERENCES Группы(ID)
+    );
+
+    CREATE TABLE IF NOT EXISTS Поток_Дисциплина (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ПотокID INTEGER NOT NULL,
+        ДисциплинаID INTEGER NOT NULL,
+        FOREIGN KEY (ПотокID) REFERENCES Потоки(ID) ON DELETE CASCADE,
+        FOREIGN KEY (ДисциплинаID) REFERENCES Дисциплины(ID) ON DELETE CASCADE
+    );
+"""
+
+
+# ========== 2. ИНДЕКСЫ ==========
+# Индексы по внешним ключам и полям поиска: без них JOIN-ы и проверки
+# существования записей выполняются полным просмотром таблиц
+INDEXES_V2 = """
+    CREATE INDEX IF NOT EXISTS idx_Нагрузка_Преподаватель_Дисциплина_Группа
+        ON Нагрузка (ПреподавательID, ДисциплинаID, ГруппаID);
+    CREATE INDEX IF NOT EXISTS idx_Нагрузка_ДисциплинаID ON Нагрузка (ДисциплинаID);
+    CREATE INDEX IF NOT EXISTS idx_Нагрузка_ГруппаID ON Нагрузка (ГруппаID);
+    CREATE INDEX IF NOT EXISTS idx_Преподаватель_Территория_ПреподавательID
+        ON Преподаватель_Территория (ПреподавательID);
+    CREATE INDEX IF NOT EXISTS idx_Преподаватель_Дисциплина_ПреподавательID
+        ON Преподаватель_Дисциплина (ПреподавательID);
+    CREATE INDEX IF NOT EXISTS idx_Дисциплина_Кабинет_ДисциплинаID ON Дисциплина_Кабинет (ДисциплинаID);
+    CREATE INDEX IF NOT EXISTS idx_Дисциплина_Кабинет_КабинетID ON Дисциплина_Кабинет (КабинетID);
+    CREATE INDEX IF NOT EXISTS idx_Поток_Дисциплина_ПотокID ON Поток_Дисциплина (ПотокID);
+    CREATE INDEX IF NOT EXISTS idx_Кабинеты_ТерриторияID ON Кабинеты (ТерриторияID);
+    CREATE INDEX IF NOT EXISTS idx_Группы_Группа_Подгруппа ON Группы (Группа, Подгруппа);
+    CREATE INDEX IF NOT EXISTS idx_Преподаватели_ФИО ON Преподаватели (ФИО);
+    CREATE INDEX IF NOT EXISTS idx_Дисциплины_Дисциплина ON Дисциплины (Дисциплина);
+"""
+
+
+# ========== 3. ПОЛНОТЕКСТОВЫЙ ПОИСК ==========
+# Таблицы FTS5 для разделов данных. В каждой строке — текст, который видит пользователь
+# (в том числе названия из связанных таблиц), rowid совпадает с ID записи раздела.
+# Триггеры пересобирают строки поиска при изменении как самой записи, так и связанных справочников.
+# Буква ё заменяется на е, чтобы «Пётр» находился и по «петр».
+
+def _fold(expr: str) -> str:
+    return f"replace(replace({expr}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+# (таблица поиска, колонки, SELECT строк по списку ID {ids},
+#  [(таблица-источник, отслеживаемые колонки, ID строк поиска через {row}, это подзапрос)])
+FTS_V3_SPECS = [
+    ('Поиск_Преподаватели', ['ФИО', 'Дни_занятий', 'Территории'],
+     f"""SELECT п.ID, {_fold('п.ФИО')}, {_fold('п.[Дни занятий]')},
+            (SELECT {_fold("group_concat(т.Территория, ' ')")}
+             FROM Преподаватель_Территория пт JOIN Территории т ON т.ID = пт.ТерриторияID
+             WHERE пт.ПреподавательID = п.ID)
+        FROM Преподаватели п WHERE п.ID IN ({{ids}})""",
+     [('Преподаватели', ['ФИО', '[Дни занятий]'], '{row}.ID', False),
+      ('Преподаватель_Территория', ['ПреподавательID', 'ТерриторияID'], '{row}.ПреподавательID', False),
+      ('Территории', ['Территория'],
+       'SELECT ПреподавательID FROM Преподаватель_Территория WHERE ТерриторияID = {row}.ID', True)]),
+
+    ('Поиск_Дисциплины', ['Дисциплина', 'Модуль', 'Название_модуля'],
+     f"""SELECT д.ID, {_fold('д.Дисциплина')}, д.Модуль, {_fold('м.Название')}
+        FROM Дисциплины д LEFT JOIN Модули м ON д.Модуль = м.Код
+        WHERE д.ID IN ({{ids}})""",
+     [('Дисциплины', ['Дисциплина', 'Модуль'], '{row}.ID', False),
+      ('Модули', ['Код', 'Название'], 'SELECT ID FROM Дисциплины WHERE Модуль = {row}.Код', True)]),
+
+    ('Поиск_Группы', ['Группа', 'Подгруппа'],
+     f"""SELECT г.ID, {_fold('г.Группа')}, {_fold('г.Подгруппа')}
+        FROM Группы г WHERE г.ID IN ({{ids}})""",
+     [('Группы', ['Группа', 'Подгруппа'], '{row}.ID', False)]),
+
+    ('Поиск_Кабинеты', ['Кабинет', 'Территория'],
+     f"""SELECT к.ID, {_fold('к.Кабинет')}, {_fold('т.Территория')}
+        FROM Кабинеты к LEFT JOIN Территории т ON к.ТерриторияID = т.ID
+        WHERE к.ID IN ({{ids}})""",
+     [('Кабинеты', ['Кабинет', 'ТерриторияID'], '{row}.ID', False),
+      ('Территории', ['Территория'], 'SELECT ID FROM Кабинеты WHERE ТерриторияID = {row}.ID', True)]),
+
+    ('Поиск_Нагрузка', ['Преподаватель', 'Дисциплина', 'Группа', 'Подгруппа'],
+     f"""SELECT н.ID, {_fold('п.ФИО')}, {_fold('д.Дисциплина')}, {_fold('г.Группа')}, {_fold('г.Подгруппа')}
+        FROM Нагрузка н
+        LEFT JOIN Преподаватели п ON н.ПреподавательID = п.ID
+        LEFT JOIN Дисциплины д ON н.ДисциплинаID = д.ID
+        LEFT JOIN Группы г ON н.ГруппаID = г.ID
+        WHERE н.ID IN ({{ids}})""",
+     [('Нагрузка', ['ПреподавательID', 'ДисциплинаID', 'ГруппаID'], '{row}.ID', False),
+      ('Преподаватели', ['ФИО'], 'SELECT ID FROM Нагрузка WHERE ПреподавательID = {row}.ID', True),
+      ('Дисциплины', ['Дисциплина'], 'SELECT ID FROM Нагрузка WHERE ДисциплинаID = {row}.ID', True),
+      ('Группы', ['Группа', 'Подгруппа'], 'SELECT ID FROM Нагрузка WHERE ГруппаID = {row}.ID', True)]),
+]
+
+
+def fts_triggers_script(specs) -> str:
+    """DDL триггеров синхронизации таблиц поиска (нужен и при пересоздании исходных таблиц)"""
+    parts = []
+    for fts_table, columns, select, sources in specs:
+        column_list = ', '.join(columns)
+        for source, watched, ids, is_query in sources:
+            events = [
+                ('ins', 'AFTER INSERT', ['NEW']),
+                ('del', 'AFTER DELETE', ['OLD']),
+                ('upd', f"AFTER UPDATE OF {', '.join(watched)}", ['OLD', 'NEW']),
+            ]
+            for suffix, event, rows in events:
+                if is_query:
+                    id_list = ' UNION '.join(ids.format(row=row) for row in rows)
+                else:
+                    id_list = ', '.join(ids.format(row=row) for row in rows)
+                parts.append(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_{source}_{suffix} {event} ON {source}
+    BEGIN
+        DELETE FROM {fts_table} WHERE rowid IN ({id_list});
+        INSERT INTO {fts_table} (rowid, {column_list}) {select.format(ids=id_list)};
+    END;""")
+    return '\n'.join(parts)
+
+
+def _fts_script(specs) -> str:
+    parts = []
+    for fts_table, columns, select, sources in specs:
+        base_table = sources[0][0]
+        parts.append(f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+        {', '.join(columns)}, tokenize = 'unicode61 remove_diacritics 2'
+    );
+    DELETE FROM {fts_table};
+    INSERT INTO {fts_table} (rowid, {', '.join(columns)}) {select.format(ids=f'SELECT ID FROM {base_table}')};""")
+    parts.append(fts_triggers_script(specs))
+    return '\n'.join(parts)
+
+
+FTS_V3 = _fts_script(FTS_V3_SPECS)
+
+
+# ========== 4. УНИКАЛЬНОСТЬ НАГРУЗКИ ==========
+# Преподаватель ведёт дисциплину у группы не больше одного раза. Повторы, накопившиеся до ограничения,
+# сливаются в самую раннюю запись: ей достаётся наибольшее число часов из повторов (повтор — это та же
+# нагрузка, введённая ещё раз, а не дополнительные часы). Каждая удалённая строка выводится в журнал.
+# Составной индекс заменяется уникальным
+def _workload_unique_v4(conn: sqlite3.Connection):
+    duplicates = conn.execute("""
+        SELECT н.ID, н.ПреподавательID, н.ДисциплинаID, н.ГруппаID, н.Часы, п.ID, п.Часы
+        FROM Нагрузка н
+        JOIN (SELECT MIN(ID) AS ID, MAX(Часы) AS Часы, ПреподавательID, ДисциплинаID, ГруппаID
+              FROM Нагрузка
+              GROUP BY ПреподавательID, ДисциплинаID, ГруппаID
+              HAVING COUNT(*) > 1) п
+          ON п.ПреподавательID = н.ПреподавательID AND п.ДисциплинаID = н.ДисциплинаID
+         AND п.ГруппаID = н.ГруппаID
+        ORDER BY п.ID, н.ID""").fetchall()
+
+    for row_id, teacher_id, subject_id, group_id, hours, kept_id, kept_hours in duplicates:
+        if row_id == kept_id:
+            conn.execute("UPDATE Нагрузка SET Часы = ? WHERE ID = ?", (kept_hours, kept_id))
+            continue
+        print(f"Удалён повтор нагрузки ID {row_id} (преподаватель {teacher_id}, дисциплина {subject_id}, "
+              f"группа {group_id}, часов {hours}): оставлена запись ID {kept_id} с {kept_hours} ч.")
+        conn.execute("DELETE FROM Нагрузка WHERE ID = ?", (row_id,))
+
+    conn.execute("DROP INDEX IF EXISTS idx_Нагрузка_Преподаватель_Дисциплина_Группа")
+    conn.execute("""CREATE UNIQUE INDEX IF NOT EXISTS ux_Нагрузка_Преподаватель_Дисциплина_Группа
+                    ON Нагрузка (ПреподавательID, ДисциплинаID, ГруппаID)""")
+
+
+# ========== 5. ВНЕШНИЕ КЛЮЧИ ==========
+# Связующие таблицы удаляются вместе с записями, на которые ссылаются, группы потока 2–4 обнуляются.
+# Нагрузку и дисциплины модуля молча не удаляем (RESTRICT): преподавателя, дисциплину, группу
+# или модуль, на которые они ссылаются, сначала нужно освободить. Смена кода модуля переносится в дисциплины.
+# SQLite не умеет менять внешние ключи у существующей таблицы, поэтому таблицы пересоздаются
+# (migrate выключает PRAGMA foreign_keys на время миграций). {name} — имя новой таблицы.
+FOREIGN_KEYS_V5_TABLES = [
+    ('Дисциплины', """
+    CREATE TABLE {name} (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Дисциплина TEXT NOT NULL,
+        Модуль TEXT NOT NULL,
+        FOREIGN KEY (Модуль) REFERENCES Модули(Код) ON DELETE RESTRICT ON UPDATE CASCADE
+    )"""),
+    ('Преподаватель_Территория', """
+    CREATE TABLE {name} (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ПреподавательID INTEGER NOT NULL,
+        ТерриторияID INTEGER NOT NULL,
+        FOREIGN KEY (ПреподавательID) REFERENCES Преподаватели(ID) ON DELETE CASCADE,
+        FOREIGN KEY (ТерриторияID) REFERENCES Территории(ID) ON DELETE CASCADE
+    )"""),
+    ('Преподаватель_Дисциплина', """
+    CREATE TABLE {name} (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ПреподавательID INTEGER NOT NULL,
+        ДисциплинаID INTEGER NOT NULL,
+        FOREIGN KEY (ПреподавательID) REFERENCES Преподаватели(ID) ON DELETE CASCADE,
+        FOREIGN KEY (ДисциплинаID) REFERENCES Дисциплины(ID) ON DELETE CASCADE
+    )"""),
+    ('Нагрузка', """
+    CREATE TABLE {name} (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ПреподавательID INTEGER NOT NULL,
+        ДисциплинаID INTEGER NOT NULL,
+        ГруппаID INTEGER NOT NULL,
+        Часы INTEGER NOT NULL,
+        FOREIGN KEY (ПреподавательID) REFERENCES Преподаватели(ID) ON DELETE RESTRICT,
+        FOREIGN KEY (ДисциплинаID) REFERENCES Дисциплины(ID) ON DELETE RESTRICT,
+        FOREIGN KEY (ГруппаID) REFERENCES Группы(ID) ON DELETE RESTRICT
+    )"""),
+    ('Потоки', """
+    CREATE TABLE {name} (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Поток TEXT NOT NULL,
+        Группа1_ID INTEGER NOT NULL,
+        Группа2_ID INTEGER,
+        Группа3_ID INTEGER,
+        Группа4_ID INTEGER,
+        FOREIGN KEY (Группа1_ID) REFERENCES Группы(ID) ON DELETE CASCADE,
+        FOREIGN KEY (Группа2_ID) REFERENCES Группы(ID) ON DELETE SET NULL,
+        FOREIGN KEY (Группа3_ID) REFERENCES Группы(ID) ON DELETE SET NULL,
+        FOREIGN KEY (Группа4_ID) REFERENCES Группы(ID) ON DELETE SET NULL
+    )"""),
+]
+
+
+def rebuild_table(conn: sqlite3.Connection, table: str, create_sql: str):
+    """
+    Пересоздаёт таблицу по новому определению с сохранением строк, индексов и счётчика AUTOINCREMENT.
+    Триггеры, ссылающиеся на таблицу, вызывающий код снимает до и восстанавливает после.
+    """
+    new_table = f"{table}_new"
+    indexes = [sql for (sql,) in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+    )]
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+
+    conn.execute(create_sql.format(name=new_table))
+    new_columns = {row[1] for row in conn.execute(f"PRAGMA table_info({new_table})")}
+    columns = ', '.join(f'"{row[1]}"' for row in conn.execute(f"PRAGMA table_info({table})")
+                        if row[1] in new_columns)
+    conn.execute(f"INSERT INTO {new_table} ({columns}) SELECT {columns} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+
+    for sql in indexes:
+        conn.execute(sql)
+    if sequence:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table))
+
+
+def remove_orphans(conn: sqlite3.Connection):
+    """
+    Убирает строки, ссылающиеся на несуществующие записи (накопились, пока внешние ключи не проверялись):
+    при ON DELETE CASCADE строка удаляется, при SET NULL ссылка обнуляется
+    """
+    while True:
+        fixed = 0
+        for table, rowid, parent, fk_id in conn.execute("PRAGMA foreign_key_check").fetchall():
+            column, action = next(
+                (row[3], row[6]) for row in conn.execute(f"PRAGMA foreign_key_list({table})") if row[0] == fk_id
+            )
+            if action == 'CASCADE':
+                conn.execute(f"DELETE FROM {table} WHERE rowid = ?", (rowid,))
+            elif action == 'SET NULL':
+                conn.execute(f'UPDATE {table} SET "{column}" = NULL WHERE rowid = ?', (rowid,))
+            else:
+                print(f"Строка {rowid} таблицы {table} ссылается на отсутствующую запись в {parent}")
+                continue
+            fixed += 1
+        # Удалённые строки могут сами быть родителями (например, поток и его дисциплины)
+        if not fixed:
+            return
+
+
+def _foreign_keys_v5(conn: sqlite3.Connection):
+    # Триггеры поиска ссылаются на пересоздаваемые таблицы: снимаем их на время пересоздания
+    triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall()
+    for name, _ in triggers:
+        conn.execute(f'DROP TRIGGER "{name}"')
+
+    for table, create_sql in FOREIGN_KEYS_V5_TABLES:
+        rebuild_table(conn, table, create_sql)
+
+    for _, sql in triggers:
+        conn.execute(sql)
+
+    remove_orphans(conn)
+
+
+# ========== 6. СОСТАВ ПОТОКОВ ==========
+# Группы потока переносятся из колонок Группа1_ID…Группа4_ID в связующую таблицу:
+# число групп не ограничено, а потоки группы находятся по индексу
+STREAM_GROUPS_V6_TABLE = """
+    CREATE TABLE IF NOT EXISTS Поток_Группа (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ПотокID INTEGER NOT NULL,
+        ГруппаID INTEGER NOT NULL,
+        Порядок INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (ПотокID, ГруппаID),
+        FOREIGN KEY (ПотокID) REFERENCES Потоки(ID) ON DELETE CASCADE,
+        FOREIGN KEY (ГруппаID) REFERENCES Группы(ID) ON DELETE CASCADE
+    )"""
+
+STREAMS_V6_TABLE = """
+    CREATE TABLE {name} (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Поток TEXT NOT NULL
+    )"""
+
+
+def _stream_groups_v6(conn: sqlite3.Connection):
+    conn.execute(STREAM_GROUPS_V6_TABLE)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_Поток_Группа_ГруппаID ON Поток_Группа (ГруппаID)")
+    conn.execute("""
+        INSERT OR IGNORE INTO Поток_Группа (ПотокID, ГруппаID, Порядок)
+        SELECT ПотокID, ГруппаID, Порядок FROM (
+            SELECT ID AS ПотокID, Группа1_ID AS ГруппаID, 1 AS Порядок FROM Потоки
+            UNION ALL SELECT ID, Группа2_ID, 2 FROM Потоки
+            UNION ALL SELECT ID, Группа3_ID, 3 FROM Потоки
+            UNION ALL SELECT ID, Группа4_ID, 4 FROM Потоки
+        )
+        WHERE ГруппаID IS NOT NULL
+        ORDER BY ПотокID, Порядок""")
+    rebuild_table(conn, 'Потоки', STREAMS_V6_TABLE)
+    remove_orphans(conn)
+
+
+MIGRATIONS: List[Tuple[int, str, Migration]] = [
+    (1, "Базовая схема", SCHEMA_V1),
+    (2, "Индексы по внешним ключам и полям поиска", INDEXES_V2),
+    (3, "Полнотекстовый поиск по разделам данных", FTS_V3),
+    (4, "Уникальность нагрузки преподавателя по дисциплине и группе", _workload_unique_v4),
+    (5, "Каскадное удаление по внешним ключам", _foreign_keys_v5),
+    (6, "Состав потоков в таблице Поток_Группа", _stream_groups_v6),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _apply(conn: sqlite3.Connection, version: int, step: Migration):
+    if isinstance(step, str):
+        # executescript сам фиксирует открытую транзакцию, поэтому границы задаём в скрипте
+        try:
+            conn.executescript(f"BEGIN;\n{step}\nPRAGMA user_version = {version};\nCOMMIT;")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        return
+
+    conn.execute("BEGIN")
+    try:
+        step(conn)
+        conn.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Применяет недостающие миграции по порядку и возвращает итоговую версию схемы.
+    Если схема актуальна, выполняется только чтение PRAGMA user_version.
+    """
+    current = get_schema_version(conn)
+    if current >= LATEST_VERSION:
+        return current
+
+    # Пересоздание таблиц при включённых внешних ключах удаляло бы связанные строки каскадом.
+    # PRAGMA foreign_keys не действует внутри транзакции, поэтому переключается вокруг всех шагов
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for version, description, step in MIGRATIONS:
+            if version <= current:
+                continue
+            try:
+                _apply(conn, version, step)
+            except sqlite3.Error as e:
+                print(f"Ошибка миграции схемы {version} ({description}): {e}")
+                raise
+            print(f"Применена миграция схемы {version}: {description}")
+            current = version
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {foreign_keys}")
+
+    return current
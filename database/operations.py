@@ -1,20 +1,57 @@
-import sqlite3
-from typing import List, Dict, Any, Optional, Tuple
+import re, sqlite3
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from .core import Database
+from .cache import ReferenceCache, SettingsCache, cached_reference
+from .async_ops import AsyncDBOperations
+from .backup import BackupService
 
 
 class DBOperations:
-    def __init__(self, db_name: str = "schedule.db"):
-        self.db = Database(db_name)
+    def __init__(self, db_name: str = "schedule.db", pool_size: int = 5, cache_size: int = 64):
+        self.db = Database(db_name, pool_size)
+        self._async_ops = None
+        self._backups = None
+        self.reference_cache = ReferenceCache(cache_size)
+        self.db.add_change_listener(self.reference_cache.invalidate)
+        self.settings_cache = SettingsCache()
+        self.db.add_change_listener(self.settings_cache.invalidate)
+
+    @property
+    def async_ops(self) -> AsyncDBOperations:
+        """Асинхронный фасад для обработчиков интерфейса (создаётся при первом обращении)"""
+        if self._async_ops is None:
+            self._async_ops = AsyncDBOperations(self)
+        return self._async_ops
+
+    @property
+    def backups(self) -> BackupService:
+        """Резервные копии базы (каталог backups рядом с файлом базы)"""
+        if self._backups is None:
+            self._backups = BackupService(self.db)
+        return self._backups
+
+    def close(self):
+        if self._async_ops is not None:
+            self._async_ops.close()
+        self.db.close()
 
     # ========== УНИВЕРСАЛЬНЫЕ МЕТОДЫ РАБОТЫ С ТАБЛИЦАМИ ==========
-    def get_table_data(self, table_name: str) -> List[Dict[str, Any]]:
+    def get_table_data(self, table_name: str, row_mode: str = 'dict') -> List[Dict[str, Any]]:
         try:
-            return self.db.execute_query(f"SELECT * FROM {table_name}")
+            return self.db.execute_query(f"SELECT * FROM {table_name}", row_mode=row_mode)
         except Exception as e:
             print(f"Ошибка при получении данных из таблицы {table_name}: {e}")
             return []
 
+    def iter_table_data(self, table_name: str, batch_size: int = 500,
+                        row_mode: str = 'dict') -> Iterator[Any]:
+        """Построчное чтение таблицы без загрузки её целиком"""
+        try:
+            yield from self.db.iter_query(f"SELECT * FROM {table_name} ORDER BY ID",
+                                          batch_size=batch_size, row_mode=row_mode)
+        except Exception as e:
+            print(f"Ошибка при чтении данных из таблицы {table_name}: {e}")
+
     def get_table_columns(self, table_name: str) -> List[str]:
         try:
             conn = self.db._get_connection()
@@ -44,6 +81,31 @@ class DBOperations:
             print(f"Ошибка при вставке данных в таблицу {table_name}: {e}")
             return False
 
+    # Таблица -> [(зависимая таблица, колонка ссылки, колонка родителя)] для внешних ключей ON DELETE RESTRICT:
+    # такие записи нельзя удалить, пока на них ссылаются
+    _RESTRICTED_DEPENDENTS = {
+        'Преподаватели': [('Нагрузка', 'ПреподавательID', 'ID')],
+        'Дисциплины': [('Нагрузка', 'ДисциплинаID', 'ID')],
+        'Группы': [('Нагрузка', 'ГруппаID', 'ID')],
+        'Модули': [('Дисциплины', 'Модуль', 'Код')],
+    }
+
+    def get_delete_blockers(self, table_name: str, record_id: int) -> Dict[str, int]:
+        """{зависимая таблица: число строк}, из-за которых запись нельзя удалить"""
+        blockers = {}
+        try:
+            for child, column, parent_column in self._RESTRICTED_DEPENDENTS.get(table_name, []):
+                result = self.db.execute_query(
+                    f"SELECT COUNT(*) FROM {child} WHERE {column} = "
+                    f"(SELECT {parent_column} FROM {table_name} WHERE ID = ?)",
+                    (record_id,), row_mode='tuple'
+                )
+                if result and result[0][0]:
+                    blockers[child] = result[0][0]
+        except Exception as e:
+            print(f"Ошибка при проверке связанных записей {table_name}: {e}")
+        return blockers
+
     def delete_record(self, table_name: str, record_id: int) -> bool:
         try:
             return self.db.execute_command(f"DELETE FROM {table_name} WHERE ID = ?", (record_id,))
@@ -69,18 +131,24 @@ class DBOperations:
             return False
 
     # ========== ГРУППЫ ==========
+    @cached_reference('Группы')
     def get_groups(self) -> List[Dict[str, Any]]:
         try:
-            query = """
-                SELECT ID, Группа, Подгруппа, Самообразование, [Разговоры о важном] 
-                FROM Группы 
-                ORDER BY Группа COLLATE NOCASE, Подгруппа COLLATE NOCASE
-            """
-            return self.db.execute_query(query)
+            return self._load_groups()
         except Exception as e:
             print(f"Ошибка при получении групп: {e}")
             return []
 
+    def _load_groups(self, where: str = "", params: tuple = ()) -> List[Dict[str, Any]]:
+        # where — условие отбора из search(), колонка ID без псевдонима таблицы
+        query = f"""
+            SELECT ID, Группа, Подгруппа, Самообразование, [Разговоры о важном] 
+            FROM Группы 
+            {where}
+            ORDER BY Группа COLLATE NOCASE, Подгруппа COLLATE NOCASE
+        """
+        return self.db.execute_query(query, params)
+
     def _validate_group_insert(self, group_name: str, subgroup: str) -> Tuple[bool, str]:
         if ("ХКО" in group_name.upper() or "ХБО" in group_name.upper()):
             if subgroup == "Нет":
@@ -208,6 +276,7 @@ class DBOperations:
         return self._check_duplicate_group(group_name, subgroup, exclude_id)
 
     # ========== МОДУЛИ ==========
+    @cached_reference('Модули')
     def get_modules(self) -> List[Dict[str, Any]]:
         try:
             return self.db.execute_query("SELECT ID, Код, Название FROM Модули ORDER BY Код COLLATE NOCASE")
@@ -271,31 +340,37 @@ class DBOperations:
             print(f"Ошибка при проверке существования дисциплины: {e}")
             return False
 
+    @cached_reference('Дисциплины', 'Модули')
     def get_subjects_with_module_names(self) -> List[Dict[str, Any]]:
         try:
-            query = """
-                SELECT 
-                    d.ID, 
-                    d.Дисциплина as Дисциплина, 
-                    d.Модуль as [Код модуля],
-                    m.Название as [Название модуля]
-                FROM Дисциплины d
-                LEFT JOIN Модули m ON d.Модуль = m.Код
-                ORDER BY d.Модуль COLLATE NOCASE, d.Дисциплина COLLATE NOCASE
-            """
-            subjects = self.db.execute_query(query)
-
-            for subject in subjects:
-                if subject['Код модуля'] is None:
-                    subject['Код модуля'] = ''
-                if subject['Название модуля'] is None:
-                    subject['Название модуля'] = ''
-
-            return subjects
+            return self._load_subjects_with_module_names()
         except Exception as e:
             print(f"Ошибка при получении дисциплин с модулями: {e}")
             return []
 
+    def _load_subjects_with_module_names(self, where: str = "", params: tuple = ()) -> List[Dict[str, Any]]:
+        # where — условие отбора из search() по колонкам d (Дисциплины)
+        query = f"""
+            SELECT 
+                d.ID, 
+                d.Дисциплина as Дисциплина, 
+                d.Модуль as [Код модуля],
+                m.Название as [Название модуля]
+            FROM Дисциплины d
+            LEFT JOIN Модули m ON d.Модуль = m.Код
+            {where}
+            ORDER BY d.Модуль COLLATE NOCASE, d.Дисциплина COLLATE NOCASE
+        """
+        subjects = self.db.execute_query(query, params)
+
+        for subject in subjects:
+            if subject['Код модуля'] is None:
+                subject['Код модуля'] = ''
+            if subject['Название модуля'] is None:
+                subject['Название модуля'] = ''
+
+        return subjects
+
     def insert_subject_with_classrooms(self, subject_data: Dict[str, Any], classroom_ids: List[int]) -> bool:
         conn = self.db._get_connection()
         cursor = conn.cursor()
@@ -308,11 +383,10 @@ class DBOperations:
 
             subject_id = cursor.lastrowid
 
-            for classroom_id in classroom_ids:
-                cursor.execute(
-                    "INSERT INTO Дисциплина_Кабинет (ДисциплинаID, КабинетID) VALUES (?, ?)",
-                    (subject_id, classroom_id)
-                )
+            cursor.executemany(
+                "INSERT INTO Дисциплина_Кабинет (ДисциплинаID, КабинетID) VALUES (?, ?)",
+                [(subject_id, classroom_id) for classroom_id in classroom_ids]
+            )
 
             conn.commit()
             return True
@@ -336,11 +410,10 @@ class DBOperations:
 
             cursor.execute("DELETE FROM Дисциплина_Кабинет WHERE ДисциплинаID = ?", (subject_id,))
 
-            for classroom_id in classroom_ids:
-                cursor.execute(
-                    "INSERT INTO Дисциплина_Кабинет (ДисциплинаID, КабинетID) VALUES (?, ?)",
-                    (subject_id, classroom_id)
-                )
+            cursor.executemany(
+                "INSERT INTO Дисциплина_Кабинет (ДисциплинаID, КабинетID) VALUES (?, ?)",
+                [(subject_id, classroom_id) for classroom_id in classroom_ids]
+            )
 
             conn.commit()
             return True
@@ -365,7 +438,29 @@ class DBOperations:
             print(f"Ошибка при получении кабинетов по дисциплинам: {e}")
             return []
 
+    def get_subject_classroom_map(self) -> Dict[int, List[Dict[str, Any]]]:
+        """Кабинеты с территориями для всех дисциплин сразу: {ДисциплинаID: [кабинеты]}"""
+        try:
+            rows = self.db.execute_query(
+                """SELECT пк.ДисциплинаID, к.ID, к.Кабинет, т.Территория
+                FROM Дисциплина_Кабинет пк
+                JOIN Кабинеты к ON к.ID = пк.КабинетID
+                JOIN Территории т ON к.ТерриторияID = т.ID
+                ORDER BY пк.ДисциплинаID, пк.ID""",
+                row_mode='tuple'
+            )
+            classroom_map = {}
+            for subject_id, classroom_id, number, territory in rows:
+                classroom_map.setdefault(subject_id, []).append(
+                    {'ID': classroom_id, 'Кабинет': number, 'Территория': territory}
+                )
+            return classroom_map
+        except Exception as e:
+            print(f"Ошибка при получении кабинетов дисциплин: {e}")
+            return {}
+
     # ========== ТЕРРИТОРИИ И КАБИНЕТЫ ==========
+    @cached_reference('Территории')
     def get_territories(self) -> List[Dict[str, Any]]:
         try:
             return self.db.execute_query(
@@ -374,23 +469,29 @@ class DBOperations:
             print(f"Ошибка при получении территорий: {e}")
             return []
 
+    @cached_reference('Кабинеты', 'Территории')
     def get_classrooms_with_territory_names(self) -> List[Dict[str, Any]]:
         try:
-            query = """
-                SELECT 
-                к.ID, 
-                к.Кабинет as [Номер кабинета],
-                т.Территория as Территория,
-                к.Вместимость
-            FROM Кабинеты к
-            LEFT JOIN Территории т ON к.ТерриторияID = т.ID
-            ORDER BY т.Территория COLLATE NOCASE, к.Кабинет COLLATE NOCASE
-            """
-            return self.db.execute_query(query)
+            return self._load_classrooms_with_territory_names()
         except Exception as e:
             print(f"Ошибка при получении кабинетов с территориями: {e}")
             return []
 
+    def _load_classrooms_with_territory_names(self, where: str = "", params: tuple = ()) -> List[Dict[str, Any]]:
+        # where — условие отбора из search() по колонкам к (Кабинеты)
+        query = f"""
+            SELECT 
+            к.ID, 
+            к.Кабинет as [Номер кабинета],
+            т.Территория as Территория,
+            к.Вместимость
+        FROM Кабинеты к
+        LEFT JOIN Территории т ON к.ТерриторияID = т.ID
+        {where}
+        ORDER BY т.Территория COLLATE NOCASE, к.Кабинет COLLATE NOCASE
+        """
+        return self.db.execute_query(query, params)
+
     def get_classrooms_by_territory(self, territory_id: int) -> List[Dict[str, Any]]:
         try:
             return self.db.execute_query(
@@ -424,28 +525,12 @@ class DBOperations:
             return False
 
     def delete_territory_with_classrooms(self, territory_id: int) -> bool:
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-
+        """Кабинеты территории, их привязки к дисциплинам и к преподавателям удаляются каскадом"""
         try:
-            cursor.execute("""
-                DELETE FROM Дисциплина_Кабинет 
-                WHERE КабинетID IN (
-                    SELECT ID FROM Кабинеты WHERE ТерриторияID = ?
-                )
-            """, (territory_id,))
-
-            cursor.execute("DELETE FROM Кабинеты WHERE ТерриторияID = ?", (territory_id,))
-            cursor.execute("DELETE FROM Территории WHERE ID = ?", (territory_id,))
-
-            conn.commit()
-            return True
-        except sqlite3.Error as e:
+            return self.db.execute_command("DELETE FROM Территории WHERE ID = ?", (territory_id,))
+        except Exception as e:
             print(f"Ошибка при удалении территории: {e}")
-            conn.rollback()
             return False
-        finally:
-            conn.close()
 
     def check_territory_exists(self, name: str) -> bool:
         try:
@@ -481,40 +566,66 @@ class DBOperations:
             return None
 
     # ========== ПРЕПОДАВАТЕЛИ ==========
-    def get_teachers_with_preferences(self) -> List[Dict[str, Any]]:
+    def get_teacher_profiles(self) -> List[Dict[str, Any]]:
+        """
+        Преподаватели с предпочтениями и списком территорий одним запросом.
+        'Территории' — территории в порядке назначения, 'Территория' — первые две для отображения.
+        """
         try:
-            query = """
-                    SELECT ID, ФИО, 
-                           CASE WHEN Совместитель = 1 THEN 'Да' ELSE 'Нет' END as Совместитель,
-                           COALESCE([Дни занятий], 'Любые') as [Дни занятий]
-                    FROM Преподаватели 
-                    ORDER BY ФИО COLLATE NOCASE
-                    """
-            teachers = self.db.execute_query(query)
-
-            for teacher in teachers:
-                teacher_id = teacher['ID']
-                territory_result = self.db.execute_query(
-                    """SELECT т.ID, т.Территория as Название
-                    FROM Преподаватель_Территория пт
-                    JOIN Территории т ON пт.ТерриторияID = т.ID
-                    WHERE пт.ПреподавательID = ?
-                    ORDER BY пт.ID
-                    LIMIT 2""",
-                    (teacher_id,)
-                )
+            return self._load_teacher_profiles()
+        except Exception as e:
+            print(f"Ошибка при получении преподавателей: {e}")
+            return []
 
-                if territory_result:
-                    territory_names = [t['Название'] for t in territory_result]
-                    teacher['Территория'] = ', '.join(territory_names)
-                else:
-                    teacher['Территория'] = 'Не указана'
+    def _load_teacher_profiles(self, where: str = "", params: tuple = ()) -> List[Dict[str, Any]]:
+        # where — условие отбора из search() по колонкам п (Преподаватели)
+        query = f"""
+                SELECT п.ID, п.ФИО,
+                       CASE WHEN п.Совместитель = 1 THEN 'Да' ELSE 'Нет' END as Совместитель,
+                       COALESCE(п.[Дни занятий], 'Любые') as [Дни занятий],
+                       т.ID as ТерриторияID,
+                       т.Территория
+                FROM Преподаватели п
+                LEFT JOIN Преподаватель_Территория пт ON пт.ПреподавательID = п.ID
+                LEFT JOIN Территории т ON пт.ТерриторияID = т.ID
+                {where}
+                ORDER BY п.ФИО COLLATE NOCASE, п.ID, пт.ID
+                """
+        teachers = []
+        current = None
+        for row in self.db.execute_query(query, params, row_mode='tuple'):
+            teacher_id, name, part_time, days, territory_id, territory = row
+            if current is None or current['ID'] != teacher_id:
+                current = {
+                    'ID': teacher_id,
+                    'ФИО': name,
+                    'Совместитель': part_time,
+                    'Дни занятий': days,
+                    'Территории': [],
+                }
+                teachers.append(current)
+            if territory_id is not None:
+                current['Территории'].append({'ID': territory_id, 'Территория': territory})
+
+        for teacher in teachers:
+            territory_names = [t['Территория'] for t in teacher['Территории'][:2]]
+            teacher['Территория'] = ', '.join(territory_names) if territory_names else 'Не указана'
+
+        return teachers
 
-            return teachers
+    def get_teachers_with_preferences(self) -> List[Dict[str, Any]]:
+        try:
+            return self._load_teachers_with_preferences()
         except Exception as e:
             print(f"Ошибка при получении преподавателей: {e}")
             return []
 
+    def _load_teachers_with_preferences(self, where: str = "", params: tuple = ()) -> List[Dict[str, Any]]:
+        teachers = self._load_teacher_profiles(where, params)
+        for teacher in teachers:
+            del teacher['Территории']
+        return teachers
+
     def check_teacher_exists(self, name: str) -> bool:
         try:
             result = self.db.execute_query(
@@ -567,11 +678,10 @@ class DBOperations:
 
             teacher_id = cursor.lastrowid
 
-            for territory_id in territory_ids:
-                cursor.execute(
-                    "INSERT INTO Преподаватель_Территория (ПреподавательID, ТерриторияID) VALUES (?, ?)",
-                    (teacher_id, territory_id)
-                )
+            cursor.executemany(
+                "INSERT INTO Преподаватель_Территория (ПреподавательID, ТерриторияID) VALUES (?, ?)",
+                [(teacher_id, territory_id) for territory_id in territory_ids]
+            )
 
             conn.commit()
             return True
@@ -600,11 +710,10 @@ class DBOperations:
 
             cursor.execute("DELETE FROM Преподаватель_Территория WHERE ПреподавательID = ?", (teacher_id,))
 
-            for territory_id in territory_ids:
-                cursor.execute(
-                    "INSERT INTO Преподаватель_Территория (ПреподавательID, ТерриторияID) VALUES (?, ?)",
-                    (teacher_id, territory_id)
-                )
+            cursor.executemany(
+                "INSERT INTO Преподаватель_Территория (ПреподавательID, ТерриторияID) VALUES (?, ?)",
+                [(teacher_id, territory_id) for territory_id in territory_ids]
+            )
 
             conn.commit()
             return True
@@ -616,27 +725,39 @@ class DBOperations:
             conn.close()
 
     # ========== НАГРУЗКА ==========
-    def get_workloads(self) -> List[Dict[str, Any]]:
+    # Нагрузка с названиями вместо ID, в порядке отображения
+    _WORKLOADS_SELECT = """
+        SELECT 
+            н.ID,
+            п.ФИО as Преподаватель,
+            д.Дисциплина as Дисциплина,
+            г.Группа,
+            г.Подгруппа,
+            н.Часы as [Часы в неделю]
+        FROM Нагрузка н
+        LEFT JOIN Преподаватели п ON н.ПреподавательID = п.ID
+        LEFT JOIN Дисциплины д ON н.ДисциплинаID = д.ID
+        LEFT JOIN Группы г ON н.ГруппаID = г.ID
+        """
+    _WORKLOADS_ORDER = """
+        ORDER BY п.ФИО COLLATE NOCASE, д.Дисциплина COLLATE NOCASE, г.Группа COLLATE NOCASE, г.Подгруппа COLLATE NOCASE
+        """
+    _WORKLOADS_QUERY = _WORKLOADS_SELECT + _WORKLOADS_ORDER
+
+    def get_workloads(self, row_mode: str = 'dict') -> List[Dict[str, Any]]:
         try:
-            query = """
-                SELECT 
-                    н.ID,
-                    п.ФИО as Преподаватель,
-                    д.Дисциплина as Дисциплина,
-                    г.Группа,
-                    г.Подгруппа,
-                    н.Часы as [Часы в неделю]
-                FROM Нагрузка н
-                LEFT JOIN Преподаватели п ON н.ПреподавательID = п.ID
-                LEFT JOIN Дисциплины д ON н.ДисциплинаID = д.ID
-                LEFT JOIN Группы г ON н.ГруппаID = г.ID
-                ORDER BY п.ФИО COLLATE NOCASE, д.Дисциплина COLLATE NOCASE, г.Группа COLLATE NOCASE, г.Подгруппа COLLATE NOCASE
-                """
-            return self.db.execute_query(query)
+            return self.db.execute_query(self._WORKLOADS_QUERY, row_mode=row_mode)
         except Exception as e:
             print(f"Ошибка при получении нагрузки: {e}")
             return []
 
+    def iter_workloads(self, batch_size: int = 500, row_mode: str = 'dict') -> Iterator[Any]:
+        """Построчное чтение нагрузки (для экспорта и проверки больших объёмов)"""
+        try:
+            yield from self.db.iter_query(self._WORKLOADS_QUERY, batch_size=batch_size, row_mode=row_mode)
+        except Exception as e:
+            print(f"Ошибка при чтении нагрузки: {e}")
+
     def get_workload_columns(self) -> List[str]:
         try:
             columns = self.get_table_columns("Нагрузка")
@@ -680,10 +801,8 @@ class DBOperations:
                 return False
             group_id = group_result[0]['ID']
 
-            return self.db.execute_command(
-                "INSERT INTO Нагрузка (ПреподавательID, ДисциплинаID, ГруппаID, Часы) VALUES (?, ?, ?, ?)",
-                (teacher_id, subject_id, group_id, workload_data['Часы в неделю'])
-            )
+            results = self.insert_workload_rows([(teacher_id, subject_id, group_id, workload_data['Часы в неделю'])])
+            return bool(results and results[0])
         except Exception as e:
             print(f"Ошибка при добавлении нагрузки: {e}")
             return False
@@ -722,6 +841,130 @@ class DBOperations:
             print(f"Ошибка при обновлении нагрузки: {e}")
             return False
 
+    def get_workload_lookup_maps(self) -> Tuple[Dict[str, int], Dict[str, int], Dict[Tuple[str, str], int]]:
+        """
+        Возвращает словари для разрешения названий в ID:
+        ФИО -> ID преподавателя, название -> ID дисциплины, (группа, подгруппа) -> ID группы
+        """
+        teacher_ids = {}
+        for row in self.db.execute_query("SELECT ID, ФИО FROM Преподаватели ORDER BY ID"):
+            teacher_ids.setdefault(row['ФИО'], row['ID'])
+
+        subject_ids = {}
+        for row in self.db.execute_query("SELECT ID, Дисциплина FROM Дисциплины ORDER BY ID"):
+            subject_ids.setdefault(row['Дисциплина'], row['ID'])
+
+        group_ids = {}
+        for row in self.db.execute_query("SELECT ID, Группа, Подгруппа FROM Группы ORDER BY ID"):
+            group_ids.setdefault((row['Группа'], row['Подгруппа']), row['ID'])
+
+        return teacher_ids, subject_ids, group_ids
+
+    # Повтор (преподаватель, дисциплина, группа) не вставляется: за этим следит уникальный индекс
+    _INSERT_WORKLOAD = """INSERT INTO Нагрузка (ПреподавательID, ДисциплинаID, ГруппаID, Часы) VALUES (?, ?, ?, ?)
+                          ON CONFLICT (ПреподавательID, ДисциплинаID, ГруппаID) DO NOTHING"""
+    # Строк-кандидатов на один запрос проверки: по 3 параметра, с запасом до лимита SQLite (999)
+    _CONFLICT_CHUNK = 300
+
+    def _query_workload_conflicts(self, keys: List[Tuple[int, int, int]],
+                                  exclude_id: Optional[int] = None) -> set:
+        conflicts = set()
+        for start in range(0, len(keys), self._CONFLICT_CHUNK):
+            chunk = keys[start:start + self._CONFLICT_CHUNK]
+            params = [value for key in chunk for value in key]
+            query = f"""
+                WITH Кандидаты (ПреподавательID, ДисциплинаID, ГруппаID) AS (
+                    VALUES {', '.join(['(?, ?, ?)'] * len(chunk))}
+                )
+                SELECT н.ПреподавательID, н.ДисциплинаID, н.ГруппаID
+                FROM Кандидаты к
+                JOIN Нагрузка н ON н.ПреподавательID = к.ПреподавательID
+                    AND н.ДисциплинаID = к.ДисциплинаID AND н.ГруппаID = к.ГруппаID
+            """
+            if exclude_id:
+                query += " WHERE н.ID != ?"
+                params.append(exclude_id)
+            conflicts.update(self.db.execute_query(query, tuple(params), row_mode='tuple'))
+        return conflicts
+
+    def find_workload_conflicts(self, keys, exclude_id: Optional[int] = None) -> set:
+        """
+        Из набора (ПреподавательID, ДисциплинаID, ГруппаID) возвращает те, что уже есть в нагрузке.
+        Весь набор проверяется одним запросом (по _CONFLICT_CHUNK строк), а не запросом на строку.
+        """
+        try:
+            return self._query_workload_conflicts(list(dict.fromkeys(tuple(key) for key in keys)), exclude_id)
+        except Exception as e:
+            print(f"Ошибка при проверке повторяющейся нагрузки: {e}")
+            return set()
+
+    def insert_workload_rows(self, rows: List[Tuple[int, int, int, int]]) -> Optional[List[bool]]:
+        """
+        Добавляет строки (ПреподавательID, ДисциплинаID, ГруппаID, Часы) одной транзакцией.
+        Для каждой строки возвращает True, если она добавлена, и False, если такая нагрузка уже есть
+        в базе или выше в этом же списке; None — если транзакция не удалась.
+        """
+        try:
+            with self.db.write_transaction():
+                # Блокировка на запись взята до проверки, поэтому результат не устареет до вставки
+                taken = self._query_workload_conflicts(list(dict.fromkeys(tuple(row[:3]) for row in rows)))
+                results = []
+                new_rows = []
+                for row in rows:
+                    key = tuple(row[:3])
+                    is_new = key not in taken
+                    results.append(is_new)
+                    if is_new:
+                        taken.add(key)
+                        new_rows.append(row)
+
+                if new_rows and not self.db.execute_many(self._INSERT_WORKLOAD, new_rows):
+                    raise sqlite3.DatabaseError("не удалось добавить строки нагрузки")
+            return results
+        except Exception as e:
+            print(f"Ошибка при добавлении строк нагрузки: {e}")
+            return None
+
+    def insert_workloads_bulk(self, workloads_data: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Добавляет несколько записей нагрузки одной транзакцией.
+        Возвращает список результатов в порядке входных строк (False — не найдены названия или повтор).
+        Если вызывающий код уже разрешил ID (teacher_id, subject_id, group_id в строке), справочники
+        не перечитываются; иначе названия разрешаются по словарям, загруженным один раз на вызов.
+        """
+        results = [False] * len(workloads_data)
+
+        try:
+            lookup_maps = None
+            rows = []
+            row_indexes = []
+            for i, workload_data in enumerate(workloads_data):
+                key = (workload_data.get('teacher_id'), workload_data.get('subject_id'),
+                       workload_data.get('group_id'))
+                if None in key:
+                    if lookup_maps is None:
+                        lookup_maps = self.get_workload_lookup_maps()
+                    teacher_ids, subject_ids, group_ids = lookup_maps
+                    key = (
+                        teacher_ids.get(workload_data['Преподаватель']),
+                        subject_ids.get(workload_data['Дисциплина']),
+                        group_ids.get((workload_data['Группа'], workload_data.get('Подгруппа', 'Нет'))),
+                    )
+                    if None in key:
+                        continue
+
+                rows.append(key + (workload_data['Часы в неделю'],))
+                row_indexes.append(i)
+
+            inserted = self.insert_workload_rows(rows) if rows else None
+            if inserted:
+                for i, success in zip(row_indexes, inserted):
+                    results[i] = success
+        except Exception as e:
+            print(f"Ошибка при пакетном добавлении нагрузки: {e}")
+
+        return results
+
     def delete_workload(self, workload_id: int) -> bool:
         try:
             return self.db.execute_command("DELETE FROM Нагрузка WHERE ID = ?", (workload_id,))
@@ -765,20 +1008,167 @@ class DBOperations:
 
     def check_workload_duplicate(self, teacher_id: int, subject_id: int, group_id: int,
                                  exclude_id: Optional[int] = None) -> bool:
+        return bool(self.find_workload_conflicts([(teacher_id, subject_id, group_id)], exclude_id))
+
+    # ========== ПОИСК ==========
+    # Раздел -> (таблица полнотекстового поиска или None, метод загрузки строк раздела,
+    #            метод загрузки строк по условию WHERE, колонка ID раздела в запросе этого метода)
+    SEARCH_SECTIONS = {
+        "Группы": ("Поиск_Группы", "get_groups", "_load_groups", "ID"),
+        "Дисциплины": ("Поиск_Дисциплины", "get_subjects_with_module_names",
+                       "_load_subjects_with_module_names", "d.ID"),
+        "Преподаватели": ("Поиск_Преподаватели", "get_teachers_with_preferences",
+                          "_load_teachers_with_preferences", "п.ID"),
+        "Кабинеты": ("Поиск_Кабинеты", "get_classrooms_with_territory_names",
+                     "_load_classrooms_with_territory_names", "к.ID"),
+        "Нагрузка": ("Поиск_Нагрузка", "get_workloads", None, "н.ID"),
+        "Модули": (None, "get_modules", None, None),
+    }
+
+    @staticmethod
+    def _fts_match_expression(text: str) -> Optional[str]:
+        """Поисковая строка -> запрос FTS5: все слова обязательны, каждое ищется по префиксу"""
+        text = text.replace('ё', 'е').replace('Ё', 'Е')
+        words = re.findall(r"\w+", text)
+        if not words:
+            return None
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def get_section_data(self, section_name: str) -> List[Dict[str, Any]]:
+        if section_name in self.SEARCH_SECTIONS:
+            return getattr(self, self.SEARCH_SECTIONS[section_name][1])()
+        # Остальные разделы (например, Территории) показываются как есть
+        return self.get_table_data(section_name)
+
+    def search(self, section_name: str, text: str = "",
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Строки раздела, подходящие под поисковую строку и фильтры.
+        Поиск идёт по таблицам FTS5 (по началу слов, без учёта регистра): совпадения по rowid
+        и фильтры входят условием WHERE в запрос строк раздела, весь раздел не загружается.
+        """
+        filters = {key: value for key, value in (filters or {}).items() if value}
+        match = self._fts_match_expression(text or "")
+
+        if section_name == "Нагрузка":
+            return self._search_workloads(text, filters)
+
+        fts_table, _, loader, id_column = self.SEARCH_SECTIONS.get(section_name, (None, None, None, None))
+
+        if fts_table is None:
+            rows = self.get_section_data(section_name)
+            if not text:
+                return rows
+            # Небольшие справочники без таблицы поиска (модули берутся из кэша справочников)
+            search_lower = text.lower()
+            return [row for row in rows
+                    if any(key != 'ID' and value is not None and search_lower in str(value).lower()
+                           for key, value in row.items())]
+
+        conditions, params = [], []
+        if match:
+            conditions.append(f"{id_column} IN (SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ?)")
+            params.append(match)
+        if section_name == "Дисциплины" and filters.get('modules'):
+            modules = list(filters['modules'])
+            conditions.append(f"COALESCE(d.Модуль, '') IN ({', '.join('?' * len(modules))})")
+            params.extend(modules)
+        if not conditions:
+            return self.get_section_data(section_name)
+
         try:
-            if exclude_id:
-                result = self.db.execute_query(
-                    """SELECT COUNT(*) as count FROM Нагрузка 
-                       WHERE ПреподавательID = ? AND ДисциплинаID = ? AND ГруппаID = ? AND ID != ?""",
-                    (teacher_id, subject_id, group_id, exclude_id)
-                )
+            return getattr(self, loader)(f"WHERE {' AND '.join(conditions)}", tuple(params))
+        except Exception as e:
+            print(f"Ошибка при поиске в разделе {section_name}: {e}")
+            return []
+
+    def _workload_conditions(self, text: str, filters: Optional[Dict[str, Any]]) -> Tuple[List[str], List[Any]]:
+        filters = {key: value for key, value in (filters or {}).items() if value}
+        match = self._fts_match_expression(text or "")
+
+        conditions, params = [], []
+        if match:
+            conditions.append("н.ID IN (SELECT rowid FROM Поиск_Нагрузка WHERE Поиск_Нагрузка MATCH ?)")
+            params.append(match)
+        if filters.get('teacher'):
+            conditions.append("п.ФИО = ?")
+            params.append(filters['teacher'])
+        if filters.get('subject'):
+            conditions.append("д.Дисциплина = ?")
+            params.append(filters['subject'])
+        if filters.get('group'):
+            if ' - ' in filters['group']:
+                group_name, subgroup = filters['group'].split(' - ', 1)
+                conditions.append("г.Группа = ? AND г.Подгруппа = ?")
+                params.extend([group_name, subgroup])
             else:
-                result = self.db.execute_query(
-                    """SELECT COUNT(*) as count FROM Нагрузка 
-                       WHERE ПреподавательID = ? AND ДисциплинаID = ? AND ГруппаID = ?""",
-                    (teacher_id, subject_id, group_id)
-                )
-            return result[0]['count'] > 0 if result else False
+                conditions.append("г.Группа = ?")
+                params.append(filters['group'])
+        if filters.get('with_subgroups_only'):
+            conditions.append("COALESCE(г.Подгруппа, '') NOT IN ('', 'Нет', 'None')")
+        return conditions, params
+
+    def _search_workloads(self, text: str, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        conditions, params = self._workload_conditions(text, filters)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            return self.db.execute_query(self._WORKLOADS_SELECT + where + self._WORKLOADS_ORDER, tuple(params))
         except Exception as e:
-            print(f"Ошибка при проверке повторяющейся нагрузки: {e}")
-            return False
+            print(f"Ошибка при поиске нагрузки: {e}")
+            return []
+
+    # ========== ПОСТРАНИЧНАЯ ЗАГРУЗКА ==========
+    # Порядок страниц совпадает с порядком get_workloads, ID делает его однозначным.
+    # NULL из LEFT JOIN заменяются пустой строкой, чтобы ключ сравнивался как значение строки
+    _WORKLOADS_PAGE_KEY = ("COALESCE(п.ФИО, '') COLLATE NOCASE", "COALESCE(д.Дисциплина, '') COLLATE NOCASE",
+                           "COALESCE(г.Группа, '') COLLATE NOCASE", "COALESCE(г.Подгруппа, '') COLLATE NOCASE",
+                           "н.ID")
+
+    @staticmethod
+    def workload_page_key(row: Dict[str, Any]) -> Tuple:
+        """Ключ строки нагрузки для запроса следующей страницы"""
+        return (row['Преподаватель'] or '', row['Дисциплина'] or '',
+                row['Группа'] or '', row['Подгруппа'] or '', row['ID'])
+
+    def get_workloads_page(self, after_key: Optional[Tuple] = None, limit: int = 200,
+                           filters: Optional[Dict[str, Any]] = None,
+                           text: str = "") -> Tuple[List[Dict[str, Any]], Optional[Tuple]]:
+        """
+        Страница нагрузки после строки с ключом after_key (None — с начала).
+        Возвращает строки и ключ для следующей страницы (None, если страница последняя).
+        """
+        conditions, params = self._workload_conditions(text, filters)
+        if after_key is not None:
+            conditions.append(f"({', '.join(self._WORKLOADS_PAGE_KEY)}) > ({', '.join('?' * len(after_key))})")
+            params.extend(after_key)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = (f"{self._WORKLOADS_SELECT} {where} "
+                 f"ORDER BY {', '.join(self._WORKLOADS_PAGE_KEY)} LIMIT ?")
+        try:
+            rows = self.db.execute_query(query, tuple(params) + (limit + 1,))
+        except Exception as e:
+            print(f"Ошибка при получении страницы нагрузки: {e}")
+            return [], None
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, self.workload_page_key(rows[-1])
+        return rows, None
+
+    def count_workloads(self, filters: Optional[Dict[str, Any]] = None, text: str = "") -> int:
+        conditions, params = self._workload_conditions(text, filters)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            result = self.db.execute_query(
+                f"""SELECT COUNT(*) as count FROM Нагрузка н
+                LEFT JOIN Преподаватели п ON н.ПреподавательID = п.ID
+                LEFT JOIN Дисциплины д ON н.ДисциплинаID = д.ID
+                LEFT JOIN Группы г ON н.ГруппаID = г.ID
+                {where}""",
+                tuple(params)
+            )
+            return result[0]['count'] if result else 0
+        except Exception as e:
+            print(f"Ошибка при подсчёте нагрузки: {e}")
+            return 0
@@ -0,0 +1,85 @@
+import re, threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+_COMMENT = re.compile(r"--[^\n]*")
+_WHITESPACE = re.compile(r"\s+")
+_NUMBER = re.compile(r"\b\d+(\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Приводит запрос к общему виду, чтобы одинаковые по структуре запросы
+    попадали в одну строку статистики: литералы заменяются на ?, списки IN (?, ?, ...) — на (...)
+    """
+    normalized = _COMMENT.sub("", query)
+    normalized = _STRING.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _PLACEHOLDER_LIST.sub("(...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+class QueryProfiler:
+    """
+    Собирает статистику по выполненным запросам: число вызовов, суммарное и максимальное время,
+    количество строк. Запросы дольше порога slow_query_ms дописываются в журнал медленных запросов.
+    """
+
+    def __init__(self, slow_query_ms: Optional[float] = None, slow_query_log: str = "slow_queries.log"):
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = slow_query_log
+        self._stats = {}  # {нормализованный запрос: {...}}
+        self._lock = threading.Lock()
+
+    def record(self, query: str, params, elapsed: float, rows: int):
+        key = normalize_query(query)
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is None:
+                stat = self._stats[key] = {
+                    'Запрос': key, 'Вызовов': 0, 'Всего_мс': 0.0, 'Макс_мс': 0.0, 'Строк': 0
+                }
+            stat['Вызовов'] += 1
+            stat['Всего_мс'] += elapsed_ms
+            stat['Макс_мс'] = max(stat['Макс_мс'], elapsed_ms)
+            stat['Строк'] += max(rows, 0)
+
+        if self.slow_query_ms is not None and elapsed_ms >= self.slow_query_ms:
+            self._log_slow_query(query, params, elapsed_ms, rows)
+
+    def _log_slow_query(self, query: str, params, elapsed_ms: float, rows: int):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        line = (f"{timestamp}\t{elapsed_ms:.1f} мс\tстрок: {rows}\t"
+                f"{_WHITESPACE.sub(' ', _COMMENT.sub('', query)).strip()}\tпараметры: {params!r}\n")
+        try:
+            with self._lock, open(self.slow_query_log, "a", encoding="utf-8") as log:
+                log.write(line)
+        except OSError as e:
+            print(f"Ошибка записи журнала медленных запросов: {e}")
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Статистика по запросам, самые затратные по суммарному времени — первыми"""
+        with self._lock:
+            stats = [dict(stat) for stat in self._stats.values()]
+        for stat in stats:
+            stat['Среднее_мс'] = stat['Всего_мс'] / stat['Вызовов']
+        return sorted(stats, key=lambda s: s['Всего_мс'], reverse=True)
+
+    def dump(self, limit: Optional[int] = None) -> str:
+        """Текстовый отчёт по статистике запросов"""
+        stats = self.get_stats()[:limit]
+        lines = [f"{'Вызовов':>8} {'Всего, мс':>10} {'Сред., мс':>10} {'Макс., мс':>10} {'Строк':>8}  Запрос"]
+        for stat in stats:
+            lines.append(
+                f"{stat['Вызовов']:>8} {stat['Всего_мс']:>10.1f} {stat['Среднее_мс']:>10.2f} "
+                f"{stat['Макс_мс']:>10.1f} {stat['Строк']:>8}  {stat['Запрос']}"
+            )
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
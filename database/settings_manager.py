@@ -1,243 +1,252 @@
-import json, sqlite3
-from typing import Any, Dict, List, Optional
+import copy, json, sqlite3
+from typing import Any, Dict, List, Optional, Tuple
 from database.operations import DBOperations
 
+# Настройка отсутствует или пуста: get_setting возвращает значение по умолчанию
+_EMPTY = object()
+# Ключ настроек в Database.transaction_cache()
+_TRANSACTION_KEY = 'settings'
+
 
 class SettingsManager:
     def __init__(self, db_ops: DBOperations):
         self.db_ops = db_ops
 
     # ========== ОБЩИЕ НАСТРОЙКИ ==========
+    # Настройки читаются из кэша DBOperations.settings_cache, общего для всех экземпляров SettingsManager
+    _UPSERT_SETTING = """INSERT INTO Настройки (Ключ, Значение, Тип) VALUES (?, ?, ?)
+                         ON CONFLICT(Ключ) DO UPDATE SET Значение = excluded.Значение, Тип = excluded.Тип"""
+
+    @staticmethod
+    def _parse_value(value_str: Optional[str], value_type: str) -> Any:
+        if not value_str:
+            return _EMPTY
+        if value_type == 'JSON':
+            return json.loads(value_str)
+        elif value_type == 'INT':
+            return int(value_str)
+        elif value_type == 'BOOL':
+            return value_str == 'True'
+        else:
+            return value_str
+
+    def _load_settings(self) -> Dict[str, Any]:
+        values = {}
+        rows = self.db_ops.db.execute_query("SELECT Ключ, Значение, Тип FROM Настройки", row_mode='tuple')
+        for key, value_str, value_type in rows:
+            try:
+                values[key] = self._parse_value(value_str, value_type)
+            except ValueError as e:
+                print(f"Ошибка чтения настройки {key}: {e}")
+                values[key] = _EMPTY
+        return values
+
     def save_setting(self, key: str, value: Any, value_type: str = 'TEXT') -> bool:
-        value_str = str(value) if value_type != 'JSON' else json.dumps(value)
+        return self.save_settings({key: (value, value_type)})
 
-        existing = self.db_ops.db.execute_query(
-            "SELECT ID FROM Настройки WHERE Ключ = ?", (key,)
-        )
+    def save_settings(self, settings: Dict[str, Tuple[Any, str]]) -> bool:
+        """
+        Сохраняет несколько настроек {ключ: (значение, тип)} одной транзакцией:
+        либо записываются все, либо ни одна
+        """
+        rows = [(key, str(value) if value_type != 'JSON' else json.dumps(value), value_type)
+                for key, (value, value_type) in settings.items()]
+        if not rows:
+            return True
 
-        if existing:
-            return self.db_ops.db.execute_command(
-                "UPDATE Настройки SET Значение = ?, Тип = ? WHERE Ключ = ?",
-                (value_str, value_type, key)
-            )
-        else:
-            return self.db_ops.db.execute_command(
-                "INSERT INTO Настройки (Ключ, Значение, Тип) VALUES (?, ?, ?)",
-                (key, value_str, value_type)
-            )
+        cache = self.db_ops.settings_cache
+        try:
+            with cache.own_write(), self.db_ops.db.write_transaction() as cursor:
+                cursor.executemany(self._UPSERT_SETTING, rows)
+                # Настройки, уже прочитанные в этой транзакции, устарели
+                self.db_ops.db.transaction_cache().pop(_TRANSACTION_KEY, None)
+        except sqlite3.Error as e:
+            print(f"Ошибка при сохранении настроек: {e}")
+            cache.clear()
+            return False
 
-    def get_setting(self, key: str, default: Any = None) -> Any:
-        result = self.db_ops.db.execute_query(
-            "SELECT Значение, Тип FROM Настройки WHERE Ключ = ?", (key,)
-        )
+        cache.put_many({key: self._parse_value(value_str, value_type) for key, value_str, value_type in rows})
+        return True
+
+    def _settings(self) -> Dict[str, Any]:
+        transaction_cache = self.db_ops.db.transaction_cache()
+        if transaction_cache is not None:
+            # Внутри открытой транзакции (например, снимка для генерации) настройки читаются из базы,
+            # чтобы быть из того же среза, что и остальные данные, но один раз на транзакцию
+            values = transaction_cache.get(_TRANSACTION_KEY)
+            if values is None:
+                values = transaction_cache[_TRANSACTION_KEY] = self._load_settings()
+            return values
+
+        self.db_ops.db.changes.poll_external_changes()
+        return self.db_ops.settings_cache.get_all(self._load_settings)
 
-        if not result:
+    def get_setting(self, key: str, default: Any = None) -> Any:
+        value = self._settings().get(key, _EMPTY)
+        if value is _EMPTY:
             return default
+        # Списки и словари вызывающий код меняет на месте, поэтому наружу отдаётся копия
+        return copy.deepcopy(value) if isinstance(value, (list, dict)) else value
 
-        value_str = result[0]['Значение']
-        value_type = result[0]['Тип']
+    # ========== ПРОИЗВОДИТЕЛЬНОСТЬ БАЗЫ ДАННЫХ ==========
+    def get_performance_profile(self) -> str:
+        return self.db_ops.db.get_performance_profile()
 
-        if value_type == 'JSON':
-            return json.loads(value_str) if value_str else default
-        elif value_type == 'INT':
-            return int(value_str) if value_str else default
-        elif value_type == 'BOOL':
-            return value_str == 'True' if value_str else default
-        else:
-            return value_str if value_str else default
+    def save_performance_profile(self, profile: str) -> bool:
+        return self.db_ops.db.set_performance_profile(profile)
 
     # ========== ПОТОКИ ГРУПП ==========
-    def save_stream(self, name: str, group_ids: List[int]) -> bool:
+    # Группы потока хранятся в Поток_Группа в порядке колонки Порядок, их число не ограничено
+    def _save_stream(self, stream_id: Optional[int], name: str, group_ids: List[int],
+                     subject_ids: Optional[List[int]] = None) -> bool:
+        """Добавляет (stream_id=None) или обновляет поток вместе с составом одной транзакцией"""
         if len(set(group_ids)) != len(group_ids):
             raise ValueError("Группы не должны повторяться")
 
-        group1 = group_ids[0] if len(group_ids) > 0 else None
-        group2 = group_ids[1] if len(group_ids) > 1 else None
-        group3 = group_ids[2] if len(group_ids) > 2 else None
-        group4 = group_ids[3] if len(group_ids) > 3 else None
-
-        return self.db_ops.db.execute_command(
-            """INSERT INTO Потоки (Поток, Группа1_ID, Группа2_ID, Группа3_ID, Группа4_ID) 
-               VALUES (?, ?, ?, ?, ?)""",
-            (name, group1, group2, group3, group4)
-        )
+        with self.db_ops.db.write_transaction() as cursor:
+            if stream_id is None:
+                cursor.execute("INSERT INTO Потоки (Поток) VALUES (?)", (name,))
+                stream_id = cursor.lastrowid
+            else:
+                cursor.execute("UPDATE Потоки SET Поток = ? WHERE ID = ?", (name, stream_id))
+
+            cursor.execute("DELETE FROM Поток_Группа WHERE ПотокID = ?", (stream_id,))
+            cursor.executemany(
+                "INSERT INTO Поток_Группа (ПотокID, ГруппаID, Порядок) VALUES (?, ?, ?)",
+                [(stream_id, group_id, order) for order, group_id in enumerate(group_ids, start=1)]
+            )
 
-    def update_stream(self, stream_id: int, name: str, group_ids: List[int]) -> bool:
-        if len(set(group_ids)) != len(group_ids):
-            raise ValueError("Группы не должны повторяться")
+            if subject_ids is not None:
+                cursor.execute("DELETE FROM Поток_Дисциплина WHERE ПотокID = ?", (stream_id,))
+                cursor.executemany(
+                    "INSERT INTO Поток_Дисциплина (ПотокID, ДисциплинаID) VALUES (?, ?)",
+                    [(stream_id, subject_id) for subject_id in subject_ids]
+                )
+        return True
 
-        group1 = group_ids[0] if len(group_ids) > 0 else None
-        group2 = group_ids[1] if len(group_ids) > 1 else None
-        group3 = group_ids[2] if len(group_ids) > 2 else None
-        group4 = group_ids[3] if len(group_ids) > 3 else None
+    def save_stream(self, name: str, group_ids: List[int]) -> bool:
+        try:
+            return self._save_stream(None, name, group_ids)
+        except sqlite3.Error as e:
+            print(f"Ошибка при сохранении потока: {e}")
+            return False
 
-        return self.db_ops.db.execute_command(
-            """UPDATE Потоки SET Поток = ?, Группа1_ID = ?, Группа2_ID = ?, Группа3_ID = ?, Группа4_ID = ?
-               WHERE ID = ?""",
-            (name, group1, group2, group3, group4, stream_id)
-        )
+    def update_stream(self, stream_id: int, name: str, group_ids: List[int]) -> bool:
+        try:
+            return self._save_stream(stream_id, name, group_ids)
+        except sqlite3.Error as e:
+            print(f"Ошибка при обновлении потока: {e}")
+            return False
 
     def delete_stream(self, stream_id: int) -> bool:
+        # Состав и дисциплины потока удаляются каскадом
         return self.db_ops.db.execute_command(
             "DELETE FROM Потоки WHERE ID = ?", (stream_id,)
         )
 
-    def get_streams(self) -> List[Dict[str, Any]]:
-        query = """
-            SELECT 
-                п.ID,
-                п.Поток as Поток,
-                г1.ID as Группа1_ID,
-                г1.Группа as Группа1_Название,
-                г1.Подгруппа as Группа1_Подгруппа,
-                г2.ID as Группа2_ID,
-                г2.Группа as Группа2_Название,
-                г2.Подгруппа as Группа2_Подгруппа,
-                г3.ID as Группа3_ID,
-                г3.Группа as Группа3_Название,
-                г3.Подгруппа as Группа3_Подгруппа,
-                г4.ID as Группа4_ID,  -- НОВАЯ
-                г4.Группа as Группа4_Название,  -- НОВАЯ
-                г4.Подгруппа as Группа4_Подгруппа  -- НОВАЯ
-            FROM Потоки п
-            LEFT JOIN Группы г1 ON п.Группа1_ID = г1.ID
-            LEFT JOIN Группы г2 ON п.Группа2_ID = г2.ID
-            LEFT JOIN Группы г3 ON п.Группа3_ID = г3.ID
-            LEFT JOIN Группы г4 ON п.Группа4_ID = г4.ID  -- НОВАЯ
-            ORDER BY п.ID
-            """
-
-        streams = self.db_ops.db.execute_query(query)
+    def _load_streams(self, stream_id: Optional[int] = None,
+                      with_subjects: bool = False) -> List[Dict[str, Any]]:
+        """
+        Потоки с группами (и дисциплинами) двумя запросами на все потоки сразу.
+        stream_id ограничивает выборку одним потоком
+        """
+        where, params = ("WHERE п.ID = ?", (stream_id,)) if stream_id is not None else ("", ())
+        rows = self.db_ops.db.execute_query(
+            f"""SELECT п.ID, п.Поток, г.ID, г.Группа, г.Подгруппа
+               FROM Потоки п
+               LEFT JOIN Поток_Группа пг ON пг.ПотокID = п.ID
+               LEFT JOIN Группы г ON г.ID = пг.ГруппаID
+               {where}
+               ORDER BY п.ID, пг.Порядок, пг.ID""",
+            params, row_mode='tuple'
+        )
 
         result = []
-        for stream in streams:
-            groups_info = []
-            if stream['Группа1_ID']:
-                group1_name = f"{stream['Группа1_Название']}"
-                if stream['Группа1_Подгруппа'] and stream['Группа1_Подгруппа'] != 'Нет':
-                    group1_name += f" - {stream['Группа1_Подгруппа']}"
-                groups_info.append(group1_name)
-
-            if stream['Группа2_ID']:
-                group2_name = f"{stream['Группа2_Название']}"
-                if stream['Группа2_Подгруппа'] and stream['Группа2_Подгруппа'] != 'Нет':
-                    group2_name += f" - {stream['Группа2_Подгруппа']}"
-                groups_info.append(group2_name)
-
-            if stream['Группа3_ID']:
-                group3_name = f"{stream['Группа3_Название']}"
-                if stream['Группа3_Подгруппа'] and stream['Группа3_Подгруппа'] != 'Нет':
-                    group3_name += f" - {stream['Группа3_Подгруппа']}"
-                groups_info.append(group3_name)
-
-            if stream['Группа4_ID']:
-                group4_name = f"{stream['Группа4_Название']}"
-                if stream['Группа4_Подгруппа'] and stream['Группа4_Подгруппа'] != 'Нет':
-                    group4_name += f" - {stream['Группа4_Подгруппа']}"
-                groups_info.append(group4_name)
-
-            groups_display = ", ".join(groups_info)
-
-            result.append({
-                'ID': stream['ID'],
-                'Поток': stream['Поток'],
-                'Группы': groups_display,
-                'Группа1_ID': stream['Группа1_ID'],
-                'Группа2_ID': stream['Группа2_ID'],
-                'Группа3_ID': stream['Группа3_ID'],
-                'Группа4_ID': stream['Группа4_ID'],
-                'Группы_список': groups_info
-            })
+        streams = {}
+        for row_stream_id, stream_name, group_id, group_name, subgroup in rows:
+            stream = streams.get(row_stream_id)
+            if stream is None:
+                stream = streams[row_stream_id] = {
+                    'ID': row_stream_id,
+                    'Поток': stream_name,
+                    'Группы': '',
+                    'Группы_ID': [],
+                    'Группы_список': []
+                }
+                result.append(stream)
+
+            if group_id is None:
+                continue
+            display_name = group_name
+            if subgroup and subgroup != 'Нет':
+                display_name += f" - {subgroup}"
+            stream['Группы_ID'].append(group_id)
+            stream['Группы_список'].append(display_name)
+
+        if with_subjects and streams:
+            where = "WHERE пд.ПотокID = ?" if stream_id is not None else ""
+            subject_rows = self.db_ops.db.execute_query(
+                f"""SELECT пд.ПотокID, д.ID, д.Дисциплина
+                   FROM Поток_Дисциплина пд
+                   JOIN Дисциплины д ON пд.ДисциплинаID = д.ID
+                   {where}
+                   ORDER BY пд.ПотокID, д.Дисциплина""",
+                params, row_mode='tuple'
+            )
+            for stream in result:
+                stream['Дисциплины_список'] = []
+                stream['Дисциплины_ID'] = []
+            for row_stream_id, subject_id, subject_name in subject_rows:
+                stream = streams.get(row_stream_id)
+                if stream is not None:
+                    stream['Дисциплины_ID'].append(subject_id)
+                    stream['Дисциплины_список'].append(subject_name)
+
+        for stream in result:
+            stream['Группы'] = ", ".join(stream['Группы_список'])
+            if with_subjects:
+                stream['Дисциплины'] = ", ".join(stream['Дисциплины_список']) or "Не указаны"
 
         return result
 
+    def get_streams(self) -> List[Dict[str, Any]]:
+        return self._load_streams()
+
     def get_stream_by_id(self, stream_id: int) -> Optional[Dict[str, Any]]:
-        streams = self.get_streams()
-        for stream in streams:
-            if stream['ID'] == stream_id:
-                return stream
-        return None
+        streams = self._load_streams(stream_id)
+        return streams[0] if streams else None
+
+    def get_group_streams(self, group_id: int) -> List[Dict[str, Any]]:
+        """Потоки, в которые входит группа (поиск по индексу Поток_Группа.ГруппаID)"""
+        return self.db_ops.db.execute_query(
+            """SELECT п.ID, п.Поток
+               FROM Поток_Группа пг
+               JOIN Потоки п ON п.ID = пг.ПотокID
+               WHERE пг.ГруппаID = ?
+               ORDER BY п.ID""",
+            (group_id,)
+        )
 
     def check_group_in_any_stream(self, group_id: int) -> bool:
         result = self.db_ops.db.execute_query(
-            """SELECT COUNT(*) as count FROM Потоки 
-               WHERE Группа1_ID = ? OR Группа2_ID = ? OR Группа3_ID = ? OR Группа4_ID = ?""",
-            (group_id, group_id, group_id, group_id)
+            "SELECT EXISTS (SELECT 1 FROM Поток_Группа WHERE ГруппаID = ?) AS found", (group_id,)
         )
-        return result[0]['count'] > 0 if result else False
+        return bool(result[0]['found']) if result else False
 
     def save_stream_with_subjects(self, name: str, group_ids: List[int], subject_ids: List[int]) -> bool:
-        if len(set(group_ids)) != len(group_ids):
-            raise ValueError("Группы не должны повторяться")
-
-        conn = self.db_ops.db._get_connection()
-        cursor = conn.cursor()
-
         try:
-            group1 = group_ids[0] if len(group_ids) > 0 else None
-            group2 = group_ids[1] if len(group_ids) > 1 else None
-            group3 = group_ids[2] if len(group_ids) > 2 else None
-            group4 = group_ids[3] if len(group_ids) > 3 else None
-
-            cursor.execute(
-                """INSERT INTO Потоки (Поток, Группа1_ID, Группа2_ID, Группа3_ID, Группа4_ID) 
-                   VALUES (?, ?, ?, ?, ?)""",
-                (name, group1, group2, group3, group4)
-            )
-
-            stream_id = cursor.lastrowid
-
-            for subject_id in subject_ids:
-                cursor.execute(
-                    "INSERT INTO Поток_Дисциплина (ПотокID, ДисциплинаID) VALUES (?, ?)",
-                    (stream_id, subject_id)
-                )
-
-            conn.commit()
-            return True
+            return self._save_stream(None, name, group_ids, subject_ids)
         except sqlite3.Error as e:
             print(f"Ошибка при сохранении потока с дисциплинами: {e}")
-            conn.rollback()
             return False
-        finally:
-            conn.close()
 
     def update_stream_with_subjects(self, stream_id: int, name: str, group_ids: List[int],
                                     subject_ids: List[int]) -> bool:
-        if len(set(group_ids)) != len(group_ids):
-            raise ValueError("Группы не должны повторяться")
-
-        conn = self.db_ops.db._get_connection()
-        cursor = conn.cursor()
-
         try:
-            group1 = group_ids[0] if len(group_ids) > 0 else None
-            group2 = group_ids[1] if len(group_ids) > 1 else None
-            group3 = group_ids[2] if len(group_ids) > 2 else None
-            group4 = group_ids[3] if len(group_ids) > 3 else None
-
-            cursor.execute(
-                """UPDATE Потоки SET Поток = ?, Группа1_ID = ?, Группа2_ID = ?, Группа3_ID = ?, Группа4_ID = ?
-                   WHERE ID = ?""",
-                (name, group1, group2, group3, group4, stream_id)
-            )
-
-            cursor.execute("DELETE FROM Поток_Дисциплина WHERE ПотокID = ?", (stream_id,))
-
-            for subject_id in subject_ids:
-                cursor.execute(
-                    "INSERT INTO Поток_Дисциплина (ПотокID, ДисциплинаID) VALUES (?, ?)",
-                    (stream_id, subject_id)
-                )
-
-            conn.commit()
-            return True
+            return self._save_stream(stream_id, name, group_ids, subject_ids)
         except sqlite3.Error as e:
             print(f"Ошибка при обновлении потока с дисциплинами: {e}")
-            conn.rollback()
             return False
-        finally:
-            conn.close()
 
     def get_stream_subjects(self, stream_id: int) -> List[Dict[str, Any]]:
         query = """
@@ -254,30 +263,11 @@ class SettingsManager:
         return self.db_ops.db.execute_query(query, (stream_id,))
 
     def get_streams_with_subjects(self) -> List[Dict[str, Any]]:
-        streams = self.get_streams()
-
-        for stream in streams:
-            stream_id = stream['ID']
-            subjects = self.get_stream_subjects(stream_id)
-
-            subject_names = []
-            subject_ids = []
-            for subject in subjects:
-                subject_names.append(subject['Название'])
-                subject_ids.append(subject['ID'])
-
-            stream['Дисциплины'] = ", ".join(subject_names) if subject_names else "Не указаны"
-            stream['Дисциплины_список'] = subject_names
-            stream['Дисциплины_ID'] = subject_ids
-
-        return streams
+        return self._load_streams(with_subjects=True)
 
     def get_stream_by_id_with_subjects(self, stream_id: int) -> Optional[Dict[str, Any]]:
-        streams = self.get_streams_with_subjects()
-        for stream in streams:
-            if stream['ID'] == stream_id:
-                return stream
-        return None
+        streams = self._load_streams(stream_id, with_subjects=True)
+        return streams[0] if streams else None
 
     # ========== УПРАВЛЕНИЕ ГРУППАМИ В РАСПИСАНИИ ==========
     def get_excluded_groups(self) -> List[int]:
@@ -339,9 +329,5 @@ class SettingsManager:
         }
 
     def save_generation_params(self, params: Dict[str, Any]) -> bool:
-        success = True
-        if 'excluded_groups' in params:
-            success = success and self.save_excluded_groups(params['excluded_groups'])
-        if 'group_order' in params:
-            success = success and self.save_group_order(params['group_order'])
-        return success
+        settings = {key: (params[key], "JSON") for key in ('excluded_groups', 'group_order') if key in params}
+        return self.save_settings(settings)
@@ -0,0 +1,90 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from database.core import Record
+from database.operations import DBOperations
+from database.settings_manager import SettingsManager
+
+
+@dataclass
+class GenerationSnapshot:
+    """
+    Согласованный срез данных для одного запуска генерации.
+    Все таблицы читаются в одной транзакции, поэтому правки, сделанные во время генерации,
+    не смешиваются с уже прочитанными данными.
+    """
+    groups: List[Dict[str, Any]] = field(default_factory=list)  # все группы с признаками Исключена/Порядок
+    excluded_groups: List[int] = field(default_factory=list)
+    group_order: List[int] = field(default_factory=list)
+    streams: List[Dict[str, Any]] = field(default_factory=list)
+    workloads: List[Record] = field(default_factory=list)  # только для чтения, без dict на строку
+    teachers: List[Dict[str, Any]] = field(default_factory=list)
+    teacher_territories: Dict[int, List[str]] = field(default_factory=dict)  # {teacher_id: [территории]}
+    classrooms: List[Dict[str, Any]] = field(default_factory=list)
+    subjects: List[Dict[str, Any]] = field(default_factory=list)
+    subject_classrooms: Dict[int, List[Dict[str, Any]]] = field(default_factory=dict)  # {subject_id: [кабинеты]}
+    territories: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def active_groups(self) -> List[Dict[str, Any]]:
+        active = [g for g in self.groups if not g['Исключена']]
+        active.sort(key=lambda x: x['Порядок'])
+        return active
+
+    @property
+    def group_streams(self) -> Dict[int, List[Dict[str, Any]]]:
+        """{ID группы: [потоки, в которые она входит]}"""
+        group_streams = {}
+        for stream in self.streams:
+            for group_id in stream['Группы_ID']:
+                group_streams.setdefault(group_id, []).append(stream)
+        return group_streams
+
+    @property
+    def territory_colors(self) -> Dict[str, str]:
+        return {t['Территория']: t.get('Цвет') or '#FFFFFF' for t in self.territories}
+
+    @classmethod
+    def load(cls, db_ops: DBOperations,
+             settings_manager: Optional[SettingsManager] = None) -> 'GenerationSnapshot':
+        settings_manager = settings_manager or SettingsManager(db_ops)
+
+        with db_ops.db.read_transaction():
+            teachers = db_ops.get_teacher_profiles()
+            # Генератор берёт территории в алфавитном порядке (первая — основная)
+            teacher_territories = {
+                teacher['ID']: sorted(t['Территория'] for t in teacher.pop('Территории'))
+                for teacher in teachers
+            }
+
+            subjects = db_ops.get_subjects_with_module_names()
+            subject_classrooms = db_ops.get_subject_classroom_map()
+
+            return cls(
+                groups=settings_manager.get_groups_with_exclusion_and_order(),
+                excluded_groups=settings_manager.get_excluded_groups(),
+                group_order=settings_manager.get_group_order(),
+                streams=settings_manager.get_streams_with_subjects(),
+                workloads=db_ops.get_workloads(row_mode='record'),
+                teachers=teachers,
+                teacher_territories=teacher_territories,
+                classrooms=db_ops.get_classrooms_with_territory_names(),
+                subjects=subjects,
+                subject_classrooms=subject_classrooms,
+                territories=db_ops.get_territories(),
+            )
+
+    def to_generation_data(self) -> Dict[str, Any]:
+        return {
+            'active_groups': self.active_groups,
+            'excluded_groups': self.excluded_groups,
+            'group_order': self.group_order,
+            'streams': self.streams,
+            'group_streams': self.group_streams,
+            'workloads': self.workloads,
+            'teachers': self.teachers,
+            'teacher_territories': self.teacher_territories,
+            'classrooms': self.classrooms,
+            'subjects': self.subjects,
+            'subject_classrooms': self.subject_classrooms,
+            'territories': self.territories,
+        }
@@ -32,17 +32,18 @@ class ExcelFiller:
         # Кэш цветов территорий
         self.territory_colors = {}
 
-    def load_territory_colors(self):
+    def load_territory_colors(self, territories: Optional[List[Dict]] = None):
         """
-        Загружает цвета территорий из базы данных
+        Загружает цвета территорий из переданного списка или из базы данных
         """
-        if not self.db_ops:
-            return
+        if territories is None:
+            if not self.db_ops:
+                return
+            territories = self.db_ops.get_territories()
 
-        territories = self.db_ops.get_territories()
         for territory in territories:
             name = territory['Территория']
-            color = territory.get('Цвет', '#FFFFFF')
+            color = territory.get('Цвет') or '#FFFFFF'
             # Убираем # если есть
             if color.startswith('#'):
                 color = color[1:]
@@ -50,13 +51,14 @@ class ExcelFiller:
 
     def fill_schedule(self, template_path: str, schedule_data: Dict,
                       group_structure: List[Dict], group_names: Dict[int, Dict],
-                      output_path: str = None) -> str:
+                      output_path: str = None, territories: Optional[List[Dict]] = None) -> str:
         """
         Заполняет шаблон данными из расписания
         group_names: {group_id: {'name': str, 'subgroup': str, 'full_name': str}}
+        territories: территории из среза данных генерации (если не заданы, читаются из базы)
         """
         # Загружаем цвета территорий
-        self.load_territory_colors()
+        self.load_territory_colors(territories)
 
         # Загружаем шаблон
         wb = load_workbook(template_path)
@@ -0,0 +1,73 @@
+from typing import Iterable, List, Optional
+
+
+class OccupancyGrid:
+    """
+    Занятость групп, преподавателей или кабинетов по урокам недели.
+    На каждую сущность и день хранится одно целое число: бит lesson установлен, если урок занят
+    (6 дней × 11 уроков = 66 слотов в неделю), поэтому проверки свободных уроков —
+    это несколько битовых операций вместо обхода вложенных словарей и списков.
+    """
+
+    def __init__(self, days: List[str], lessons_per_day: int):
+        self.days = list(days)
+        self.lessons_per_day = lessons_per_day
+        self._day_index = {day: index for index, day in enumerate(self.days)}
+        self._all_lessons = (1 << lessons_per_day) - 1
+        self._busy = {}  # {ID: [маска занятых уроков на каждый день]}
+
+    def add(self, entity_id: int):
+        self._busy.setdefault(entity_id, [0] * len(self.days))
+
+    def __contains__(self, entity_id: int) -> bool:
+        return entity_id in self._busy
+
+    @staticmethod
+    def _run_mask(lesson: int, length: int) -> int:
+        return ((1 << length) - 1) << lesson
+
+    # ========== ИЗМЕНЕНИЕ ЗАНЯТОСТИ ==========
+    def occupy(self, entity_id: int, day: str, lesson: int, length: int = 1):
+        self._busy[entity_id][self._day_index[day]] |= self._run_mask(lesson, length)
+
+    def release(self, entity_id: int, day: str, lesson: int, length: int = 1):
+        self._busy[entity_id][self._day_index[day]] &= ~self._run_mask(lesson, length)
+
+    # ========== ЗАПРОСЫ ==========
+    def busy_mask(self, entity_ids: Iterable[int], day: str) -> int:
+        """Уроки дня, занятые хотя бы у одной из сущностей"""
+        index = self._day_index[day]
+        mask = 0
+        for entity_id in entity_ids:
+            mask |= self._busy[entity_id][index]
+        return mask
+
+    def is_free(self, entity_id: int, day: str, lesson: int, length: int = 1) -> bool:
+        """Свободны ли уроки lesson … lesson + length - 1 (уроки за пределами дня считаются занятыми)"""
+        if lesson < 0 or lesson + length > self.lessons_per_day:
+            return False
+        return not self._busy[entity_id][self._day_index[day]] & self._run_mask(lesson, length)
+
+    def is_free_for_all(self, entity_ids: Iterable[int], day: str, lesson: int, length: int = 1) -> bool:
+        if lesson < 0 or lesson + length > self.lessons_per_day:
+            return False
+        return not self.busy_mask(entity_ids, day) & self._run_mask(lesson, length)
+
+    def first_free_run(self, entity_ids: Iterable[int], day: str, length: int = 1,
+                       start: int = 0, busy: int = 0) -> Optional[int]:
+        """
+        Первый урок не раньше start, с которого length уроков подряд свободны у всех сущностей.
+        busy — уже занятые уроки из другой сетки (например, занятость преподавателя при поиске по группе)
+        """
+        free = ~(self.busy_mask(entity_ids, day) | busy) & self._all_lessons
+        runs = free
+        for shift in range(1, length):
+            runs &= free >> shift
+        runs &= ~((1 << start) - 1)
+        if not runs:
+            return None
+        return (runs & -runs).bit_length() - 1
+
+    def count(self, entity_id: int, day: str) -> int:
+        """Число занятых уроков за день"""
+        return bin(self._busy[entity_id][self._day_index[day]]).count("1")
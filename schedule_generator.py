@@ -3,8 +3,10 @@ from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from database.operations import DBOperations
 from database.settings_manager import SettingsManager
+from database.snapshot import GenerationSnapshot
 from schedule_template import SimpleTemplateGenerator
 from excel_filler import ExcelFiller
+from occupancy import OccupancyGrid
 
 
 class ScheduleGenerator:
@@ -21,8 +23,10 @@ class ScheduleGenerator:
 
         # Структуры данных
         self.schedule = {}  # [group_id][day][lesson] = урок
-        self.teacher_schedule = {}  # [teacher_id][day][lesson] = group_id
-        self.classroom_schedule = {}  # [classroom_id][day][lesson] = group_id
+        # Занятость уроков битовыми масками: проверки свободных слотов не обходят self.schedule
+        self.group_slots = OccupancyGrid(self.DAYS, self.LESSONS_PER_DAY)
+        self.teacher_slots = OccupancyGrid(self.DAYS, self.LESSONS_PER_DAY)
+        self.classroom_slots = OccupancyGrid(self.DAYS, self.LESSONS_PER_DAY)
         self.lessons_per_day = {}  # [group_id][day] = количество уроков
         self.teacher_territories = {}  # [teacher_id] = [территории]
 
@@ -66,25 +70,11 @@ class ScheduleGenerator:
         return self._generate_excel(output_path, data)
 
     def _load_data(self) -> Dict:
-        """Загружает все необходимые данные"""
-        active_groups = self.settings_manager.get_groups_with_exclusion_and_order()
-        active_groups = [g for g in active_groups if not g['Исключена']]
-
-        # Загружаем преподавателей с их территориями
-        teachers = self.db_ops.get_teachers_with_preferences()
-        for teacher in teachers:
-            teacher_id = teacher['ID']
-            territories = self.db_ops.get_teacher_territories(teacher_id)
-            self.teacher_territories[teacher_id] = [t['Территория'] for t in territories]
-
-        return {
-            'active_groups': active_groups,
-            'streams': self.settings_manager.get_streams_with_subjects(),
-            'workloads': self.db_ops.get_workloads(),
-            'teachers': teachers,
-            'classrooms': self.db_ops.get_classrooms_with_territory_names(),
-            'subjects': self.db_ops.get_subjects_with_module_names(),
-        }
+        """Загружает все необходимые данные одним согласованным срезом"""
+        self.snapshot = GenerationSnapshot.load(self.db_ops, self.settings_manager)
+        self.teacher_territories = self.snapshot.teacher_territories
+
+        return self.snapshot.to_generation_data()
 
     def _initialize_structures(self, data: Dict):
         """Инициализирует все структуры"""
@@ -92,14 +82,23 @@ class ScheduleGenerator:
             group_id = group['ID']
             self.schedule[group_id] = {day: [None] * self.LESSONS_PER_DAY for day in self.DAYS}
             self.lessons_per_day[group_id] = {day: 0 for day in self.DAYS}
+            self.group_slots.add(group_id)
 
         for teacher in data['teachers']:
-            teacher_id = teacher['ID']
-            self.teacher_schedule[teacher_id] = {day: [None] * self.LESSONS_PER_DAY for day in self.DAYS}
+            self.teacher_slots.add(teacher['ID'])
 
         for classroom in data['classrooms']:
-            classroom_id = classroom['ID']
-            self.classroom_schedule[classroom_id] = {day: [None] * self.LESSONS_PER_DAY for day in self.DAYS}
+            self.classroom_slots.add(classroom['ID'])
+
+    def _book_lesson(self, group_id: int, day: str, lesson: int, entry: Dict[str, Any],
+                     teacher_id: Optional[int] = None, classroom_id: Optional[int] = None):
+        """Ставит урок группе и отмечает занятость группы, преподавателя и кабинета"""
+        self.schedule[group_id][day][lesson] = entry
+        self.group_slots.occupy(group_id, day, lesson)
+        if teacher_id:
+            self.teacher_slots.occupy(teacher_id, day, lesson)
+        if classroom_id:
+            self.classroom_slots.occupy(classroom_id, day, lesson)
 
     def _group_workload_by_group(self, data: Dict) -> Dict:
         """Группирует нагрузку по группам с учетом подгрупп"""
@@ -216,7 +215,7 @@ class ScheduleGenerator:
 
                 for lesson in range(self.LESSONS_PER_DAY - 1):
                     # Проверяем, свободен ли урок у группы
-                    if self.schedule[group_id][day][lesson] is not None:
+                    if not self.group_slots.is_free(group_id, day, lesson):
                         continue
 
                     # Определяем территорию для проверки перемещений
@@ -235,7 +234,7 @@ class ScheduleGenerator:
                         continue
 
                     # Проверяем, свободен ли преподаватель
-                    if teacher_id and self.teacher_schedule[teacher_id][day][lesson] is not None:
+                    if teacher_id and not self.teacher_slots.is_free(teacher_id, day, lesson):
                         continue
 
                     # Проверяем, свободен ли кабинет
@@ -247,7 +246,7 @@ class ScheduleGenerator:
                         # Ищем свободный кабинет
                         for c in classrooms:
                             c_id = c['ID']
-                            if self.classroom_schedule[c_id][day][lesson] is None:
+                            if self.classroom_slots.is_free(c_id, day, lesson):
                                 classroom = c
                                 classroom_id = c_id
 
@@ -284,7 +283,7 @@ class ScheduleGenerator:
                     for week in weeks_to_place:
                         if week not in self.week_parity[group_id][subject_id]['placed_weeks']:
                             # Размещаем предмет
-                            self.schedule[group_id][day][lesson] = {
+                            self._book_lesson(group_id, day, lesson, {
                                 'subject': subject_name,
                                 'subject_id': subject_id,
                                 'teacher': teacher['ФИО'] if teacher else None,
@@ -296,14 +295,7 @@ class ScheduleGenerator:
                                 'stream_id': None,
                                 'week_parity': week,
                                 'weeks': [week]
-                            }
-
-                            # Отмечаем занятость
-                            if teacher_id:
-                                self.teacher_schedule[teacher_id][day][lesson] = group_id
-
-                            if classroom_id:
-                                self.classroom_schedule[classroom_id][day][lesson] = group_id
+                            }, teacher_id, classroom_id)
 
                             self.lessons_per_day[group_id][day] += 1
                             self.week_parity[group_id][subject_id]['placed_weeks'].append(week)
@@ -314,15 +306,14 @@ class ScheduleGenerator:
                             # Если предмет на обе недели, ставим сдвоенный урок
                             if parity == 'обе' and lesson + 1 < self.LESSONS_PER_DAY:
                                 next_lesson = lesson + 1
-                                if (self.schedule[group_id][day][next_lesson] is None and
+                                if (self.group_slots.is_free(group_id, day, next_lesson) and
                                         self.lessons_per_day[group_id][day] < self.MAX_LESSONS_PER_DAY and
-                                        (not teacher_id or self.teacher_schedule[teacher_id][day][
-                                            next_lesson] is None)):
+                                        (not teacher_id or self.teacher_slots.is_free(teacher_id, day, next_lesson))):
 
                                     second_week = 'нижняя' if week == 'верхняя' else 'верхняя'
 
                                     if second_week not in self.week_parity[group_id][subject_id]['placed_weeks']:
-                                        self.schedule[group_id][day][next_lesson] = {
+                                        self._book_lesson(group_id, day, next_lesson, {
                                             'subject': subject_name,
                                             'subject_id': subject_id,
                                             'teacher': teacher['ФИО'] if teacher else None,
@@ -334,13 +325,7 @@ class ScheduleGenerator:
                                             'stream_id': None,
                                             'week_parity': second_week,
                                             'weeks': [second_week]
-                                        }
-
-                                        if teacher_id:
-                                            self.teacher_schedule[teacher_id][day][next_lesson] = group_id
-
-                                        if classroom_id:
-                                            self.classroom_schedule[classroom_id][day][next_lesson] = group_id
+                                        }, teacher_id, classroom_id)
 
                                         self.lessons_per_day[group_id][day] += 1
                                         self.week_parity[group_id][subject_id]['placed_weeks'].append(second_week)
@@ -397,11 +382,11 @@ class ScheduleGenerator:
                 else:
                     # Ищем последний свободный урок
                     for lesson in range(self.LESSONS_PER_DAY - 1, -1, -1):
-                        if self.schedule[group_id][day][lesson] is None:
+                        if self.group_slots.is_free(group_id, day, lesson):
                             break
 
                 if lesson >= 0:
-                    self.schedule[group_id][day][lesson] = {
+                    self._book_lesson(group_id, day, lesson, {
                         'subject': 'Разговоры о важном',
                         'teacher': None,
                         'classroom': None,
@@ -409,7 +394,7 @@ class ScheduleGenerator:
                         'is_stream': False,
                         'stream_id': None,
                         'week_parity': 'обе'
-                    }
+                    })
 
     def _place_streams(self, data: Dict[str, Any]):
         """
@@ -424,15 +409,7 @@ class ScheduleGenerator:
             stream_name = stream['Поток']
 
             # Получаем ID групп из потока
-            group_ids = []
-            if stream.get('Группа1_ID'):
-                group_ids.append(stream['Группа1_ID'])
-            if stream.get('Группа2_ID'):
-                group_ids.append(stream['Группа2_ID'])
-            if stream.get('Группа3_ID'):
-                group_ids.append(stream['Группа3_ID'])
-            if stream.get('Группа4_ID'):
-                group_ids.append(stream['Группа4_ID'])
+            group_ids = list(stream.get('Группы_ID', []))
 
             if not group_ids:
                 continue
@@ -529,13 +506,11 @@ class ScheduleGenerator:
         teacher_days = self._get_teacher_available_days(teacher)
 
         # Получаем территории преподавателя
-        teacher_territories = []
-        if teacher_id:
-            teacher_territories = self.db_ops.get_teacher_territories(teacher_id)
+        teacher_territories = self.teacher_territories.get(teacher_id, []) if teacher_id else []
 
         print(
             f"\n  Размещение потока {stream_id}: {subject_name}, групп: {len(group_ids)}, часов: {hours}, четность: {parity}")
-        print(f"  Преподаватель: {teacher['ФИО']}, территории: {[t['Территория'] for t in teacher_territories]}")
+        print(f"  Преподаватель: {teacher['ФИО']}, территории: {teacher_territories}")
 
         # Инициализируем запись о четности для каждой группы
         for group_id in group_ids:
@@ -570,31 +545,18 @@ class ScheduleGenerator:
 
                 for lesson in range(self.LESSONS_PER_DAY - 1):
                     # Проверяем, свободен ли урок у всех групп
-                    all_free = True
-                    for group_id in group_ids:
-                        if self.schedule[group_id][day][lesson] is not None:
-                            all_free = False
-                            break
-
-                    if not all_free:
+                    if not self.group_slots.is_free_for_all(group_ids, day, lesson):
                         continue
 
                     # Проверяем, свободен ли преподаватель
-                    if teacher_id:
-                        teacher_free = True
-                        for group_id in group_ids:
-                            if self.teacher_schedule[teacher_id][day][lesson] is not None:
-                                teacher_free = False
-                                break
-
-                        if not teacher_free:
-                            continue
+                    if teacher_id and not self.teacher_slots.is_free(teacher_id, day, lesson):
+                        continue
 
                     # Определяем территорию для занятия (приоритет у преподавателя)
                     territory = None
                     if teacher_territories:
                         # Берем первую территорию преподавателя
-                        territory = teacher_territories[0]['Территория']
+                        territory = teacher_territories[0]
 
                     # Проверяем перемещения для каждой группы
                     movements_ok = True
@@ -626,7 +588,7 @@ class ScheduleGenerator:
 
                         # Размещаем предмет для всех групп
                         for group_id in group_ids:
-                            self.schedule[group_id][day][lesson] = {
+                            self._book_lesson(group_id, day, lesson, {
                                 'subject': subject_name,
                                 'subject_id': subject_id,
                                 'teacher': teacher['ФИО'] if teacher else None,
@@ -638,10 +600,7 @@ class ScheduleGenerator:
                                 'stream_id': stream_id,
                                 'week_parity': week,
                                 'weeks': [week]
-                            }
-
-                            if teacher_id:
-                                self.teacher_schedule[teacher_id][day][lesson] = group_id
+                            }, teacher_id)
 
                             self.lessons_per_day[group_id][day] += 1
                             self.week_parity[group_id][subject_id]['placed_weeks'].append(week)
@@ -654,17 +613,14 @@ class ScheduleGenerator:
                             next_lesson = lesson + 1
 
                             # Проверяем, свободен ли следующий урок
-                            next_free = True
+                            next_free = self.group_slots.is_free_for_all(group_ids, day, next_lesson)
                             for group_id in group_ids:
-                                if self.schedule[group_id][day][next_lesson] is not None:
-                                    next_free = False
-                                    break
                                 if self.lessons_per_day[group_id][day] >= self.MAX_LESSONS_PER_DAY:
                                     next_free = False
                                     break
 
                             if next_free and (
-                                    not teacher_id or self.teacher_schedule[teacher_id][day][next_lesson] is None):
+                                    not teacher_id or self.teacher_slots.is_free(teacher_id, day, next_lesson)):
                                 second_week = 'нижняя' if week == 'верхняя' else 'верхняя'
 
                                 # Проверяем, доступна ли вторая неделя
@@ -676,7 +632,7 @@ class ScheduleGenerator:
 
                                 if second_week_available:
                                     for group_id in group_ids:
-                                        self.schedule[group_id][day][next_lesson] = {
+                                        self._book_lesson(group_id, day, next_lesson, {
                                             'subject': subject_name,
                                             'subject_id': subject_id,
                                             'teacher': teacher['ФИО'] if teacher else None,
@@ -688,10 +644,7 @@ class ScheduleGenerator:
                                             'stream_id': stream_id,
                                             'week_parity': second_week,
                                             'weeks': [second_week]
-                                        }
-
-                                        if teacher_id:
-                                            self.teacher_schedule[teacher_id][day][next_lesson] = group_id
+                                        }, teacher_id)
 
                                         self.lessons_per_day[group_id][day] += 1
                                         self.week_parity[group_id][subject_id]['placed_weeks'].append(second_week)
@@ -726,23 +679,17 @@ class ScheduleGenerator:
         for day in self.DAYS:
             for lesson in range(self.LESSONS_PER_DAY - 1):
                 # Проверяем, свободен ли этот урок у всех групп
-                all_free = True
-                for group_id in group_ids:
-                    if self.schedule[group_id][day][lesson] is not None:
-                        all_free = False
-                        break
-
-                if all_free:
+                if self.group_slots.is_free_for_all(group_ids, day, lesson):
                     # Проверяем свободен ли преподаватель
                     teacher_id = teacher['ID'] if teacher else None
-                    if teacher_id and self.teacher_schedule[teacher_id][day][lesson] is not None:
+                    if teacher_id and not self.teacher_slots.is_free(teacher_id, day, lesson):
                         continue
 
                     # Проверяем свободен ли кабинет
                     if classrooms:
                         classroom = random.choice(classrooms)
                         classroom_id = classroom['ID']
-                        if self.classroom_schedule[classroom_id][day][lesson] is not None:
+                        if not self.classroom_slots.is_free(classroom_id, day, lesson):
                             continue
                     else:
                         classroom = None
@@ -750,7 +697,7 @@ class ScheduleGenerator:
 
                     # Размещаем предмет для всех групп
                     for group_id in group_ids:
-                        self.schedule[group_id][day][lesson] = {
+                        self._book_lesson(group_id, day, lesson, {
                             'subject': subject_name,
                             'teacher': teacher['ФИО'] if teacher else None,
                             'teacher_id': teacher_id,
@@ -760,15 +707,7 @@ class ScheduleGenerator:
                             'is_stream': True,
                             'stream_id': stream_id,
                             'week_parity': parity
-                        }
-
-                        # Отмечаем занятость преподавателя
-                        if teacher_id:
-                            self.teacher_schedule[teacher_id][day][lesson] = group_id
-
-                        # Отмечаем занятость кабинета
-                        if classroom_id:
-                            self.classroom_schedule[classroom_id][day][lesson] = group_id
+                        }, teacher_id, classroom_id)
 
                     # Уменьшаем оставшиеся часы
                     hours -= 2 if parity == 'обе' else 1
@@ -780,16 +719,12 @@ class ScheduleGenerator:
                         # Пробуем поставить еще один урок в тот же день
                         if lesson + 1 < self.LESSONS_PER_DAY:
                             next_lesson = lesson + 1
-                            all_free_next = True
-                            for group_id in group_ids:
-                                if self.schedule[group_id][day][next_lesson] is not None:
-                                    all_free_next = False
-                                    break
+                            all_free_next = self.group_slots.is_free_for_all(group_ids, day, next_lesson)
 
                             if all_free_next and (
-                                    not teacher_id or self.teacher_schedule[teacher_id][day][next_lesson] is None):
+                                    not teacher_id or self.teacher_slots.is_free(teacher_id, day, next_lesson)):
                                 for group_id in group_ids:
-                                    self.schedule[group_id][day][next_lesson] = {
+                                    self._book_lesson(group_id, day, next_lesson, {
                                         'subject': subject_name,
                                         'teacher': teacher['ФИО'] if teacher else None,
                                         'teacher_id': teacher_id,
@@ -799,13 +734,7 @@ class ScheduleGenerator:
                                         'is_stream': True,
                                         'stream_id': stream_id,
                                         'week_parity': parity
-                                    }
-
-                                    if teacher_id:
-                                        self.teacher_schedule[teacher_id][day][next_lesson] = group_id
-
-                                    if classroom_id:
-                                        self.classroom_schedule[classroom_id][day][next_lesson] = group_id
+                                    }, teacher_id, classroom_id)
 
                                 hours -= 1
                                 if hours <= 0:
@@ -836,7 +765,7 @@ class ScheduleGenerator:
                     continue
 
                 # Находим кабинеты для предмета
-                classrooms = self.db_ops.get_classrooms_by_subject(subject['ID'])
+                classrooms = data['subject_classrooms'].get(subject['ID'], [])
 
                 # Получаем территории преподавателя
                 teacher_terr = self.teacher_territories.get(teacher['ID'], [])
@@ -895,117 +824,76 @@ class ScheduleGenerator:
                 if hours >= 2 and current_load >= self.MAX_LESSONS_PER_DAY - 1:
                     continue
 
-                # Ищем свободный слот
-                for lesson in range(self.LESSONS_PER_DAY):
-                    # Для сдвоенных уроков нужны два подряд
-                    if hours >= 2:
-                        if lesson + 1 >= self.LESSONS_PER_DAY:
-                            continue
-                        if (self.schedule[group_id][day][lesson] is not None or
-                                self.schedule[group_id][day][lesson + 1] is not None):
-                            continue
-                    else:
-                        if self.schedule[group_id][day][lesson] is not None:
-                            continue
-
-                    # Проверяем преподавателя
-                    if hours >= 2:
-                        if (self.teacher_schedule[teacher_id][day][lesson] is not None or
-                                self.teacher_schedule[teacher_id][day][lesson + 1] is not None):
-                            continue
-                    else:
-                        if self.teacher_schedule[teacher_id][day][lesson] is not None:
-                            continue
-
-                    # Ищем кабинет
-                    classroom = None
-                    classroom_number = None
-                    classroom_id = None
-                    territory = None
-
-                    if classrooms:
-                        for c in classrooms:
-                            c_id = c['ID']
-                            if hours >= 2:
-                                if (self.classroom_schedule[c_id][day][lesson] is None and
-                                        self.classroom_schedule[c_id][day][lesson + 1] is None):
-                                    classroom = c
-                                    classroom_id = c_id
-                                    # Пробуем разные ключи для номера кабинета
-                                    if 'Номер кабинета' in c:
-                                        classroom_number = c['Номер кабинета']
-                                    elif 'Кабинет' in c:
-                                        classroom_number = c['Кабинет']
-                                    else:
-                                        classroom_number = str(c_id)
+                # Первый урок, с которого группа и преподаватель свободны нужное число уроков подряд
+                length = 2 if hours >= 2 else 1
+                lesson = self.group_slots.first_free_run(
+                    [group_id], day, length, busy=self.teacher_slots.busy_mask([teacher_id], day)
+                )
+                if lesson is None:
+                    continue
 
-                                    # Пробуем разные ключи для территории
-                                    if 'Территория' in c:
-                                        territory = c['Территория']
-                                    elif 'territory' in c:
-                                        territory = c['territory']
-                                    break
+                # Ищем кабинет
+                classroom = None
+                classroom_number = None
+                classroom_id = None
+                territory = None
+
+                if classrooms:
+                    for c in classrooms:
+                        c_id = c['ID']
+                        if self.classroom_slots.is_free(c_id, day, lesson, length):
+                            classroom = c
+                            classroom_id = c_id
+                            # Пробуем разные ключи для номера кабинета
+                            if 'Номер кабинета' in c:
+                                classroom_number = c['Номер кабинета']
+                            elif 'Кабинет' in c:
+                                classroom_number = c['Кабинет']
                             else:
-                                if self.classroom_schedule[c_id][day][lesson] is None:
-                                    classroom = c
-                                    classroom_id = c_id
-                                    if 'Номер кабинета' in c:
-                                        classroom_number = c['Номер кабинета']
-                                    elif 'Кабинет' in c:
-                                        classroom_number = c['Кабинет']
-                                    else:
-                                        classroom_number = str(c_id)
-
-                                    if 'Территория' in c:
-                                        territory = c['Территория']
-                                    elif 'territory' in c:
-                                        territory = c['territory']
-                                    break
+                                classroom_number = str(c_id)
 
-                    # Размещаем урок(и)
-                    if hours >= 2:
-                        # Сдвоенный урок
-                        for l in [lesson, lesson + 1]:
-                            self.schedule[group_id][day][l] = {
-                                'subject': subject_name,
-                                'teacher': teacher['ФИО'],
-                                'teacher_id': teacher_id,
-                                'classroom': classroom_number,
-                                'classroom_id': classroom_id,
-                                'territory': territory,
-                                'is_double': True
-                            }
-                            self.teacher_schedule[teacher_id][day][l] = group_id
-                            if classroom_id:
-                                self.classroom_schedule[classroom_id][day][l] = group_id
+                            # Пробуем разные ключи для территории
+                            if 'Территория' in c:
+                                territory = c['Территория']
+                            elif 'territory' in c:
+                                territory = c['territory']
+                            break
 
-                        self.lessons_per_day[group_id][day] += 2
-                        lessons_placed += 1
-                        print(f"    ✓ {day} {lesson + 1}-{lesson + 2}: {subject_name} ({teacher['ФИО']})")
-                    else:
-                        # Одиночный урок
-                        self.schedule[group_id][day][lesson] = {
+                # Размещаем урок(и)
+                if hours >= 2:
+                    # Сдвоенный урок
+                    for l in [lesson, lesson + 1]:
+                        self._book_lesson(group_id, day, l, {
                             'subject': subject_name,
                             'teacher': teacher['ФИО'],
                             'teacher_id': teacher_id,
                             'classroom': classroom_number,
                             'classroom_id': classroom_id,
                             'territory': territory,
-                            'is_double': False
-                        }
-                        self.teacher_schedule[teacher_id][day][lesson] = group_id
-                        if classroom_id:
-                            self.classroom_schedule[classroom_id][day][lesson] = group_id
+                            'is_double': True
+                        }, teacher_id, classroom_id)
 
-                        self.lessons_per_day[group_id][day] += 1
-                        lessons_placed += 1
-                        print(f"    ✓ {day} {lesson + 1}: {subject_name} ({teacher['ФИО']})")
+                    self.lessons_per_day[group_id][day] += 2
+                    lessons_placed += 1
+                    print(f"    ✓ {day} {lesson + 1}-{lesson + 2}: {subject_name} ({teacher['ФИО']})")
+                else:
+                    # Одиночный урок
+                    self._book_lesson(group_id, day, lesson, {
+                        'subject': subject_name,
+                        'teacher': teacher['ФИО'],
+                        'teacher_id': teacher_id,
+                        'classroom': classroom_number,
+                        'classroom_id': classroom_id,
+                        'territory': territory,
+                        'is_double': False
+                    }, teacher_id, classroom_id)
 
-                    placed = True
-                    break
+                    self.lessons_per_day[group_id][day] += 1
+                    lessons_placed += 1
+                    print(f"    ✓ {day} {lesson + 1}: {subject_name} ({teacher['ФИО']})")
 
-                if placed:
-                    break
+                placed = True
+                break
 
             if not placed:
                 print(f"    ✗ Не удалось разместить {subject_name}")
@@ -1088,8 +976,8 @@ class ScheduleGenerator:
                             continue
 
                         # Проверяем, свободны ли оба урока
-                        if (self.schedule[group_id][day][lesson] is not None or
-                                self.schedule[group_id][day][lesson + 1] is not None):
+                        if (not self.group_slots.is_free(group_id, day, lesson) or
+                                not self.group_slots.is_free(group_id, day, lesson + 1)):
                             continue
 
                         # Определяем территорию
@@ -1101,8 +989,8 @@ class ScheduleGenerator:
 
                         # Проверяем преподавателя
                         if teacher_id:
-                            if (self.teacher_schedule[teacher_id][day][lesson] is not None or
-                                    self.teacher_schedule[teacher_id][day][lesson + 1] is not None):
+                            if (not self.teacher_slots.is_free(teacher_id, day, lesson) or
+                                    not self.teacher_slots.is_free(teacher_id, day, lesson + 1)):
                                 continue
 
                         # Ищем кабинет, свободный на оба урока
@@ -1113,8 +1001,8 @@ class ScheduleGenerator:
                         if classrooms:
                             for c in classrooms:
                                 c_id = c['ID']
-                                if (self.classroom_schedule[c_id][day][lesson] is None and
-                                        self.classroom_schedule[c_id][day][lesson + 1] is None):
+                                if (self.classroom_slots.is_free(c_id, day, lesson) and
+                                        self.classroom_slots.is_free(c_id, day, lesson + 1)):
                                     classroom = c
                                     classroom_id = c_id
                                     classroom_number = c.get('Номер кабинета') or c.get('Кабинет') or str(c_id)
@@ -1137,7 +1025,7 @@ class ScheduleGenerator:
 
                         # Размещаем два урока подряд
                         for l in [lesson, lesson + 1]:
-                            self.schedule[group_id][day][l] = {
+                            self._book_lesson(group_id, day, l, {
                                 'subject': subject_name,
                                 'subject_id': subject_id,
                                 'teacher': teacher['ФИО'],
@@ -1149,13 +1037,7 @@ class ScheduleGenerator:
                                 'stream_id': None,
                                 'week_parity': week,
                                 'lesson_group': placed_lessons // 2
-                            }
-
-                            if teacher_id:
-                                self.teacher_schedule[teacher_id][day][l] = group_id
-
-                            if classroom_id:
-                                self.classroom_schedule[classroom_id][day][l] = group_id
+                            }, teacher_id, classroom_id)
 
                         self.lessons_per_day[group_id][day] += 2
                         placed_on_weeks[week] += 2
@@ -1166,7 +1048,7 @@ class ScheduleGenerator:
                 else:
                     # Для предметов с 2+ часами в нагрузке ставим обычные уроки
                     for lesson in range(self.LESSONS_PER_DAY):
-                        if self.schedule[group_id][day][lesson] is not None:
+                        if not self.group_slots.is_free(group_id, day, lesson):
                             continue
 
                         # Определяем территорию
@@ -1177,7 +1059,7 @@ class ScheduleGenerator:
                             continue
 
                         # Проверяем преподавателя
-                        if teacher_id and self.teacher_schedule[teacher_id][day][lesson] is not None:
+                        if teacher_id and not self.teacher_slots.is_free(teacher_id, day, lesson):
                             continue
 
                         # Ищем кабинет
@@ -1188,7 +1070,7 @@ class ScheduleGenerator:
                         if classrooms:
                             for c in classrooms:
                                 c_id = c['ID']
-                                if self.classroom_schedule[c_id][day][lesson] is None:
+                                if self.classroom_slots.is_free(c_id, day, lesson):
                                     classroom = c
                                     classroom_id = c_id
                                     classroom_number = c.get('Номер кабинета') or c.get('Кабинет') or str(c_id)
@@ -1210,7 +1092,7 @@ class ScheduleGenerator:
                                 week = 'нижняя'
 
                         # Размещаем урок
-                        self.schedule[group_id][day][lesson] = {
+                        self._book_lesson(group_id, day, lesson, {
                             'subject': subject_name,
                             'subject_id': subject_id,
                             'teacher': teacher['ФИО'],
@@ -1222,13 +1104,7 @@ class ScheduleGenerator:
                             'stream_id': None,
                             'week_parity': week,
                             'lesson_id': placed_lessons
-                        }
-
-                        if teacher_id:
-                            self.teacher_schedule[teacher_id][day][lesson] = group_id
-
-                        if classroom_id:
-                            self.classroom_schedule[classroom_id][day][lesson] = group_id
+                        }, teacher_id, classroom_id)
 
                         self.lessons_per_day[group_id][day] += 1
                         placed_on_weeks[week] += 1
@@ -1308,11 +1184,11 @@ class ScheduleGenerator:
 
                     # Проверяем, свободен ли урок (уроки)
                     if parity == 'обе':
-                        if (self.schedule[group_id][day][lesson] is not None or
-                                self.schedule[group_id][day][lesson + 1] is not None):
+                        if (not self.group_slots.is_free(group_id, day, lesson) or
+                                not self.group_slots.is_free(group_id, day, lesson + 1)):
                             continue
                     else:
-                        if self.schedule[group_id][day][lesson] is not None:
+                        if not self.group_slots.is_free(group_id, day, lesson):
                             continue
 
                     # Определяем территорию (приоритет у преподавателя)
@@ -1327,11 +1203,11 @@ class ScheduleGenerator:
                     # Проверяем преподавателя
                     if teacher_id:
                         if parity == 'обе':
-                            if (self.teacher_schedule[teacher_id][day][lesson] is not None or
-                                    self.teacher_schedule[teacher_id][day][lesson + 1] is not None):
+                            if (not self.teacher_slots.is_free(teacher_id, day, lesson) or
+                                    not self.teacher_slots.is_free(teacher_id, day, lesson + 1)):
                                 continue
                         else:
-                            if self.teacher_schedule[teacher_id][day][lesson] is not None:
+                            if not self.teacher_slots.is_free(teacher_id, day, lesson):
                                 continue
 
                     # Ищем кабинет
@@ -1343,8 +1219,8 @@ class ScheduleGenerator:
                         for c in classrooms:
                             c_id = c['ID']
                             if parity == 'обе':
-                                if (self.classroom_schedule[c_id][day][lesson] is None and
-                                        self.classroom_schedule[c_id][day][lesson + 1] is None):
+                                if (self.classroom_slots.is_free(c_id, day, lesson) and
+                                        self.classroom_slots.is_free(c_id, day, lesson + 1)):
                                     classroom = c
                                     classroom_id = c_id
                                     classroom_number = c.get('Номер кабинета') or c.get('Кабинет') or str(c_id)
@@ -1352,7 +1228,7 @@ class ScheduleGenerator:
                                         territory = c.get('Территория')
                                     break
                             else:
-                                if self.classroom_schedule[c_id][day][lesson] is None:
+                                if self.classroom_slots.is_free(c_id, day, lesson):
                                     classroom = c
                                     classroom_id = c_id
                                     classroom_number = c.get('Номер кабинета') or c.get('Кабинет') or str(c_id)
@@ -1378,7 +1254,7 @@ class ScheduleGenerator:
                     if parity == 'обе':
                         # Сдвоенный урок
                         for l in [lesson, lesson + 1]:
-                            self.schedule[group_id][day][l] = {
+                            self._book_lesson(group_id, day, l, {
                                 'subject': subject_name,
                                 'subject_id': subject_id,
                                 'teacher': teacher['ФИО'],
@@ -1390,13 +1266,7 @@ class ScheduleGenerator:
                                 'stream_id': None,
                                 'week_parity': week,
                                 'weeks': [week]
-                            }
-
-                            if teacher_id:
-                                self.teacher_schedule[teacher_id][day][l] = group_id
-
-                            if classroom_id:
-                                self.classroom_schedule[classroom_id][day][l] = group_id
+                            }, teacher_id, classroom_id)
 
                         self.lessons_per_day[group_id][day] += 2
                         self.week_parity[group_id][subject_id]['placed_weeks'].append(week)
@@ -1405,7 +1275,7 @@ class ScheduleGenerator:
                         print(f"      ✅ Сдвоенный урок в {day} {lesson + 1}-{lesson + 2} ({teacher['ФИО']})")
                     else:
                         # Одиночный урок
-                        self.schedule[group_id][day][lesson] = {
+                        self._book_lesson(group_id, day, lesson, {
                             'subject': subject_name,
                             'subject_id': subject_id,
                             'teacher': teacher['ФИО'],
@@ -1417,13 +1287,7 @@ class ScheduleGenerator:
                             'stream_id': None,
                             'week_parity': week,
                             'weeks': [week]
-                        }
-
-                        if teacher_id:
-                            self.teacher_schedule[teacher_id][day][lesson] = group_id
-
-                        if classroom_id:
-                            self.classroom_schedule[classroom_id][day][lesson] = group_id
+                        }, teacher_id, classroom_id)
 
                         self.lessons_per_day[group_id][day] += 1
                         self.week_parity[group_id][subject_id]['placed_weeks'].append(week)
@@ -1470,11 +1334,11 @@ class ScheduleGenerator:
 
                 for lesson in range(self.LESSONS_PER_DAY - 1):
                     # Проверяем, свободен ли урок у группы
-                    if self.schedule[group_id][day][lesson] is not None:
+                    if not self.group_slots.is_free(group_id, day, lesson):
                         continue
 
                     # Проверяем, свободен ли преподаватель
-                    if teacher_id and self.teacher_schedule[teacher_id][day][lesson] is not None:
+                    if teacher_id and not self.teacher_slots.is_free(teacher_id, day, lesson):
                         continue
 
                     # Проверяем, свободен ли кабинет
@@ -1484,7 +1348,7 @@ class ScheduleGenerator:
                         # Ищем свободный кабинет
                         for c in classrooms:
                             c_id = c['ID']
-                            if self.classroom_schedule[c_id][day][lesson] is None:
+                            if self.classroom_slots.is_free(c_id, day, lesson):
                                 classroom = c
                                 classroom_id = c_id
                                 break
@@ -1493,7 +1357,7 @@ class ScheduleGenerator:
                             continue
 
                     # Размещаем предмет
-                    self.schedule[group_id][day][lesson] = {
+                    self._book_lesson(group_id, day, lesson, {
                         'subject': subject_name,
                         'teacher': teacher['ФИО'] if teacher else None,
                         'teacher_id': teacher_id,
@@ -1503,25 +1367,17 @@ class ScheduleGenerator:
                         'is_stream': False,
                         'stream_id': None,
                         'week_parity': parity
-                    }
-
-                    # Отмечаем занятость преподавателя
-                    if teacher_id:
-                        self.teacher_schedule[teacher_id][day][lesson] = group_id
-
-                    # Отмечаем занятость кабинета
-                    if classroom_id:
-                        self.classroom_schedule[classroom_id][day][lesson] = group_id
+                    }, teacher_id, classroom_id)
 
                     hours_remaining -= 2 if parity == 'обе' else 1
                     placed = True
 
                     # Если предмет на обе недели, ставим сдвоенный урок
                     if parity == 'обе' and lesson + 1 < self.LESSONS_PER_DAY:
-                        if (self.schedule[group_id][day][lesson + 1] is None and
-                                (not teacher_id or self.teacher_schedule[teacher_id][day][lesson + 1] is None)):
+                        if (self.group_slots.is_free(group_id, day, lesson + 1) and
+                                (not teacher_id or self.teacher_slots.is_free(teacher_id, day, lesson + 1))):
 
-                            self.schedule[group_id][day][lesson + 1] = {
+                            self._book_lesson(group_id, day, lesson + 1, {
                                 'subject': subject_name,
                                 'teacher': teacher['ФИО'] if teacher else None,
                                 'teacher_id': teacher_id,
@@ -1531,13 +1387,7 @@ class ScheduleGenerator:
                                 'is_stream': False,
                                 'stream_id': None,
                                 'week_parity': parity
-                            }
-
-                            if teacher_id:
-                                self.teacher_schedule[teacher_id][day][lesson + 1] = group_id
-
-                            if classroom_id:
-                                self.classroom_schedule[classroom_id][day][lesson + 1] = group_id
+                            }, teacher_id, classroom_id)
 
                     break
 
@@ -1552,20 +1402,9 @@ class ScheduleGenerator:
         """
         Проверяет, не был ли уже предмет размещен в потоке
         """
-        for stream in data['streams']:
-            stream_id = stream['ID']
-            subject_ids = stream.get('Дисциплины_ID', [])
-
-            if subject_id in subject_ids:
-                group_ids = []
-                if stream.get('Группа1_ID') == group_id:
-                    return True
-                if stream.get('Группа2_ID') == group_id:
-                    return True
-                if stream.get('Группа3_ID') == group_id:
-                    return True
-                if stream.get('Группа4_ID') == group_id:
-                    return True
+        for stream in data['group_streams'].get(group_id, []):
+            if subject_id in stream.get('Дисциплины_ID', []):
+                return True
 
         return False
 
@@ -1614,7 +1453,8 @@ class ScheduleGenerator:
         """
         # Сначала создаем шаблон с группами
         template_path = self.template_generator.generate_template_with_groups(
-            output_path.replace('.xlsx', '_template.xlsx')
+            output_path.replace('.xlsx', '_template.xlsx'),
+            active_groups=data['active_groups']
         )
 
         # Получаем структуру групп
@@ -1628,7 +1468,8 @@ class ScheduleGenerator:
             self.schedule,
             group_structure,
             self.group_names,
-            output_path
+            output_path,
+            territories=data['territories']
         )
 
         # Удаляем временный шаблон
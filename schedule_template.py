@@ -2,7 +2,7 @@ import os
 from openpyxl import Workbook
 from openpyxl.styles import Border, Side, Alignment, Font
 from openpyxl.utils import get_column_letter
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from database.operations import DBOperations
 from database.settings_manager import SettingsManager
 
@@ -37,12 +37,14 @@ class SimpleTemplateGenerator:
             bottom=Side(style='thin')
         )
 
-    def generate_template_with_groups(self, output_path: str) -> str:
+    def generate_template_with_groups(self, output_path: str,
+                                      active_groups: Optional[List[Dict[str, Any]]] = None) -> str:
         wb = Workbook()
         ws = wb.active
         ws.title = "Расписание I семестр"
 
-        active_groups = self._get_active_groups()
+        if active_groups is None:
+            active_groups = self._get_active_groups()
         group_structure = self._build_group_structure(active_groups)
 
         # ========== ШАПКА ДОКУМЕНТА ==========
@@ -1,11 +1,19 @@
 import flet as ft
-import threading
+import inspect, threading
 from typing import Callable, Optional, List, Dict, Any
 from database.settings_manager import SettingsManager
 
 PALETTE = ["#18363E", "#5F97AA", "#2D5F6E", "#3E88A5", "#93C4D1"]
 
 
+def run_handler(page: ft.Page, handler: Callable, *args):
+    """Вызывает обработчик формы; асинхронный запускается в цикле событий страницы"""
+    if inspect.iscoroutinefunction(handler):
+        page.run_task(handler, *args)
+    else:
+        handler(*args)
+
+
 class Toast:
     def __init__(self, page: ft.Page):
         self.page = page
@@ -309,7 +317,8 @@ class DataTableManager:
 class SearchFilterBar:
     def __init__(self, on_search: Callable = None, on_filter: Callable = None,
                  section_name: str = "", db_operations=None,
-                 initial_search: str = "", initial_filters: Dict = None):
+                 initial_search: str = "", initial_filters: Dict = None,
+                 filter_data: Optional[Dict[str, List[Dict[str, Any]]]] = None):
         self.on_search = on_search
         self.on_filter = on_filter
         self.section_name = section_name
@@ -322,8 +331,11 @@ class SearchFilterBar:
         self.groups = []
         self.modules = []
 
-        if db_operations and section_name:
-            self._load_filter_data()
+        # Справочники можно загрузить заранее (load_filter_data в потоке базы данных) и передать готовыми
+        if filter_data is None and db_operations and section_name:
+            filter_data = self.load_filter_data(db_operations, section_name)
+        for key, rows in (filter_data or {}).items():
+            setattr(self, key, rows)
 
         self.search_field = ft.TextField(
             hint_text="Поиск...",
@@ -357,23 +369,28 @@ class SearchFilterBar:
         self.filter_controls = {}
         self.page = None
 
-    def _load_filter_data(self):
-        if self.section_name == "Нагрузка" and self.db_ops:
-            self.teachers = self.db_ops.get_table_data("Преподаватели")
-            self.teachers.sort(key=lambda x: x['ФИО'].lower())
-            self.subjects = self.db_ops.get_subjects_with_module_names()
-            self.subjects.sort(key=lambda x: x['Дисциплина'].lower())
-            settings_manager = SettingsManager(self.db_ops)
+    @staticmethod
+    def load_filter_data(db_ops, section_name: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Справочники для фильтров раздела: {'teachers'/'subjects'/'groups'/'modules': строки}"""
+        if section_name == "Нагрузка":
+            teachers = db_ops.get_table_data("Преподаватели")
+            teachers.sort(key=lambda x: x['ФИО'].lower())
+            subjects = db_ops.get_subjects_with_module_names()
+            subjects.sort(key=lambda x: x['Дисциплина'].lower())
+            settings_manager = SettingsManager(db_ops)
             groups_with_order = settings_manager.get_groups_with_exclusion_and_order()
             order_dict = {g['ID']: g['Порядок'] for g in groups_with_order}
-            self.groups = self.db_ops.get_groups()
-            self.groups.sort(key=lambda g: (
+            groups = db_ops.get_groups()
+            groups.sort(key=lambda g: (
                 order_dict.get(g['ID'], 999),
                 g['Группа'].lower(),
                 g['Подгруппа'].lower() if g['Подгруппа'] != 'Нет' else ''))
-        elif self.section_name == "Дисциплины" and self.db_ops:
-            self.modules = self.db_ops.get_modules()
-            self.modules.sort(key=lambda x: x['Код'].lower())
+            return {'teachers': teachers, 'subjects': subjects, 'groups': groups}
+        elif section_name == "Дисциплины":
+            modules = db_ops.get_modules()
+            modules.sort(key=lambda x: x['Код'].lower())
+            return {'modules': modules}
+        return {}
 
     def _create_filter_dialog_content(self):
         if self.section_name == "Нагрузка":
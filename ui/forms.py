@@ -1,7 +1,7 @@
 import flet as ft
 import re
 from typing import Callable, List, Dict, Optional
-from ui.components import PALETTE, Validator
+from ui.components import PALETTE, Validator, run_handler
 from database.settings_manager import SettingsManager
 
 
@@ -198,7 +198,7 @@ class GroupForm:
             'Разговоры о важном': important_talks
         }
 
-        self.on_submit(group_data)
+        run_handler(self.page, self.on_submit, group_data)
 
     def set_page(self, page: ft.Page):
         self.page = page
@@ -697,7 +697,7 @@ class SubjectForm:
             'Модуль': module
         }
 
-        self.on_submit(subject_data, self.selected_classrooms)
+        run_handler(self.page, self.on_submit, subject_data, self.selected_classrooms)
 
     def set_page(self, page: ft.Page):
         self.page = page
@@ -803,7 +803,7 @@ class ModuleForm:
             'Название': module_name
         }
 
-        self.on_submit(module_data)
+        run_handler(self.page, self.on_submit, module_data)
 
     def set_page(self, page: ft.Page):
         self.page = page
@@ -937,7 +937,7 @@ class ClassroomForm:
                 self.toast.show("Вместимость должна быть числом!", success=False)
                 return
 
-        self.on_submit(classroom_data)
+        run_handler(self.page, self.on_submit, classroom_data)
 
     def set_page(self, page: ft.Page):
         self.page = page
@@ -1211,7 +1211,7 @@ class TeacherForm:
             'Территории': territory_ids
         }
 
-        self.on_submit(teacher_data)
+        run_handler(self.page, self.on_submit, teacher_data)
 
     def set_page(self, page: ft.Page):
         self.page = page
@@ -1380,7 +1380,7 @@ class TerritoryForm:
             'Цвет': color
         }
 
-        self.on_submit(territory_data)
+        run_handler(self.page, self.on_submit, territory_data)
 
     def set_page(self, page: ft.Page):
         self.page = page
@@ -1642,7 +1642,7 @@ class WorkloadForm:
             'Часы в неделю': hours
         }
 
-        self.on_submit(workload_data)
+        run_handler(self.page, self.on_submit, workload_data)
 
     def set_page(self, page: ft.Page):
         self.page = page
@@ -1940,16 +1940,15 @@ class MultiWorkloadForm:
             self.toast.show("Выберите преподавателя!", success=False)
             return
 
-        teacher_result = self.db_operations.db.execute_query(
-            "SELECT ID FROM Преподаватели WHERE ФИО = ?",
-            (teacher,)
-        )
-        if not teacher_result:
+        teacher_ids, subject_ids, group_ids = self.db_operations.get_workload_lookup_maps()
+
+        teacher_id = teacher_ids.get(teacher)
+        if teacher_id is None:
             self.toast.show("Преподаватель не найден!", success=False)
             return
-        teacher_id = teacher_result[0]['ID']
 
         workloads_data = []
+        row_numbers = []
         errors = []
         duplicates = []
 
@@ -1990,23 +1989,15 @@ class MultiWorkloadForm:
                 group_name = group_display
                 subgroup = "Нет"
 
-            subject_result = self.db_operations.db.execute_query(
-                "SELECT ID FROM Дисциплины WHERE Дисциплина = ?",
-                (subject,)
-            )
-            if not subject_result:
+            subject_id = subject_ids.get(subject)
+            if subject_id is None:
                 errors.append(f"Строка {i + 1}: дисциплина '{subject}' не найдена")
                 continue
-            subject_id = subject_result[0]['ID']
 
-            group_result = self.db_operations.db.execute_query(
-                "SELECT ID FROM Группы WHERE Группа = ? AND Подгруппа = ?",
-                (group_name, subgroup)
-            )
-            if not group_result:
+            group_id = group_ids.get((group_name, subgroup))
+            if group_id is None:
                 errors.append(f"Строка {i + 1}: группа '{group_display}' не найдена")
                 continue
-            group_id = group_result[0]['ID']
 
             for j, existing_data in enumerate(workloads_data):
                 if (existing_data['subject_id'] == subject_id and
@@ -2014,9 +2005,6 @@ class MultiWorkloadForm:
                     duplicates.append(f"Строка {i + 1}: дублируется со строкой {j + 1}")
                     break
 
-            if self.db_operations.check_workload_duplicate(teacher_id, subject_id, group_id):
-                duplicates.append(f"Строка {i + 1}: такая нагрузка уже существует в базе данных")
-
             workload_data = {
                 'Преподаватель': teacher,
                 'Дисциплина': subject,
@@ -2029,6 +2017,15 @@ class MultiWorkloadForm:
             }
 
             workloads_data.append(workload_data)
+            row_numbers.append(i + 1)
+
+        # Все строки проверяются по базе одним запросом
+        existing = self.db_operations.find_workload_conflicts(
+            (data['teacher_id'], data['subject_id'], data['group_id']) for data in workloads_data
+        )
+        for row_number, data in zip(row_numbers, workloads_data):
+            if (data['teacher_id'], data['subject_id'], data['group_id']) in existing:
+                duplicates.append(f"Строка {row_number}: такая нагрузка уже существует в базе данных")
 
         if duplicates:
             for duplicate in duplicates[:3]:
@@ -2048,12 +2045,8 @@ class MultiWorkloadForm:
             self.toast.show("Добавьте хотя бы одну строку нагрузки!", success=False)
             return
 
-        for workload in workloads_data:
-            workload.pop('teacher_id', None)
-            workload.pop('subject_id', None)
-            workload.pop('group_id', None)
-
-        self.on_submit(workloads_data)
+        # ID уже разрешены: insert_workloads_bulk не перечитывает справочники
+        run_handler(self.page, self.on_submit, workloads_data)
 
     def set_page(self, page: ft.Page):
         self.page = page
@@ -2113,53 +2106,14 @@ class StreamForm:
             value=stream_data['Поток'] if stream_data and edit_mode else "",  # ← Изменили ключ
         )
 
-        self.group1_dropdown = ft.Dropdown(
-            label="Группа 1 *",
-            label_style=ft.TextStyle(color=ft.Colors.GREY_400),
-            expand=True,
-            border_color=PALETTE[3],
-            bgcolor=ft.Colors.BLUE_GREY,
-            color=PALETTE[2],
-            options=self.group_options.copy(),
-            value=str(stream_data.get('Группа1_ID', '')) if stream_data and edit_mode and stream_data.get(
-                'Группа1_ID') else None,
-        )
-
-        self.group2_dropdown = ft.Dropdown(
-            label="Группа 2 *",
-            label_style=ft.TextStyle(color=ft.Colors.GREY_400),
-            expand=True,
-            border_color=PALETTE[3],
-            bgcolor=ft.Colors.BLUE_GREY,
-            color=PALETTE[2],
-            options=self.group_options.copy(),
-            value=str(stream_data.get('Группа2_ID', '')) if stream_data and edit_mode and stream_data.get(
-                'Группа2_ID') else None,
-        )
-
-        self.group3_dropdown = ft.Dropdown(
-            label="Группа 3 (необязательно)",
-            label_style=ft.TextStyle(color=ft.Colors.GREY_400),
-            expand=True,
-            border_color=PALETTE[3],
-            bgcolor=ft.Colors.BLUE_GREY,
-            color=PALETTE[2],
-            options=self.group_options.copy(),
-            value=str(stream_data.get('Группа3_ID', '')) if stream_data and edit_mode and stream_data.get(
-                'Группа3_ID') else None,
-        )
-
-        self.group4_dropdown = ft.Dropdown(
-            label="Группа 4 (необязательно)",
-            label_style=ft.TextStyle(color=ft.Colors.GREY_400),
-            expand=True,
-            border_color=PALETTE[3],
-            bgcolor=ft.Colors.BLUE_GREY,
-            color=PALETTE[2],
-            options=self.group_options.copy(),
-            value=str(stream_data.get('Группа4_ID', '')) if stream_data and edit_mode and stream_data.get(
-                'Группа4_ID') else None,
-        )
+        # Число групп в потоке не ограничено: первые две обязательны, остальные добавляются кнопкой
+        self.group_dropdowns = []
+        self.groups_column = ft.Column(spacing=15)
+        group_ids = stream_data.get('Группы_ID', []) if stream_data and edit_mode else []
+        for group_id in group_ids or [None, None]:
+            self._add_group_dropdown(group_id)
+        if len(self.group_dropdowns) < 2:
+            self._add_group_dropdown()
 
         self.subjects_dropdown = ft.Dropdown(
             label="Дисциплины для объединения *",
@@ -2217,6 +2171,26 @@ class StreamForm:
             visible=len(all_subjects) == 0
         )
 
+    def _add_group_dropdown(self, group_id: Optional[int] = None):
+        number = len(self.group_dropdowns) + 1
+        dropdown = ft.Dropdown(
+            label=f"Группа {number} *" if number <= 2 else f"Группа {number} (необязательно)",
+            label_style=ft.TextStyle(color=ft.Colors.GREY_400),
+            expand=True,
+            border_color=PALETTE[3],
+            bgcolor=ft.Colors.BLUE_GREY,
+            color=PALETTE[2],
+            options=self.group_options.copy(),
+            value=str(group_id) if group_id else None,
+        )
+        self.group_dropdowns.append(dropdown)
+        self.groups_column.controls.append(dropdown)
+
+    def _on_add_group_click(self, e):
+        self._add_group_dropdown()
+        if hasattr(self, 'page'):
+            self.page.update()
+
     def _update_selected_subjects_display(self):
         if not self.selected_subjects:
             self.selected_subjects_container.visible = False
@@ -2272,13 +2246,15 @@ class StreamForm:
             ft.Divider(height=20, color=PALETTE[1]),
 
             ft.Text("Группы в потоке", size=16, weight="bold", color=PALETTE[2]),
-            ft.Text("Можно объединить от 2 до 4 групп",
+            ft.Text("Можно объединить две группы и больше",
                     size=12, color=ft.Colors.BLUE_700, italic=True),
             self.no_groups_message,
-            self.group1_dropdown,
-            self.group2_dropdown,
-            self.group3_dropdown,
-            self.group4_dropdown,
+            self.groups_column,
+            ft.TextButton(
+                "Добавить группу",
+                icon=ft.Icons.ADD,
+                on_click=self._on_add_group_click
+            ),
 
             ft.Divider(height=20, color=PALETTE[1]),
 
@@ -2390,16 +2366,13 @@ class StreamForm:
 
     def _on_form_submit(self, e):
         stream_name = self.stream_name_field.value.strip()
-        group1_id = self.group1_dropdown.value
-        group2_id = self.group2_dropdown.value
-        group3_id = self.group3_dropdown.value
-        group4_id = self.group4_dropdown.value
+        group_values = [dropdown.value for dropdown in self.group_dropdowns]
 
         if not stream_name:
             self.toast.show("Введите название потока!", success=False)
             return
 
-        if not group1_id or not group2_id:
+        if not group_values[0] or not group_values[1]:
             self.toast.show("Выберите первую и вторую группу!", success=False)
             return
 
@@ -2408,32 +2381,13 @@ class StreamForm:
             return
 
         group_ids = []
-        if group1_id and group1_id != 'None':
-            try:
-                group_ids.append(int(group1_id))
-            except ValueError:
-                self.toast.show(f"Некорректный ID группы 1: {group1_id}", success=False)
-                return
-
-        if group2_id and group2_id != 'None':
-            try:
-                group_ids.append(int(group2_id))
-            except ValueError:
-                self.toast.show(f"Некорректный ID группы 2: {group2_id}", success=False)
-                return
-
-        if group3_id and group3_id != 'None':
-            try:
-                group_ids.append(int(group3_id))
-            except ValueError:
-                self.toast.show(f"Некорректный ID группы 3: {group3_id}", success=False)
-                return
-
-        if group4_id and group4_id != 'None':
+        for number, group_id in enumerate(group_values, start=1):
+            if not group_id or group_id == 'None':
+                continue
             try:
-                group_ids.append(int(group4_id))
+                group_ids.append(int(group_id))
             except ValueError:
-                self.toast.show(f"Некорректный ID группы 4: {group4_id}", success=False)
+                self.toast.show(f"Некорректный ID группы {number}: {group_id}", success=False)
                 return
 
         if len(set(group_ids)) != len(group_ids):
@@ -2447,16 +2401,7 @@ class StreamForm:
             'Дисциплины_список': self.selected_subjects
         }
 
-        if len(group_ids) > 0:
-            stream_data['Группа1_ID'] = group_ids[0]
-        if len(group_ids) > 1:
-            stream_data['Группа2_ID'] = group_ids[1]
-        if len(group_ids) > 2:
-            stream_data['Группа3_ID'] = group_ids[2]
-        if len(group_ids) > 3:
-            stream_data['Группа4_ID'] = group_ids[3]
-
-        self.on_submit(stream_data)
+        run_handler(self.page, self.on_submit, stream_data)
 
     def set_page(self, page: ft.Page):
         self.page = page
@@ -2473,8 +2418,13 @@ class GroupsManagementForm:
 
         self.all_groups = self.settings_manager.get_groups_with_exclusion_and_order()
 
+        # Отметки и порядок меняются только в памяти формы, в базу всё пишется одной транзакцией при сохранении
         self.excluded_groups = self.settings_manager.get_excluded_groups()
         self.group_order = self.settings_manager.get_group_order()
+        self._saved_params = {
+            'excluded_groups': list(self.excluded_groups),
+            'group_order': list(self.group_order)
+        }
 
         self._create_controls()
 
@@ -2669,10 +2619,12 @@ class GroupsManagementForm:
                 'excluded_groups': self.excluded_groups,
                 'group_order': self.group_order
             }
+            changed = {key: value for key, value in params.items() if value != self._saved_params[key]}
 
-            if self.settings_manager.save_generation_params(params):
+            if self.settings_manager.save_generation_params(changed):
+                self._saved_params.update({key: list(value) for key, value in changed.items()})
                 self.toast.show("Настройки групп успешно сохранены!", success=True)
-                self.on_submit(params)
+                run_handler(self.page, self.on_submit, params)
             else:
                 self.toast.show("Ошибка при сохранении настроек!", success=False)
 
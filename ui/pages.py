@@ -5,6 +5,7 @@ from datetime import datetime
 from schedule_generator import ScheduleGenerator
 from database.operations import DBOperations
 from database.settings_manager import SettingsManager
+from workload_importer import WorkloadImporter, ImportReport
 from ui.components import PALETTE, Toast, DataTableManager, SearchFilterBar
 from ui.forms import ModuleForm, StreamForm, GroupsManagementForm
 from ui.forms import MultiWorkloadForm, WorkloadForm, ClassroomForm, TeacherForm, GroupForm, SubjectForm, TerritoryForm
@@ -17,8 +18,18 @@ class BasePage:
         self.page = page
         self.db_ops = db_ops
         self.toast = toast
+        self.async_db = db_ops.async_ops
         self.table_manager = DataTableManager()
 
+    def _show_loading(self) -> ft.Control:
+        """Показывает индикатор загрузки, пока данные читаются в фоновом потоке"""
+        loading_view = ft.Column([
+            ft.ProgressRing(width=40, height=40, stroke_width=3)
+        ], alignment=ft.MainAxisAlignment.CENTER, horizontal_alignment=ft.CrossAxisAlignment.CENTER)
+        self.content.content = loading_view
+        self.page.update()
+        return loading_view
+
 
 class MainMenu(BasePage):
     def render(self):
@@ -79,6 +90,10 @@ class MainMenu(BasePage):
             )
             self.page.update()
 
+            # Копия базы до генерации, чтобы можно было вернуться к исходным данным
+            if self.db_ops.backups.create_snapshot("generation", compress=True) is None:
+                self.toast.show("Не удалось создать резервную копию базы", success=False)
+
             # Генерируем расписание
             result_path = generator.generate_schedule(output_path)
 
@@ -253,40 +268,54 @@ class DataPane(BasePage):
         self.current_search_text = ""
         self.current_filters = {}
         self.search_bar = None
+        self._search_request = None
+        self._next_key = None
+        self._total_count = 0
+        self._file_picker = None
 
     def render(self, section_name: str):
         self.current_section = section_name
+        loading_view = self._show_loading()
+        self.page.run_task(self._render_async, section_name, loading_view)
+
+    # Колонки таблицы для каждого раздела
+    SECTION_COLUMNS = {
+        "Группы": ["ID", "Группа", "Подгруппа", "Самообразование", "Разговоры о важном"],
+        "Дисциплины": ["ID", "Дисциплина", "Код модуля", "Название модуля"],
+        "Преподаватели": ["ID", "ФИО", "Совместитель", "Дни занятий", "Территория"],
+        "Территории": ["ID", "Территория", "Цвет"],
+        "Кабинеты": ["ID", "Номер кабинета", "Территория", "Вместимость"],
+        "Модули": ["ID", "Код", "Название"],
+        "Нагрузка": ["ID", "Преподаватель", "Дисциплина", "Группа", "Подгруппа", "Часы в неделю"],
+    }
+
+    # Нагрузка загружается страницами: таблица получает только видимое окно
+    WORKLOAD_PAGE_SIZE = 200
+
+    def _query_section(self, section_name: str):
+        """Строки раздела с учётом поиска и фильтров: (строки, ключ следующей страницы, всего строк)"""
+        if section_name == "Нагрузка":
+            rows, next_key = self.db_ops.get_workloads_page(
+                None, self.WORKLOAD_PAGE_SIZE, self.current_filters, self.current_search_text
+            )
+            total = self.db_ops.count_workloads(self.current_filters, self.current_search_text)
+            return rows, next_key, total
 
-        if section_name == "Группы":
-            data = self.db_ops.get_groups()
-            columns = ["ID", "Группа", "Подгруппа", "Самообразование", "Разговоры о важном"]
-        elif section_name == "Дисциплины":
-            data = self.db_ops.get_subjects_with_module_names()
-            columns = ["ID", "Дисциплина", "Код модуля", "Название модуля"]
-        elif section_name == "Преподаватели":
-            data = self.db_ops.get_teachers_with_preferences()
-            columns = ["ID", "ФИО", "Совместитель", "Дни занятий", "Территория"]
-        elif section_name == "Территории":
-            data = self.db_ops.get_table_data("Территории")
-            columns = ["ID", "Территория", "Цвет"]
-        elif section_name == "Кабинеты":
-            data = self.db_ops.get_classrooms_with_territory_names()
-            columns = ["ID", "Номер кабинета", "Территория", "Вместимость"]
-        elif section_name == "Модули":
-            data = self.db_ops.get_modules()
-            columns = ["ID", "Код", "Название"]
-        elif section_name == "Нагрузка":
-            data = self.db_ops.get_workloads()
-            columns = ["ID", "Преподаватель", "Дисциплина", "Группа", "Подгруппа", "Часы в неделю"]
-        else:
-            data = self.db_ops.get_table_data(section_name)
-            columns = self.db_ops.get_table_columns(section_name)
+        rows = self.db_ops.search(section_name, self.current_search_text, self.current_filters)
+        return rows, None, len(rows)
 
-        selected_row = self.table_manager.get_selected_row(section_name)
-        self.filtered_data = self._apply_filters_to_data(
-            data.copy(), section_name, self.current_search_text, self.current_filters
+    def _load_section_data(self, section_name: str):
+        columns = self.SECTION_COLUMNS.get(section_name) or self.db_ops.get_table_columns(section_name)
+        return self._query_section(section_name), columns
+
+    async def _render_async(self, section_name: str, loading_view: ft.Control):
+        (data, self._next_key, self._total_count), columns = await self.async_db.run(
+            self._load_section_data, section_name
         )
 
+        selected_row = self.table_manager.get_selected_row(section_name)
+        self.filtered_data = data
+
         def on_row_select(index):
             refresh_table()
 
@@ -303,44 +332,71 @@ class DataPane(BasePage):
             data_table = self.table_manager.create_data_table(
                 self.filtered_data, columns, section_name, on_row_select
             )
-            table_scroll.controls = [data_table]
+            table_scroll.controls = [data_table] + table_footer()
             self.page.update()
 
+        def table_footer():
+            if self._next_key is None:
+                return []
+            return [ft.Row([
+                ft.Text(f"Показано {len(self.filtered_data)} из {self._total_count}", color=PALETTE[0]),
+                ft.TextButton("Показать ещё", on_click=load_more),
+            ], alignment=ft.MainAxisAlignment.CENTER)]
+
+        async def load_more(e):
+            request = self._search_request
+            rows, next_key = await self.async_db.get_workloads_page(
+                self._next_key, self.WORKLOAD_PAGE_SIZE, self.current_filters, self.current_search_text
+            )
+            if self._search_request is request:
+                self.filtered_data.extend(rows)
+                self._next_key = next_key
+                refresh_table()
+
+        async def reload_filtered():
+            # Поиск и фильтры выполняются в базе; ответ на устаревший запрос
+            # (пользователь успел напечатать ещё) отбрасывается
+            request = object()
+            self._search_request = request
+            found, next_key, total = await self.async_db.run(self._query_section, section_name)
+            if self._search_request is request:
+                self.filtered_data = found
+                self._next_key = next_key
+                self._total_count = total
+                refresh_table()
+
         def filter_data(search_text):
             self.current_search_text = search_text
-            self.filtered_data = self._apply_filters_to_data(
-                data.copy(), section_name, search_text, self.current_filters
-            )
-            refresh_table()
+            self.page.run_task(reload_filtered)
 
         def apply_filters(filters):
             self.current_filters = filters
-            self.filtered_data = self._apply_filters_to_data(
-                data.copy(), section_name, self.current_search_text, filters
-            )
-            refresh_table()
+            self.page.run_task(reload_filtered)
 
+        # Справочники для фильтров читаются в потоке базы данных, сами элементы создаются здесь
+        filter_options = await self.async_db.run(SearchFilterBar.load_filter_data, self.db_ops, section_name)
         search_bar = SearchFilterBar(
             on_search=filter_data,
             on_filter=apply_filters,
             section_name=section_name,
             db_operations=self.db_ops,
             initial_search=self.current_search_text,
-            initial_filters=self.current_filters
+            initial_filters=self.current_filters,
+            filter_data=filter_options
         )
         search_bar.page = self.page
         self.search_bar = search_bar
 
-        if section_name == "Дисциплины":
-            modules = self.db_ops.get_modules()
-            search_bar.modules = modules
+        # Пока данные загружались, пользователь мог перейти в другой раздел
+        if self.content.content is not loading_view:
+            return
 
         data_table = self.table_manager.create_data_table(
             self.filtered_data, columns, section_name, on_row_select
         )
 
         table_scroll = ft.ListView(
-            [data_table],
+            [data_table] + table_footer(),
             expand=True,
             spacing=0,
             padding=0,
@@ -355,24 +411,6 @@ class DataPane(BasePage):
             on_click=lambda e: self._render_add_form(section_name, columns),
         )
 
-        def filter_data(search_text):
-            if not search_text:
-                self.filtered_data = data.copy()
-            else:
-                self.filtered_data = []
-                search_lower = search_text.lower()
-                for row in data:
-                    match_found = False
-                    for col in columns:
-                        if col != 'ID' and col in row:
-                            value = str(row.get(col, "")).lower()
-                            if search_lower in value:
-                                match_found = True
-                                break
-                    if match_found:
-                        self.filtered_data.append(row)
-            refresh_table()
-
         def edit_selected_record(e):
             selected_row_index = self.table_manager.get_selected_row(section_name)
 
@@ -427,25 +465,34 @@ class DataPane(BasePage):
                 actions=[]
             )
 
-            def on_confirm_delete(evt):
+            async def on_confirm_delete(evt):
                 success = False
 
+                # Нагрузка и дисциплины модуля не удаляются каскадом: сообщаем, что мешает удалению
+                blockers = await self.async_db.get_delete_blockers(section_name, record['ID'])
+                if blockers:
+                    details = ", ".join(f"{table}: {count}" for table, count in blockers.items())
+                    self.toast.show(f"Нельзя удалить: есть связанные записи ({details})", success=False)
+                    dialog.open = False
+                    self.page.update()
+                    return
+
                 if section_name == "Группы":
-                    success = self.db_ops.delete_group(record['ID'])
+                    success = await self.async_db.delete_group(record['ID'])
                 elif section_name == "Территории":
-                    success = self.db_ops.delete_territory_with_classrooms(record['ID'])
+                    success = await self.async_db.delete_territory_with_classrooms(record['ID'])
                 elif section_name == "Дисциплины":
-                    success = self.db_ops.delete_record("Дисциплины", record['ID'])
+                    success = await self.async_db.delete_record("Дисциплины", record['ID'])
                 elif section_name == "Преподаватели":
-                    success = self.db_ops.delete_record("Преподаватели", record['ID'])
+                    success = await self.async_db.delete_record("Преподаватели", record['ID'])
                 elif section_name == "Кабинеты":
-                    success = self.db_ops.delete_record("Кабинеты", record['ID'])
+                    success = await self.async_db.delete_record("Кабинеты", record['ID'])
                 elif section_name == "Модули":
-                    success = self.db_ops.delete_module(record['ID'])
+                    success = await self.async_db.delete_module(record['ID'])
                 elif section_name == "Нагрузка":
-                    success = self.db_ops.delete_workload(record['ID'])
+                    success = await self.async_db.delete_workload(record['ID'])
                 else:
-                    success = self.db_ops.delete_record(section_name, record['ID'])
+                    success = await self.async_db.delete_record(section_name, record['ID'])
 
                 if success:
                     self.toast.show("Запись успешно удалена!", success=True)
@@ -486,10 +533,20 @@ class DataPane(BasePage):
             on_click=delete_selected_record,
         )
 
+        buttons = [add_button, edit_button, delete_button]
+        if section_name == "Нагрузка":
+            buttons.insert(0, ft.IconButton(
+                icon=ft.Icons.UPLOAD_FILE,
+                icon_color=ft.Colors.WHITE,
+                bgcolor=PALETTE[3],
+                tooltip="Импорт нагрузки из CSV или Excel",
+                on_click=self._pick_workload_file,
+            ))
+
         self.content.content = ft.Column([
             ft.Row([
                 ft.Text(section_name, size=20, weight="bold", color=PALETTE[2]),
-                ft.Row([add_button, edit_button, delete_button], spacing=10)
+                ft.Row(buttons, spacing=10)
             ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
 
             ft.Container(
@@ -510,65 +567,60 @@ class DataPane(BasePage):
 
         self.page.update()
 
-    def _apply_filters_to_data(self, data, section_name, search_text, filters):
-        filtered = data.copy()
-
-        # Применяем поиск
-        if search_text:
-            search_lower = search_text.lower()
-            filtered = []
-            for row in data:
-                match_found = False
-                for key, value in row.items():
-                    if key != 'ID' and value is not None:
-                        if search_lower in str(value).lower():
-                            match_found = True
-                            break
-                if match_found:
-                    filtered.append(row)
-
-        # Применяем фильтры
-        if filters:
-            temp_filtered = filtered.copy()
-            filtered = []
-
-            for row in temp_filtered:
-                match = True
-
-                if section_name == "Дисциплины" and 'modules' in filters and filters['modules']:
-                    if row.get('Код модуля', '') not in filters['modules']:
-                        match = False
+    # ========== ИМПОРТ НАГРУЗКИ ==========
+    # Показываем в отчёте не больше стольких ошибок, остальные только считаются
+    IMPORT_ERRORS_SHOWN = 200
 
-                elif section_name == "Нагрузка":
-                    for key, value in filters.items():
-                        if not value:
-                            continue
-                        if key == 'teacher' and row.get('Преподаватель', '') != value:
-                            match = False
-                            break
-                        elif key == 'subject' and row.get('Дисциплина', '') != value:
-                            match = False
-                            break
-                        elif key == 'group':
-                            if ' - ' in value:
-                                group_name, subgroup = value.split(' - ')
-                                if row.get('Группа', '') != group_name or row.get('Подгруппа', '') != subgroup:
-                                    match = False
-                                    break
-                            else:
-                                if row.get('Группа', '') != value:
-                                    match = False
-                                    break
-                        elif key == 'with_subgroups_only' and value:
-                            subgroup = row.get('Подгруппа', '')
-                            if not subgroup or subgroup == 'Нет' or subgroup == 'None':
-                                match = False
-                                break
-
-                if match:
-                    filtered.append(row)
-
-        return filtered
+    def _pick_workload_file(self, e):
+        if self._file_picker is None:
+            self._file_picker = ft.FilePicker(on_result=self._on_workload_file_picked)
+            self.page.overlay.append(self._file_picker)
+            self.page.update()
+        self._file_picker.pick_files(
+            dialog_title="Импорт нагрузки",
+            allowed_extensions=["csv", "txt", "xlsx", "xlsm"],
+        )
+
+    def _on_workload_file_picked(self, e: ft.FilePickerResultEvent):
+        if e.files:
+            self.page.run_task(self._import_workload_async, e.files[0].path)
+
+    async def _import_workload_async(self, file_path: str):
+        self.toast.show("Импорт нагрузки...", success=True)
+        # Файл читается и записывается в потоке базы данных, интерфейс не блокируется
+        report = await self.async_db.run(WorkloadImporter(self.db_ops).import_file, file_path)
+        self.toast.show(report.summary(), success=report.failed == 0)
+        if report.errors:
+            self._show_import_errors(report)
+        if self.current_section == "Нагрузка":
+            self.render("Нагрузка")
+
+    def _show_import_errors(self, report: ImportReport):
+        lines = [ft.Text(f"Строка {error.row}: {error.message}" if error.row else error.message, size=13)
+                 for error in report.errors[:self.IMPORT_ERRORS_SHOWN]]
+        if len(report.errors) > self.IMPORT_ERRORS_SHOWN:
+            lines.append(ft.Text(f"... и ещё {len(report.errors) - self.IMPORT_ERRORS_SHOWN}", size=13))
+
+        dialog = ft.AlertDialog(
+            modal=True,
+            title=ft.Text("Результат импорта"),
+            content=ft.Container(
+                content=ft.Column([ft.Text(report.summary(), weight="bold")] + lines,
+                                  scroll=ft.ScrollMode.AUTO, spacing=4),
+                width=600,
+                height=400,
+            ),
+            actions=[]
+        )
+
+        def on_close(evt):
+            dialog.open = False
+            self.page.update()
+
+        dialog.actions = [ft.TextButton("Закрыть", on_click=on_close)]
+        self.page.overlay.append(dialog)
+        dialog.open = True
+        self.page.update()
 
     def _render_add_form(self, table_name: str, columns: List[str]):
         if table_name == "Группы":
@@ -591,8 +643,8 @@ class DataPane(BasePage):
     # ========== ФОРМЫ ДОБАВЛЕНИЯ ==========
 
     def _render_group_add_form(self):
-        def on_form_submit(group_data):
-            success = self.db_ops.insert_group(group_data)
+        async def on_form_submit(group_data):
+            success = await self.async_db.insert_group(group_data)
             if success:
                 self.toast.show("Группа успешно добавлена!", success=True)
                 self.render("Группы")
@@ -616,8 +668,8 @@ class DataPane(BasePage):
         self.page.update()
 
     def _render_add_subject_form(self):
-        def on_form_submit(subject_data, classroom_ids):
-            success = self.db_ops.insert_subject_with_classrooms(subject_data, classroom_ids)
+        async def on_form_submit(subject_data, classroom_ids):
+            success = await self.async_db.insert_subject_with_classrooms(subject_data, classroom_ids)
             if success:
                 self.toast.show("Дисциплина успешно добавлена!", success=True)
                 self.render("Дисциплины")
@@ -639,9 +691,9 @@ class DataPane(BasePage):
         self.page.update()
 
     def _render_teacher_add_form(self):
-        def on_form_submit(teacher_data):
+        async def on_form_submit(teacher_data):
             territory_ids = teacher_data.get('Территории', [])
-            success = self.db_ops.insert_teacher_with_territories(teacher_data, territory_ids)
+            success = await self.async_db.insert_teacher_with_territories(teacher_data, territory_ids)
             if success:
                 self.toast.show("Преподаватель успешно добавлен!", success=True)
                 self.render("Преподаватели")
@@ -663,8 +715,8 @@ class DataPane(BasePage):
         self.page.update()
 
     def _render_add_classroom_form(self):
-        def on_form_submit(classroom_data):
-            success = self.db_ops.insert_data("Кабинеты", classroom_data)
+        async def on_form_submit(classroom_data):
+            success = await self.async_db.insert_data("Кабинеты", classroom_data)
             if success:
                 self.toast.show("Кабинет успешно добавлен!", success=True)
                 self.render("Кабинеты")
@@ -686,8 +738,8 @@ class DataPane(BasePage):
         self.page.update()
 
     def _render_add_module_form(self):
-        def on_form_submit(module_data):
-            success = self.db_ops.insert_module(module_data['Код'], module_data['Название'])
+        async def on_form_submit(module_data):
+            success = await self.async_db.insert_module(module_data['Код'], module_data['Название'])
             if success:
                 self.toast.show("Модуль успешно добавлен!", success=True)
                 self.render("Модули")
@@ -709,8 +761,8 @@ class DataPane(BasePage):
         self.page.update()
 
     def _render_add_territory_form(self):
-        def on_form_submit(territory_data):
-            success = self.db_ops.insert_data("Территории", territory_data)
+        async def on_form_submit(territory_data):
+            success = await self.async_db.insert_data("Территории", territory_data)
             if success:
                 self.toast.show("Территория успешно добавлена!", success=True)
                 self.render("Территории")
@@ -734,8 +786,8 @@ class DataPane(BasePage):
     # ========== ФОРМЫ РЕДАКТИРОВАНИЯ ==========
 
     def _render_edit_group_form(self, record):
-        def on_form_submit(group_data):
-            success = self.db_ops.update_group(record['ID'], group_data)
+        async def on_form_submit(group_data):
+            success = await self.async_db.update_group(record['ID'], group_data)
             if success:
                 self.toast.show("Группа успешно обновлена!", success=True)
                 self.render("Группы")
@@ -766,8 +818,8 @@ class DataPane(BasePage):
         self.page.update()
 
     def _render_edit_subject_form(self, record):
-        def on_form_submit(subject_data, classroom_ids):
-            success = self.db_ops.update_subject_with_classrooms(record['ID'], subject_data, classroom_ids)
+        async def on_form_submit(subject_data, classroom_ids):
+            success = await self.async_db.update_subject_with_classrooms(record['ID'], subject_data, classroom_ids)
             if success:
                 self.toast.show("Дисциплина успешно обновлена!", success=True)
                 self.render("Дисциплины")
@@ -798,9 +850,9 @@ class DataPane(BasePage):
         self.page.update()
 
     def _render_edit_teacher_form(self, record):
-        def on_form_submit(teacher_data):
+        async def on_form_submit(teacher_data):
             territory_ids = teacher_data.pop('Территории', [])
-            success = self.db_ops.update_teacher_with_territories(record['ID'], teacher_data, territory_ids)
+            success = await self.async_db.update_teacher_with_territories(record['ID'], teacher_data, territory_ids)
             if success:
                 self.toast.show("Преподаватель успешно обновлен!", success=True)
                 self.render("Преподаватели")
@@ -839,18 +891,18 @@ class DataPane(BasePage):
         self.page.update()
 
     def _render_edit_classroom_form(self, record):
-        def on_form_submit(classroom_data):
-            current_territory_id = self.db_ops.get_territory_id_by_name(record['Территория'])
+        async def on_form_submit(classroom_data):
+            current_territory_id = await self.async_db.get_territory_id_by_name(record['Территория'])
 
             if (classroom_data['Кабинет'] != record['Номер кабинета'] or
                     classroom_data['ТерриторияID'] != current_territory_id):
 
-                if self.db_ops.check_classroom_exists(classroom_data['Кабинет'], classroom_data['ТерриторияID']):
+                if await self.async_db.check_classroom_exists(classroom_data['Кабинет'], classroom_data['ТерриторияID']):
                     self.toast.show(f"Кабинет '{classroom_data['Кабинет']}' уже существует на этой территории!",
                                     success=False)
                     return
 
-            success = self.db_ops.update_record("Кабинеты", record['ID'], classroom_data)
+            success = await self.async_db.update_record("Кабинеты", record['ID'], classroom_data)
             if success:
                 self.toast.show("Кабинет успешно обновлен!", success=True)
                 self.render("Кабинеты")
@@ -881,8 +933,8 @@ class DataPane(BasePage):
         self.page.update()
 
     def _render_edit_module_form(self, record):
-        def on_form_submit(module_data):
-            success = self.db_ops.update_module(record['ID'], module_data['Код'], module_data['Название'])
+        async def on_form_submit(module_data):
+            success = await self.async_db.update_module(record['ID'], module_data['Код'], module_data['Название'])
             if success:
                 self.toast.show("Модуль успешно обновлен!", success=True)
                 self.render("Модули")
@@ -911,8 +963,8 @@ class DataPane(BasePage):
         self.page.update()
 
     def _render_edit_territory_form(self, record):
-        def on_form_submit(territory_data):
-            success = self.db_ops.update_record("Территории", record['ID'], territory_data)
+        async def on_form_submit(territory_data):
+            success = await self.async_db.update_record("Территории", record['ID'], territory_data)
             if success:
                 self.toast.show("Территория успешно обновлена!", success=True)
                 self.render("Территории")
@@ -943,7 +995,7 @@ class DataPane(BasePage):
 
         form_fields_ref = {}
 
-        def on_form_submit(e):
+        async def on_form_submit(e):
             data = {}
             errors = []
 
@@ -964,7 +1016,7 @@ class DataPane(BasePage):
                     self.toast.show(error, success=False)
                 return
 
-            if self.db_ops.insert_data(table_name, data):
+            if await self.async_db.insert_data(table_name, data):
                 self.toast.show(f"Данные успешно добавлены!", success=True)
                 self.render(table_name)
             else:
@@ -1033,16 +1085,10 @@ class DataPane(BasePage):
         self.page.update()
 
     def _render_workload_add_form(self):
-        def on_form_submit(workloads_data):
-            success_count = 0
-            error_count = 0
-
-            for workload_data in workloads_data:
-                success = self.db_ops.insert_workload(workload_data)
-                if success:
-                    success_count += 1
-                else:
-                    error_count += 1
+        async def on_form_submit(workloads_data):
+            results = await self.async_db.insert_workloads_bulk(workloads_data)
+            success_count = sum(1 for success in results if success)
+            error_count = len(results) - success_count
 
             if success_count > 0:
                 if error_count > 0:
@@ -1069,8 +1115,8 @@ class DataPane(BasePage):
         self.page.update()
 
     def _render_edit_workload_form(self, record):
-        def on_form_submit(workload_data):
-            success = self.db_ops.update_workload(record['ID'], workload_data)
+        async def on_form_submit(workload_data):
+            success = await self.async_db.update_workload(record['ID'], workload_data)
             if success:
                 self.toast.show("Нагрузка успешно обновлена!", success=True)
                 self.render("Нагрузка")
@@ -1114,7 +1160,7 @@ class DataPane(BasePage):
 
         form_fields_ref = {}
 
-        def on_form_submit(e):
+        async def on_form_submit(e):
             data = {}
             for column in columns:
                 if column.lower() != 'id' and column in form_fields_ref:
@@ -1125,11 +1171,11 @@ class DataPane(BasePage):
                         data[column] = ""
 
             if table_name == "Модули":
-                success = self.db_ops.update_module(record['Код'], data)
+                success = await self.async_db.update_module(record['Код'], data)
             elif table_name == "Нагрузка":
-                success = self.db_ops.update_workload(record['ID'], data)
+                success = await self.async_db.update_workload(record['ID'], data)
             else:
-                success = self.db_ops.update_record(table_name, record['ID'], data)
+                success = await self.async_db.update_record(table_name, record['ID'], data)
 
             if success:
                 self.toast.show(f"Данные успешно обновлены!", success=True)
@@ -1267,7 +1313,15 @@ class SettingsPage(BasePage):
 
     def _show_streams_section(self):
         settings_manager = SettingsManager(self.db_ops)
-        streams = settings_manager.get_streams_with_subjects()
+        loading_view = self._show_loading()
+        self.page.run_task(self._show_streams_async, settings_manager, loading_view)
+
+    async def _show_streams_async(self, settings_manager, loading_view: ft.Control):
+        streams = await self.async_db.run(settings_manager.get_streams_with_subjects)
+        if self.content.content is not loading_view:
+            return
+
+        self.streams = streams
         columns = ["ID", "Поток", "Группы", "Дисциплины"]
         selected_row = self.table_manager.get_selected_row("Потоки")
 
@@ -1381,9 +1435,10 @@ class SettingsPage(BasePage):
         self.page.update()
 
     def _render_add_stream_form(self, settings_manager):
-        def on_form_submit(stream_data):
+        async def on_form_submit(stream_data):
             try:
-                success = settings_manager.save_stream_with_subjects(
+                success = await self.async_db.run(
+                    settings_manager.save_stream_with_subjects,
                     stream_data['Поток'],
                     stream_data['Группы_список'],
                     stream_data['Дисциплины_ID']
@@ -1415,12 +1470,12 @@ class SettingsPage(BasePage):
             self.toast.show("Выберите поток для редактирования!", success=False)
             return
 
-        streams = settings_manager.get_streams_with_subjects()
-        stream = streams[selected_row]
+        stream = self.streams[selected_row]
 
-        def on_form_submit(stream_data):
+        async def on_form_submit(stream_data):
             try:
-                success = settings_manager.update_stream_with_subjects(
+                success = await self.async_db.run(
+                    settings_manager.update_stream_with_subjects,
                     stream['ID'],
                     stream_data['Поток'],
                     stream_data['Группы_список'],
@@ -1439,10 +1494,7 @@ class SettingsPage(BasePage):
 
         stream_form_data = {
             'Поток': stream['Поток'],
-            'Группа1_ID': stream.get('Группа1_ID'),
-            'Группа2_ID': stream.get('Группа2_ID'),
-            'Группа3_ID': stream.get('Группа3_ID'),
-            'Группа4_ID': stream.get('Группа4_ID'),
+            'Группы_ID': stream.get('Группы_ID', []),
             'Дисциплины_ID': stream.get('Дисциплины_ID', []),
             'Дисциплины_список': stream.get('Дисциплины_список', [])
         }
@@ -1464,8 +1516,7 @@ class SettingsPage(BasePage):
             self.toast.show("Выберите поток для удаления!", success=False)
             return
 
-        streams = settings_manager.get_streams_with_subjects()
-        stream = streams[selected_row]
+        stream = self.streams[selected_row]
 
         dialog = ft.AlertDialog(
             modal=True,
@@ -1474,8 +1525,8 @@ class SettingsPage(BasePage):
             actions=[]
         )
 
-        def on_confirm_delete(evt):
-            success = settings_manager.delete_stream(stream['ID'])
+        async def on_confirm_delete(evt):
+            success = await self.async_db.run(settings_manager.delete_stream, stream['ID'])
             if success:
                 self.toast.show("Поток успешно удален!", success=True)
                 self.table_manager.clear_selection("Потоки")
@@ -1,6 +1,7 @@
 from typing import List, Dict, Any
 from database.operations import DBOperations
 from database.settings_manager import SettingsManager
+from database.snapshot import GenerationSnapshot
 
 
 class ScheduleGeneratorUtils:
@@ -45,13 +46,4 @@ class ScheduleGeneratorUtils:
         return errors
 
     def prepare_generation_data(self) -> Dict[str, Any]:
-        return {
-            'active_groups': self.get_active_groups(),
-            'excluded_groups': self.settings_manager.get_excluded_groups(),
-            'group_order': self.settings_manager.get_group_order(),
-            'streams': self.settings_manager.get_streams_with_subjects(),
-            'workloads': self.db_ops.get_workloads(),
-            'teachers': self.db_ops.get_teachers_with_preferences(),
-            'classrooms': self.db_ops.get_classrooms_with_territory_names(),
-            'subjects': self.db_ops.get_subjects_with_module_names(),
-        }
+        return GenerationSnapshot.load(self.db_ops, self.settings_manager).to_generation_data()
@@ -0,0 +1,240 @@
+import codecs, csv, os
+from openpyxl import load_workbook
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+@dataclass
+class ImportRowError:
+    row: int  # номер строки в файле
+    message: str
+    duplicate: bool = False
+
+
+@dataclass
+class ImportReport:
+    total: int = 0
+    imported: int = 0
+    errors: List[ImportRowError] = field(default_factory=list)
+
+    @property
+    def duplicates(self) -> int:
+        return sum(1 for error in self.errors if error.duplicate)
+
+    @property
+    def failed(self) -> int:
+        return len(self.errors) - self.duplicates
+
+    def summary(self) -> str:
+        return (f"Обработано строк: {self.total}, добавлено: {self.imported}, "
+                f"повторов: {self.duplicates}, ошибок: {self.failed}")
+
+
+class WorkloadImporter:
+    """
+    Импорт нагрузки из CSV или XLSX.
+    Файл читается потоково (csv.reader / лист openpyxl в режиме read_only),
+    названия преподавателей, дисциплин и групп разрешаются в ID по словарям, загруженным один раз,
+    строки добавляются пачками по batch_size, каждая пачка — в своей транзакции.
+    Ошибочные строки и повторы попадают в отчёт и не прерывают импорт.
+    CSV читается в UTF-8, а если файл в нём не декодируется — в cp1251 (так сохраняет CSV русский Excel).
+    """
+
+    # Заголовок колонки в файле (без учёта регистра) -> поле нагрузки
+    COLUMN_ALIASES = {
+        'преподаватель': 'Преподаватель',
+        'фио': 'Преподаватель',
+        'дисциплина': 'Дисциплина',
+        'предмет': 'Дисциплина',
+        'группа': 'Группа',
+        'подгруппа': 'Подгруппа',
+        'часы в неделю': 'Часы в неделю',
+        'часы': 'Часы в неделю',
+    }
+    REQUIRED_FIELDS = ('Преподаватель', 'Дисциплина', 'Группа', 'Часы в неделю')
+    MAX_HOURS = 40
+    CSV_ENCODINGS = ('utf-8-sig', 'cp1251')
+
+    def __init__(self, db_ops, batch_size: int = 1000):
+        self.db_ops = db_ops
+        self.batch_size = batch_size
+
+    # ========== ЧТЕНИЕ ФАЙЛОВ ==========
+    def _detect_encoding(self, file_path: str) -> str:
+        """Первая из CSV_ENCODINGS, в которой декодируется весь файл (файл читается порциями)"""
+        for encoding in self.CSV_ENCODINGS[:-1]:
+            decoder = codecs.getincrementaldecoder(encoding)()
+            try:
+                with open(file_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        decoder.decode(chunk)
+                    decoder.decode(b'', final=True)
+                return encoding
+            except UnicodeDecodeError:
+                continue
+        return self.CSV_ENCODINGS[-1]
+
+    def _iter_file_rows(self, file_path: str, sheet_name: Optional[str] = None,
+                        encoding: Optional[str] = None) -> Iterator[Tuple[int, List[Any]]]:
+        extension = os.path.splitext(file_path)[1].lower()
+
+        if extension in ('.xlsx', '.xlsm'):
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                sheet = workbook[sheet_name] if sheet_name else workbook.active
+                for row_number, values in enumerate(sheet.iter_rows(values_only=True), start=1):
+                    yield row_number, list(values)
+            finally:
+                workbook.close()
+        elif extension in ('.csv', '.txt'):
+            with open(file_path, newline='', encoding=encoding or self._detect_encoding(file_path)) as f:
+                sample = f.read(4096)
+                f.seek(0)
+                try:
+                    dialect = csv.Sniffer().sniff(sample, delimiters=';,\t')
+                except csv.Error:
+                    dialect = csv.excel
+                for row_number, values in enumerate(csv.reader(f, dialect), start=1):
+                    yield row_number, values
+        else:
+            raise ValueError(f"Неподдерживаемый формат файла: {extension}")
+
+    def _iter_records(self, file_path: str, sheet_name: Optional[str] = None,
+                      encoding: Optional[str] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        columns = None
+        for row_number, values in self._iter_file_rows(file_path, sheet_name, encoding):
+            if all(value is None or str(value).strip() == '' for value in values):
+                continue
+
+            if columns is None:
+                # Первая непустая строка — заголовок
+                columns = [self.COLUMN_ALIASES.get(str(value or '').strip().lower()) for value in values]
+                missing = [name for name in self.REQUIRED_FIELDS if name not in columns]
+                if missing:
+                    raise ValueError(f"В файле нет колонок: {', '.join(missing)}")
+                continue
+
+            record = {}
+            for name, value in zip(columns, values):
+                if name and name not in record:
+                    record[name] = value
+            yield row_number, record
+
+    # ========== ПРОВЕРКА СТРОК ==========
+    @staticmethod
+    def _text(value: Any) -> str:
+        if value is None:
+            return ''
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value).strip()
+
+    def _parse_hours(self, value: Any) -> Tuple[Optional[int], Optional[str]]:
+        text = self._text(value)
+        if not text:
+            return None, "Не указано количество часов"
+        try:
+            hours = float(text.replace(',', '.'))
+        except ValueError:
+            return None, f"Часы должны быть числом: {text}"
+        if not hours.is_integer():
+            return None, f"Часы должны быть целым числом: {text}"
+        hours = int(hours)
+        if hours <= 0:
+            return None, "Часы должны быть положительным числом"
+        if hours > self.MAX_HOURS:
+            return None, f"Часы не могут превышать {self.MAX_HOURS} в неделю"
+        return hours, None
+
+    def _split_group(self, record: Dict[str, Any]) -> Tuple[str, str]:
+        group = self._text(record.get('Группа'))
+        subgroup = self._text(record.get('Подгруппа'))
+        # Группа может быть указана так же, как в формах: "Группа - Подгруппа"
+        if not subgroup and ' - ' in group:
+            group, subgroup = (part.strip() for part in group.split(' - ', 1))
+        return group, subgroup or 'Нет'
+
+    # ========== ИМПОРТ ==========
+    def import_file(self, file_path: str, sheet_name: Optional[str] = None,
+                    snapshot: bool = True, encoding: Optional[str] = None) -> ImportReport:
+        """encoding — кодировка CSV; по умолчанию определяется по файлу (UTF-8 или cp1251)"""
+        report = ImportReport()
+
+        # Импорт добавляет сотни строк сразу: перед ним сохраняем копию базы для отката
+        if snapshot and self.db_ops.backups.create_snapshot("import") is None:
+            report.errors.append(ImportRowError(0, "Не удалось создать резервную копию перед импортом"))
+            return report
+
+        teacher_ids, subject_ids, group_ids = self.db_ops.get_workload_lookup_maps()
+        seen = {}  # {(преподаватель, дисциплина, группа): номер строки} для повторов внутри файла
+
+        batch = []  # [(номер строки, (ID преподавателя, ID дисциплины, ID группы, часы))]
+        last_row = 0  # последняя прочитанная строка файла
+
+        try:
+            for row_number, record in self._iter_records(file_path, sheet_name, encoding):
+                report.total += 1
+                last_row = row_number
+
+                teacher = self._text(record.get('Преподаватель'))
+                subject = self._text(record.get('Дисциплина'))
+                group, subgroup = self._split_group(record)
+                hours, error = self._parse_hours(record.get('Часы в неделю'))
+
+                if not error:
+                    if not teacher or not subject or not group:
+                        error = "Не заполнены преподаватель, дисциплина или группа"
+                    elif teacher not in teacher_ids:
+                        error = f"Преподаватель не найден: {teacher}"
+                    elif subject not in subject_ids:
+                        error = f"Дисциплина не найдена: {subject}"
+                    elif (group, subgroup) not in group_ids:
+                        error = f"Группа не найдена: {group}" + (f" - {subgroup}" if subgroup != 'Нет' else "")
+                if error:
+                    report.errors.append(ImportRowError(row_number, error))
+                    continue
+
+                key = (teacher_ids[teacher], subject_ids[subject], group_ids[(group, subgroup)])
+                if key in seen:
+                    report.errors.append(ImportRowError(
+                        row_number, f"Повтор строки {seen[key]} этого файла", duplicate=True))
+                    continue
+                seen[key] = row_number
+
+                batch.append((row_number, key + (hours,)))
+                if len(batch) >= self.batch_size:
+                    self._flush(batch, report)
+                    batch = []
+        except (OSError, ValueError, csv.Error) as e:
+            message = f"Ошибка чтения файла: {e}"
+            if last_row:
+                message += f". Строки после {last_row} не импортированы"
+            report.errors.append(ImportRowError(last_row, message))
+        finally:
+            # Строки, прочитанные до ошибки, записываются в любом случае
+            self._flush(batch, report)
+            # Ошибки записи добавляются при сбросе пачки — возвращаем порядок строк файла
+            report.errors.sort(key=lambda error: error.row)
+
+        return report
+
+    def _flush(self, batch: List[Tuple[int, Tuple]], report: ImportReport):
+        if not batch:
+            return
+
+        # Повторы с базой определяются при вставке: проверка и запись идут в одной транзакции
+        results = self.db_ops.insert_workload_rows([row for _, row in batch])
+        if results is None:
+            # Пачка откатилась целиком: повторяем по одной строке, чтобы найти ошибочные
+            results = []
+            for _, row in batch:
+                result = self.db_ops.insert_workload_rows([row])
+                results.append(result[0] if result else None)
+
+        for (row_number, _), result in zip(batch, results):
+            if result:
+                report.imported += 1
+            elif result is None:
+                report.errors.append(ImportRowError(row_number, "Ошибка записи в базу данных"))
+            else:
+                report.errors.append(ImportRowError(row_number, "Такая нагрузка уже есть в базе", duplicate=True))